@@ -0,0 +1,46 @@
+"""Compares two results of the benchmark suite.
+
+Usage:
+    python -m benchmarks.compare <baseline.json> <results.json> [--threshold 0.05]
+"""
+import argparse
+import json
+
+
+def load_results(file_path: str) -> dict:
+    with open(file_path) as f:
+        data = json.load(f)
+
+    return {(result['name'], result['profile']): result for result in data['results'] if 'median' in result}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('baseline', type=str, help='Results of the baseline run')
+    parser.add_argument('results', type=str, help='Results of the new run')
+    parser.add_argument('--threshold', type=float, default=0.05,
+                        help='Relative change which is reported as a speedup or a slowdown')
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    results = load_results(args.results)
+
+    print('%-28s %-12s %12s %12s %9s' % ('benchmark', 'profile', 'baseline ms', 'new ms', 'change'))
+    for key in sorted(set(baseline) & set(results), key=lambda key: (key[0], key[1] or '')):
+        old_time = baseline[key]['median']
+        new_time = results[key]['median']
+        change = (new_time - old_time) / old_time if old_time else 0
+
+        if change <= -args.threshold:
+            verdict = 'faster'
+        elif change >= args.threshold:
+            verdict = 'SLOWER'
+        else:
+            verdict = ''
+
+        print('%-28s %-12s %12.3f %12.3f %+8.1f%% %s' % (key[0], key[1] or '', old_time * 1000, new_time * 1000,
+                                                        change * 100, verdict))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark for "DependencyManager" with a large configuration file.
+
+Usage:
+    python -m benchmarks.dependency_manager [--dependencies 10000]
+"""
+import argparse
+import os
+import tempfile
+import timeit
+from darty.dependency_manager import DependencyManager
+
+
+def create_config(config_path: str, num_dependencies: int):
+    with open(config_path, 'w') as f:
+        f.write('repositories:\n')
+        f.write('  default:\n')
+        f.write('    type: test\n')
+        f.write('    root: benchmarks\n')
+        f.write('dependencies:\n')
+
+        for i in range(num_dependencies):
+            f.write('  - group: group%d.subgroup%d\n' % (i % 50, i % 7))
+            f.write('    artifact: artifact%d\n' % i)
+            f.write('    version: 1.0.%d\n' % (i % 10))
+            f.write('    workingDir: data/artifact%d\n' % i)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dependencies', type=int, default=10000, help='Number of dependencies in the config')
+    parser.add_argument('--repeat', type=int, default=10, help='Number of repetitions')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_path = os.path.join(tmp_dir, 'darty.yaml')
+        create_config(config_path, args.dependencies)
+
+        def cold():
+            DependencyManager._config_cache.invalidate()
+            DependencyManager(config_path)
+
+        def warm():
+            DependencyManager(config_path)
+
+        cold_time = timeit.timeit(cold, number=args.repeat) / args.repeat
+        warm_time = timeit.timeit(warm, number=args.repeat) / args.repeat
+
+        manager = DependencyManager(config_path)
+        lookup_time = timeit.timeit(lambda: manager.search_dependency_by_artifact('artifact%d' % (args.dependencies - 1)),
+                                    number=1000) / 1000
+        group_time = timeit.timeit(lambda: manager.search_dependencies_by_group('group49'), number=100) / 100
+
+    print('dependencies: %d' % args.dependencies)
+    print('construction (config parsed): %.1f ms' % (cold_time * 1000))
+    print('construction (config cached): %.1f ms' % (warm_time * 1000))
+    print('search by artifact: %.3f ms' % (lookup_time * 1000))
+    print('search by group: %.3f ms' % (group_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
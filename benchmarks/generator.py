@@ -0,0 +1,94 @@
+"""Generator of synthetic packages for benchmarks.
+
+Packages are reproducible: the same profile, scale and seed always produce
+the same files with the same content.
+
+Usage:
+    python -m benchmarks.generator <output_dir> [--profile mixed] [--scale 1.0]
+"""
+import argparse
+import os
+import random
+
+
+# size of a block of random data files are made of
+BLOCK_SIZE = 1024 * 1024
+
+# profiles of synthetic packages: lists of (number of files, minimum size, maximum size) groups,
+# the number of files and the sizes are multiplied by a scale
+PROFILES = {
+    # a lot of tiny files in nested directories
+    'tiny_files': [(5000, 100, 4 * 1024)],
+    # a few huge files
+    'huge_files': [(2, 64 * 1024 * 1024, 64 * 1024 * 1024)],
+    # a typical dataset: small files, medium files and a large one
+    'mixed': [(1000, 1024, 64 * 1024), (20, 1024 * 1024, 4 * 1024 * 1024), (1, 32 * 1024 * 1024, 32 * 1024 * 1024)],
+}
+
+# maximum number of files in a directory
+FILES_PER_DIR = 100
+
+
+def generate_package(dst_dir: str, profile: str, scale: float = 1.0, seed: int = 0) -> list:
+    """Creates files of a synthetic package.
+
+    :param dst_dir: directory where the files will be created
+    :param profile: name of the profile (see "PROFILES")
+    :param scale: multiplier for the number of files in the "tiny_files" profile and for sizes of big files
+    :param seed: seed for the random generator
+    :return: list of (relative path, size) tuples
+    """
+    if profile not in PROFILES:
+        raise ValueError('Unknown profile "%s"' % profile)
+
+    rnd = random.Random(seed)
+
+    # random data is generated only once and then files are sliced from it,
+    # blocks are bigger than the deflate window, so the data is not compressible
+    block = rnd.randbytes(BLOCK_SIZE)
+
+    files = []
+    for group_id, (num_files, min_size, max_size) in enumerate(PROFILES[profile]):
+        # small files are scaled by their number, big ones by their size
+        if max_size < BLOCK_SIZE:
+            num_files = max(1, int(num_files * scale))
+        else:
+            min_size = max(1, int(min_size * scale))
+            max_size = max(1, int(max_size * scale))
+
+        for i in range(num_files):
+            file_path = os.path.join('group%d' % group_id, 'dir%d' % (i // FILES_PER_DIR), 'file%d.bin' % i)
+            size = rnd.randint(min_size, max_size)
+            _write_file(os.path.join(dst_dir, file_path), block, rnd.randrange(BLOCK_SIZE), size)
+            files.append((file_path, size))
+
+    return files
+
+
+def _write_file(file_path: str, block: bytes, offset: int, size: int):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    with open(file_path, 'wb') as f:
+        while size > 0:
+            chunk = block[offset:offset + size]
+            f.write(chunk)
+            size -= len(chunk)
+            offset = 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('output_dir', type=str, help='Directory for the package files')
+    parser.add_argument('--profile', type=str, choices=sorted(PROFILES), default='mixed', help='Package profile')
+    parser.add_argument('--scale', type=float, default=1.0, help='Scale of the package')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the random generator')
+    args = parser.parse_args()
+
+    files = generate_package(args.output_dir, args.profile, args.scale, args.seed)
+
+    print('files: %d' % len(files))
+    print('size: %.1f MB' % (sum(size for _, size in files) / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Micro-benchmark for "Dependency.get_path()" on a package with many files.
+
+Usage:
+    python -m benchmarks.get_path [--files 100000] [--calls 1000] [--sqlite]
+"""
+import argparse
+import json
+import os
+import tempfile
+import timeit
+from darty.package.dependency import Dependency
+from darty.package.file_index import convert_info_json
+from darty.package.repository import Repository
+
+
+def create_dependency(packages_dir: str, num_files: int, sqlite_index: bool = False) -> Dependency:
+    dependency = Dependency({
+        'group': 'benchmarks',
+        'artifact': 'get-path',
+        'version': '1.0',
+    }, Repository({
+        'type': 'test',
+        'root': 'benchmarks',
+        'parameters': {'local_dir': os.path.join(packages_dir, 'repository')},
+    }), packages_dir, packages_dir)
+
+    # only "info.json" is required to resolve paths within an installed package
+    info_path = dependency.get_artifact_info_path()
+    os.makedirs(os.path.dirname(info_path), exist_ok=True)
+    with open(info_path, 'w') as f:
+        json.dump({
+            'group': dependency.group,
+            'artifact': dependency.artifact,
+            'version': dependency.version,
+            'files': ['dir%d/file%d.txt' % (i % 100, i) for i in range(num_files)],
+        }, f)
+
+    if sqlite_index:
+        convert_info_json(os.path.dirname(info_path))
+
+    return dependency
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=100000, help='Number of files in the package')
+    parser.add_argument('--calls', type=int, default=1000, help='Number of "get_path" calls')
+    parser.add_argument('--sqlite', action='store_true', help='Use an SQLite index for the list of files')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as packages_dir:
+        dependency = create_dependency(packages_dir, args.files, args.sqlite)
+        file_path = 'dir99/file%d.txt' % (args.files - 1)
+
+        def cold():
+            dependency.invalidate_cache()
+            dependency.get_path(file_path)
+
+        def warm():
+            dependency.get_path(file_path)
+
+        cold_time = timeit.timeit(cold, number=max(1, args.calls // 100)) / max(1, args.calls // 100)
+        warm_time = timeit.timeit(warm, number=args.calls) / args.calls
+
+    print('files: %d' % args.files)
+    print('cold get_path: %.3f ms' % (cold_time * 1000))
+    print('warm get_path: %.3f ms' % (warm_time * 1000))
+    print('speedup: %.0fx' % (cold_time / warm_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Startup benchmark based on "python -X importtime".
+
+Usage:
+    python -m benchmarks.startup [--module darty.dependency_manager] [--top 10]
+"""
+import argparse
+import subprocess
+import sys
+
+
+# modules which must not be imported just to resolve paths to installed packages
+HEAVY_MODULES = ('boto3', 'botocore', 'pkg_resources', 'schema', 'yaml')
+
+
+def get_import_times(module: str) -> list:
+    """Imports the module in a fresh interpreter and returns a list of
+    (module name, self time in us, cumulative time in us) tuples.
+    """
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                         stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+    import_times = []
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_time, cumulative_time, name = line[len('import time:'):].split('|')
+        import_times.append((name.strip(), int(self_time), int(cumulative_time)))
+
+    return import_times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', type=str, default='darty.dependency_manager', help='Module to import')
+    parser.add_argument('--top', type=int, default=10, help='Number of the slowest imports to display')
+    args = parser.parse_args()
+
+    import_times = get_import_times(args.module)
+    total_time = sum(self_time for _, self_time, _ in import_times)
+
+    print('import %s: %.1f ms (%d modules)' % (args.module, total_time / 1000, len(import_times)))
+
+    print('\nslowest imports (cumulative):')
+    for name, _, cumulative_time in sorted(import_times, key=lambda x: -x[2])[:args.top]:
+        print('  %8.1f ms  %s' % (cumulative_time / 1000, name))
+
+    heavy_modules = sorted({name for name, _, _ in import_times if name.split('.')[0] in HEAVY_MODULES})
+    if heavy_modules:
+        print('\nheavy modules imported: %s' % ', '.join(heavy_modules))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,432 @@
+"""Benchmark suite for the hot paths of Darty.
+
+Every benchmark runs on synthetic packages (see "benchmarks.generator") and the results
+are saved as JSON, so runs can be compared across commits with "benchmarks.compare".
+S3 drivers run against moto, they are skipped if moto is not installed.
+
+Usage:
+    python -m benchmarks.suite [--output results.json] [--benchmarks 'publish,s3_*'] [--profiles mixed]
+                               [--scale 1.0] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from shutil import rmtree
+from benchmarks.generator import generate_package, PROFILES
+from benchmarks.get_path import create_dependency as create_get_path_dependency
+from benchmarks.dependency_manager import create_config
+from darty.dependency_manager import DependencyManager
+from darty.drivers.s3.zip.utils import pack_archive, unpack_archive
+from darty.output_writer import NullOutputWriter
+from darty.package.dependency import Dependency
+from darty.package.repository import Repository
+from darty.utils import get_dir_hash
+
+
+# registered benchmarks: name -> (function, whether it runs for every package profile)
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name: str, profiled: bool = True):
+    """Registers a benchmark. A benchmark function takes a context, a profile name
+    and a number of repetitions and returns a list of durations in seconds.
+    """
+    def decorator(func):
+        BENCHMARKS[name] = (func, profiled)
+        return func
+
+    return decorator
+
+
+class Context(object):
+    """Temporary directory with generated packages, shared by all the benchmarks."""
+
+    def __init__(self, tmp_dir: str, scale: float):
+        self.tmp_dir = tmp_dir
+        self.scale = scale
+        self._packages = {}
+        self._counter = 0
+
+    def get_package(self, profile: str):
+        """Returns a directory with the package files and a list of (path, size) tuples."""
+        if profile not in self._packages:
+            package_dir = os.path.join(self.tmp_dir, 'generated', profile)
+            self._packages[profile] = (package_dir, generate_package(package_dir, profile, self.scale))
+
+        return self._packages[profile]
+
+    def create_dir(self, name: str) -> str:
+        """Creates a new empty directory."""
+        self._counter += 1
+        dir_path = os.path.join(self.tmp_dir, '%s-%d' % (name, self._counter))
+        os.makedirs(dir_path)
+
+        return dir_path
+
+    def create_dependency(self, profile: str, version: str = '1.0', working_dir: str = None) -> Dependency:
+        """Creates a dependency stored in the local repository, its working directory
+        is the generated package by default.
+        """
+        package_dir, _ = self.get_package(profile)
+
+        return Dependency({
+            'group': 'benchmarks',
+            'artifact': profile.replace('_', '-'),
+            'version': version,
+            'workingDir': working_dir if working_dir else package_dir,
+        }, Repository({
+            'type': 'test',
+            'root': 'benchmarks',
+            'parameters': {'local_dir': os.path.join(self.tmp_dir, 'repository')},
+        }), os.path.join(self.tmp_dir, 'packages'), self.tmp_dir)
+
+
+def measure(func) -> float:
+    start = time.perf_counter()
+    func()
+
+    return time.perf_counter() - start
+
+
+@benchmark('dir_hash')
+def bench_dir_hash(ctx: Context, profile: str, repeat: int) -> list:
+    package_dir, _ = ctx.get_package(profile)
+
+    return [measure(lambda: get_dir_hash(package_dir)) for _ in range(repeat)]
+
+
+@benchmark('pack_archive')
+def bench_pack_archive(ctx: Context, profile: str, repeat: int) -> list:
+    package_dir, _ = ctx.get_package(profile)
+    archive_path = os.path.join(ctx.create_dir('archive'), 'package.zip')
+
+    return [measure(lambda: pack_archive(package_dir, archive_path)) for _ in range(repeat)]
+
+
+@benchmark('unpack_archive')
+def bench_unpack_archive(ctx: Context, profile: str, repeat: int) -> list:
+    package_dir, _ = ctx.get_package(profile)
+    archive_path = os.path.join(ctx.create_dir('archive'), 'package.zip')
+    pack_archive(package_dir, archive_path)
+
+    times = []
+    for _ in range(repeat):
+        dst_dir = ctx.create_dir('unpacked')
+        times.append(measure(lambda: unpack_archive(archive_path, dst_dir)))
+        rmtree(dst_dir)
+
+    return times
+
+
+@benchmark('publish')
+def bench_publish(ctx: Context, profile: str, repeat: int) -> list:
+    times = []
+    for i in range(repeat):
+        dependency = ctx.create_dependency(profile, version='2.%d' % i)
+        times.append(measure(lambda: dependency.publish()))
+        rmtree(dependency.get_artifact_dir())
+
+    return times
+
+
+@benchmark('download')
+def bench_download(ctx: Context, profile: str, repeat: int) -> list:
+    dependency = ctx.create_dependency(profile, version='3.0')
+    dependency.publish()
+
+    times = []
+    for _ in range(repeat):
+        rmtree(dependency.get_artifact_dir())
+        dependency.invalidate_cache()
+        times.append(measure(lambda: dependency.download()))
+
+    rmtree(dependency.get_artifact_dir())
+
+    return times
+
+
+@benchmark('update')
+def bench_update(ctx: Context, profile: str, repeat: int) -> list:
+    ctx.create_dependency(profile, version='4.0').publish()
+
+    times = []
+    for _ in range(repeat):
+        # a new working directory and not installed package
+        dependency = ctx.create_dependency(profile, version='4.0', working_dir=ctx.create_dir('working-dir'))
+        rmtree(dependency.get_artifact_dir())
+        dependency.invalidate_cache()
+
+        times.append(measure(lambda: dependency.update()))
+        rmtree(os.path.join(ctx.tmp_dir, dependency.working_dir))
+
+    rmtree(dependency.get_artifact_dir())
+
+    return times
+
+
+@benchmark('status')
+def bench_status(ctx: Context, profile: str, repeat: int) -> list:
+    """Compares an unchanged working directory with the installed package."""
+    dependency = ctx.create_dependency(profile, version='5.0')
+    dependency.publish()
+    dependency.diff()
+
+    times = [measure(lambda: dependency.diff()) for _ in range(repeat)]
+    rmtree(dependency.get_artifact_dir())
+
+    return times
+
+
+@benchmark('read_files')
+def bench_read_files(ctx: Context, profile: str, repeat: int) -> list:
+    """One epoch over the package files with "get_path()" and blocking reads (baseline for "iter_files")."""
+    dependency = ctx.create_dependency(profile, version='6.0', working_dir=ctx.create_dir('empty-working-dir'))
+    ctx.create_dependency(profile, version='6.0').publish()
+
+    def read_files():
+        for file_path in dependency.get_package_info().files:
+            with open(dependency.get_path(file_path), 'rb') as f:
+                f.read()
+
+    times = [measure(read_files) for _ in range(repeat)]
+    rmtree(dependency.get_artifact_dir())
+
+    return times
+
+
+@benchmark('iter_files')
+def bench_iter_files(ctx: Context, profile: str, repeat: int) -> list:
+    """One epoch over the package files with "iter_files()"."""
+    dependency = ctx.create_dependency(profile, version='7.0')
+    dependency.publish()
+
+    def read_files():
+        for _ in dependency.iter_files(prefetch=32):
+            pass
+
+    times = [measure(read_files) for _ in range(repeat)]
+    rmtree(dependency.get_artifact_dir())
+
+    return times
+
+
+@benchmark('get_path_load', profiled=False)
+def bench_get_path_load(ctx: Context, profile: str, repeat: int, num_threads: int = 8,
+                        calls_per_thread: int = 10000) -> list:
+    """Resolves paths from several threads at the same time, durations are per one call."""
+    num_files = max(1, int(100000 * ctx.scale))
+    dependency = create_get_path_dependency(ctx.create_dir('get-path'), num_files)
+
+    def resolve(thread_id: int):
+        for i in range(calls_per_thread):
+            file_id = (thread_id * calls_per_thread + i) * 7919 % num_files
+            dependency.get_path('dir%d/file%d.txt' % (file_id % 100, file_id))
+
+    def run_threads():
+        threads = [threading.Thread(target=resolve, args=(i,)) for i in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return [measure(run_threads) / (num_threads * calls_per_thread) for _ in range(repeat)]
+
+
+@benchmark('get_paths', profiled=False)
+def bench_get_paths(ctx: Context, profile: str, repeat: int, num_calls: int = 50000) -> list:
+    """Resolves paths of many files with one "get_paths()" call, durations are per one path."""
+    num_files = max(1, int(100000 * ctx.scale))
+    dependency = create_get_path_dependency(ctx.create_dir('get-paths'), num_files, sqlite_index=True)
+    file_paths = ['dir%d/file%d.txt' % (file_id % 100, file_id)
+                  for file_id in (i * 7919 % num_files for i in range(num_calls))]
+
+    return [measure(lambda: dependency.get_paths(file_paths)) / num_calls for _ in range(repeat)]
+
+
+@benchmark('dependency_manager', profiled=False)
+def bench_dependency_manager(ctx: Context, profile: str, repeat: int) -> list:
+    """Creates a manager for a big configuration file which is not cached yet."""
+    config_path = os.path.join(ctx.create_dir('config'), 'darty.yaml')
+    create_config(config_path, max(1, int(10000 * ctx.scale)))
+
+    def create_manager():
+        DependencyManager._config_cache.invalidate()
+        DependencyManager(config_path)
+
+    return [measure(create_manager) for _ in range(repeat)]
+
+
+@contextmanager
+def mock_s3():
+    """Starts a local S3 stand-in."""
+    try:
+        from moto import mock_aws as mock
+    except ImportError:
+        from moto import mock_s3 as mock
+
+    # moto doesn't decode streaming uploads with checksum trailers
+    os.environ.setdefault('AWS_REQUEST_CHECKSUM_CALCULATION', 'when_required')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+    with mock():
+        import boto3
+        boto3.resource('s3').create_bucket(Bucket='darty-benchmarks')
+        yield 'darty-benchmarks'
+
+
+def bench_s3_driver(ctx: Context, profile: str, repeat: int, driver_class, parameters: dict, upload: bool) -> list:
+    package_dir, _ = ctx.get_package(profile)
+    output = NullOutputWriter()
+
+    with mock_s3() as bucket_name:
+        driver = driver_class(bucket_name, parameters)
+        if not upload:
+            driver.upload_package('benchmarks', profile, '1.0', package_dir, output)
+
+        times = []
+        for i in range(repeat):
+            if upload:
+                times.append(measure(lambda: driver.upload_package('benchmarks', profile, '1.%d' % i,
+                                                                   package_dir, output)))
+            else:
+                dst_dir = ctx.create_dir('s3-download')
+                times.append(measure(lambda: driver.download_package('benchmarks', profile, '1.0', dst_dir, output)))
+                rmtree(dst_dir)
+
+    return times
+
+
+def register_s3_benchmarks():
+    from darty.drivers.s3.files.driver import S3FilesDriver
+    from darty.drivers.s3.zip.driver import S3ZipDriver
+
+    for name, driver_class, parameters in [('s3_files', S3FilesDriver, {}),
+                                           ('s3_zip', S3ZipDriver, {}),
+                                           ('s3_zip_deflated', S3ZipDriver, {'compression': 'deflated'})]:
+        for upload in (True, False):
+            def run(ctx, profile, repeat, driver_class=driver_class, parameters=parameters, upload=upload):
+                return bench_s3_driver(ctx, profile, repeat, driver_class, parameters, upload)
+
+            benchmark('%s_%s' % (name, 'upload' if upload else 'download'))(run)
+
+
+register_s3_benchmarks()
+
+
+def is_moto_installed() -> bool:
+    try:
+        import moto  # noqa: F401
+    except ImportError:
+        return False
+
+    return True
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names: list, profiles: list, scale: float, repeat: int, log=print) -> dict:
+    """Runs benchmarks and returns the results."""
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ctx = Context(tmp_dir, scale)
+
+        for name in names:
+            func, profiled = BENCHMARKS[name]
+
+            for profile in (profiles if profiled else [None]):
+                result = OrderedDict([('name', name), ('profile', profile)])
+
+                if name.startswith('s3_') and not is_moto_installed():
+                    result['skipped'] = 'moto is not installed'
+                    results.append(result)
+                    log('%-28s %-12s skipped (%s)' % (name, profile or '', result['skipped']))
+                    continue
+
+                times = func(ctx, profile, repeat)
+                result['times'] = times
+                result['min'] = min(times)
+                result['median'] = statistics.median(times)
+
+                if profiled:
+                    _, files = ctx.get_package(profile)
+                    result['files'] = len(files)
+                    result['bytes'] = sum(size for _, size in files)
+                    result['throughput_mb_s'] = result['bytes'] / result['median'] / 1024 / 1024
+
+                results.append(result)
+
+                log('%-28s %-12s median %10.3f ms%s' % (
+                    name, profile or '', result['median'] * 1000,
+                    ('  %8.1f MB/s' % result['throughput_mb_s']) if 'throughput_mb_s' in result else ''))
+
+    return OrderedDict([
+        ('meta', OrderedDict([
+            ('timestamp', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())),
+            ('git_commit', get_git_commit()),
+            ('python', sys.version.split()[0]),
+            ('platform', platform.platform()),
+            ('cpu_count', os.cpu_count()),
+            ('scale', scale),
+            ('repeat', repeat),
+        ])),
+        ('results', results),
+    ])
+
+
+def select(patterns: str, names) -> list:
+    """Selects names which match comma-separated glob patterns."""
+    if not patterns:
+        return list(names)
+
+    selected = [name for name in names if any(fnmatchcase(name, pattern.strip()) for pattern in patterns.split(','))]
+    if not selected:
+        raise ValueError('Nothing matches "%s"' % patterns)
+
+    return selected
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', type=str, default=None, help='Path to a JSON file for the results')
+    parser.add_argument('--benchmarks', type=str, default=None,
+                        help='Comma-separated glob patterns of benchmarks to run (all by default): %s'
+                             % ', '.join(BENCHMARKS))
+    parser.add_argument('--profiles', type=str, default=None,
+                        help='Comma-separated package profiles (all by default): %s' % ', '.join(sorted(PROFILES)))
+    parser.add_argument('--scale', type=float, default=1.0, help='Scale of the generated packages')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of repetitions')
+    args = parser.parse_args()
+
+    try:
+        names = select(args.benchmarks, BENCHMARKS)
+        profiles = select(args.profiles, sorted(PROFILES))
+    except ValueError as e:
+        parser.error(str(e))
+
+    results = run_benchmarks(names, profiles, args.scale, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
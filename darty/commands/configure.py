@@ -19,6 +19,10 @@ class ConfigureCommand(AbstractCommand):
         # ask the user to update Darty config
         inputs = [
             ('packages_dir', 'Directory where all the packages will be stored [%s]: '),
+            ('max_size', 'Maximum size of the packages directory, for example "20G" (empty for no limit) [%s]: '),
+            ('max_bandwidth', 'Maximum transfer speed in bytes per second, for example "50M" (empty for no limit) '
+                              '[%s]: '),
+            ('max_connections', 'Maximum number of objects transferred at the same time (empty for no limit) [%s]: '),
             # TODO: include settings necessary for drivers
         ]
 
@@ -0,0 +1,66 @@
+import os
+from argparse import Namespace, ArgumentParser
+from darty.commands.abstract import AbstractCommand
+from darty.helpers.commands import get_managers
+from darty.metrics import format_size
+from darty.output_writer import AbstractOutputWriter
+from darty.package.dependency import Dependency
+from darty.package.storage import collect_garbage
+from darty.utils import parse_size
+
+
+class GcCommand(AbstractCommand):
+
+    DEFAULT_TMP_MAX_AGE = 24  # hours
+
+    @staticmethod
+    def get_command_name():
+        return 'gc'
+
+    @staticmethod
+    def get_description():
+        return 'Remove unused packages from the packages directory'
+
+    def configure(self, subparser: ArgumentParser):
+        subparser.add_argument('-c', '--config', type=str, action='append', default=[],
+                               help='Path or a glob pattern of configuration files whose packages must be kept '
+                                    '(can be used several times)')
+        subparser.add_argument('--py-package', type=str, action='append', default=[],
+                               help='Name or a glob pattern of Python packages whose packages must be kept '
+                                    '(can be used several times)')
+        subparser.add_argument('--max-size', type=str, default=None,
+                               help='Maximum size of the packages directory, for example "20G" '
+                                    '(the "max_size" setting is used by default)')
+        subparser.add_argument('--tmp-max-age', type=float, default=self.DEFAULT_TMP_MAX_AGE,
+                               help='Remove temporary packages older than this number of hours [%d]'
+                                    % self.DEFAULT_TMP_MAX_AGE)
+        subparser.add_argument('--local-max-age', type=float, default=None,
+                               help='Remove locally published packages which were not used for this number of days')
+        subparser.add_argument('-n', '--dry-run', action='store_true',
+                               help='Only show the packages which would be removed')
+
+    def run(self, args: Namespace, settings: dict, output: AbstractOutputWriter):
+        packages_dir = os.path.expanduser(settings['packages_dir'])
+
+        max_size = args.max_size if args.max_size is not None else settings.get('max_size')
+        max_size = parse_size(max_size) if max_size else None
+
+        # packages referenced by the configuration files
+        keep = set()
+        for manager in get_managers(args.config, args.py_package, args.profile):
+            for dependency in manager.dependencies.values():
+                for env in (Dependency.ENV_PRODUCTION, Dependency.ENV_LOCAL, Dependency.ENV_TMP):
+                    keep.add(dependency.get_artifact_dir(env))
+
+        if not os.path.isdir(packages_dir):
+            output.write('Packages directory "%s" doesn\'t exist' % packages_dir)
+            return True
+
+        removed = collect_garbage(packages_dir, max_size, keep, tmp_max_age=args.tmp_max_age * 3600,
+                                  local_max_age=args.local_max_age * 86400 if args.local_max_age is not None else None,
+                                  dry_run=args.dry_run, output=output)
+
+        output.write('%s %d packages, %s' % ('Would remove' if args.dry_run else 'Removed', len(removed),
+                                             format_size(sum(artifact.size for artifact in removed))))
+
+        return True
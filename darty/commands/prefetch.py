@@ -0,0 +1,58 @@
+import time
+from argparse import Namespace, ArgumentParser
+from darty.commands.abstract import AbstractCommand
+from darty.helpers.commands import get_managers
+from darty.output_writer import AbstractOutputWriter
+from darty.package.repository import RepositoryPool
+from darty.workspace import PackageInstall, PackageInstaller, get_unique_dependencies, get_summary, \
+    write_summary, validate_jobs
+
+
+class PrefetchCommand(AbstractCommand):
+
+    DEFAULT_JOBS = 4
+
+    @staticmethod
+    def get_command_name():
+        return 'prefetch'
+
+    @staticmethod
+    def get_description():
+        return 'Download dependencies of several projects or Python packages without updating working directories'
+
+    def configure(self, subparser: ArgumentParser):
+        subparser.add_argument('-c', '--config', type=str, action='append', default=[],
+                               help='Path or a glob pattern of configuration files (can be used several times)')
+        subparser.add_argument('--py-package', type=str, action='append', default=[],
+                               help='Name or a glob pattern of Python packages that contain Darty configuration '
+                                    'files (can be used several times)')
+        subparser.add_argument('-j', '--jobs', type=int, default=self.DEFAULT_JOBS,
+                               help='Number of packages downloaded at the same time [%d]' % self.DEFAULT_JOBS)
+
+    def run(self, args: Namespace, settings: dict, output: AbstractOutputWriter):
+        if not args.config and not args.py_package:
+            raise ValueError('At least one configuration file or Python package must be specified')
+
+        validate_jobs(args.jobs)
+
+        # merge dependencies of all the projects
+        managers = get_managers(args.config, args.py_package, args.profile, RepositoryPool())
+        dependencies = get_unique_dependencies(managers)
+        if not dependencies:
+            output.write('No dependencies found')
+            return True
+
+        # the same pipeline as the "update" command uses, but working directories are not updated
+        installs = [PackageInstall(dependency) for dependency in dependencies]
+        installer = PackageInstaller(args.jobs, update_working_dirs=False)
+
+        start_time = time.perf_counter()
+        for install in installer.run(installs):
+            install.flush(output)
+
+        summary = get_summary(installs, time.perf_counter() - start_time)
+
+        output.write('')
+        write_summary(summary, output)
+
+        return not summary['failed']
@@ -0,0 +1,58 @@
+import os
+from argparse import Namespace, ArgumentParser
+from darty.commands.abstract import AbstractCommand
+from darty.helpers.commands import get_managers
+from darty.output_writer import AbstractOutputWriter
+from darty.utils import parse_size
+
+
+class ServeCommand(AbstractCommand):
+
+    DEFAULT_HOST = '0.0.0.0'
+    DEFAULT_PORT = 8417
+
+    @staticmethod
+    def get_command_name():
+        return 'serve'
+
+    @staticmethod
+    def get_description():
+        return 'Serve installed packages over HTTP to other hosts (a peer cache)'
+
+    def configure(self, subparser: ArgumentParser):
+        subparser.add_argument('--host', type=str, default=self.DEFAULT_HOST,
+                               help='Address to listen on [%s]' % self.DEFAULT_HOST)
+        subparser.add_argument('--port', type=int, default=self.DEFAULT_PORT,
+                               help='Port to listen on [%d]' % self.DEFAULT_PORT)
+        subparser.add_argument('--no-fetch', action='store_true',
+                               help='Serve only installed packages, don\'t download missing packages '
+                                    'from the repositories')
+        subparser.add_argument('-c', '--config', type=str, action='append', default=[],
+                               help='Path or a glob pattern of configuration files whose repositories are used '
+                                    'to download missing packages with driver parameters (can be used several times)')
+        subparser.add_argument('--py-package', type=str, action='append', default=[],
+                               help='Name or a glob pattern of Python packages whose repositories are used '
+                                    'to download missing packages (can be used several times)')
+
+    def run(self, args: Namespace, settings: dict, output: AbstractOutputWriter):
+        from darty.server import PackageServer, get_repositories
+
+        packages_dir = os.path.expanduser(settings['packages_dir'])
+        packages_quota = parse_size(settings['max_size']) if settings.get('max_size') else None
+        repositories = get_repositories(get_managers(args.config, args.py_package, args.profile))
+
+        try:
+            server = PackageServer((args.host, args.port), packages_dir, not args.no_fetch, repositories,
+                                   packages_quota, output)
+        except OSError as e:
+            raise ValueError('Can\'t listen on %s:%d: %s' % (args.host, args.port, e.strerror or str(e)))
+
+        output.write('Serving packages from "%s" on http://%s:%d/' % (packages_dir, args.host, server.server_port))
+
+        with server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                output.write('Stopped')
+
+        return True
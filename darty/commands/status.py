@@ -0,0 +1,58 @@
+from argparse import Namespace, ArgumentParser
+from darty.commands.abstract import AbstractCommand
+from darty.dependency_manager import DependencyManager
+from darty.helpers.commands import get_dependencies_by_name
+from darty.output_writer import AbstractOutputWriter
+
+
+class StatusCommand(AbstractCommand):
+
+    @staticmethod
+    def get_command_name():
+        return 'status'
+
+    @staticmethod
+    def get_description():
+        return 'Show changes in working directories relative to installed packages'
+
+    def configure(self, subparser: ArgumentParser):
+        subparser.add_argument('-c', '--config', type=str, help='Path to the model\'s config file', default=None)
+        subparser.add_argument('--group', type=str, help='Group name of the package to check', default=None)
+        subparser.add_argument('--artifact', type=str, help='Artifact name of the package to check', default=None)
+
+    def run(self, args: Namespace, settings: dict, output: AbstractOutputWriter):
+        # instantiate the manager
+        manager = DependencyManager(args.config, args.profile)
+
+        # only dependencies with working directories can be changed
+        dependencies = [dependency for dependency in get_dependencies_by_name(manager, args.group, args.artifact)
+                        if dependency.working_dir]
+
+        if not dependencies:
+            output.write('No dependencies with working directories found')
+            return True
+
+        for dependency in dependencies:
+            output.write('Package "%s:%s:%s" (working directory "%s"):'
+                         % (dependency.group, dependency.artifact, dependency.version, dependency.working_dir))
+
+            with output.indent():
+                try:
+                    package_diff = dependency.diff()
+                except ValueError as e:
+                    output.write('[-] ' + str(e))
+                    continue
+
+                for file_path in package_diff.added:
+                    output.write('added:    %s' % file_path)
+                for file_path in package_diff.modified:
+                    output.write('modified: %s' % file_path)
+                for file_path in package_diff.deleted:
+                    output.write('deleted:  %s' % file_path)
+
+                if not any(package_diff):
+                    output.write('No changes')
+
+            output.write('')
+
+        return True
@@ -1,3 +1,4 @@
+import time
 from argparse import Namespace, ArgumentParser
 from darty.commands.abstract import AbstractCommand
 from darty.dependency_manager import DependencyManager
@@ -20,8 +21,19 @@ class UpdateCommand(AbstractCommand):
         subparser.add_argument('--group', type=str, help='Group name of the package to update', default=None)
         subparser.add_argument('--artifact', type=str, help='Artifact name of the package to update', default=None)
         subparser.add_argument('-r', '--rewrite', action='store_true', help='Rewrite working directories')
+        subparser.add_argument('-w', '--workspace', type=str, default=None,
+                               help='Update all the projects with configuration files under this directory')
+        subparser.add_argument('-j', '--jobs', type=int, default=4,
+                               help='Number of packages downloaded at the same time [4]')
 
     def run(self, args: Namespace, settings: dict, output: AbstractOutputWriter):
+        from darty.workspace import PackageInstall, PackageInstaller, get_summary, write_summary, validate_jobs
+
+        validate_jobs(args.jobs)
+
+        if args.workspace:
+            return self._update_workspace(args, output)
+
         # instantiate the manager
         manager = DependencyManager(args.config, args.profile)
 
@@ -30,8 +42,39 @@ class UpdateCommand(AbstractCommand):
 
         if not dependencies:
             output.write('No dependencies found')
-        else:
-            # update dependencies
-            for dependency in dependencies:
-                dependency.update(args.rewrite, output)
-                output.write('')
+            return True
+
+        # packages are downloaded while the previous ones are installed and copied,
+        # a single package writes its output (and the progress of its download) directly
+        live_output = output if len(dependencies) == 1 else None
+        installs = [PackageInstall(dependency, output=live_output) for dependency in dependencies]
+
+        start_time = time.perf_counter()
+        for install in PackageInstaller(args.jobs, args.rewrite).run(installs):
+            install.flush(output)
+            output.write('')
+
+        summary = get_summary(installs, time.perf_counter() - start_time)
+        write_summary(summary, output)
+
+        return not summary['failed']
+
+    @staticmethod
+    def _update_workspace(args: Namespace, output: AbstractOutputWriter):
+        from darty.workspace import Workspace, write_summary
+
+        if args.config or args.group or args.artifact:
+            raise ValueError('Workspace mode can\'t be used with "--config", "--group" or "--artifact" arguments')
+
+        workspace = Workspace(args.workspace, args.profile)
+        if not workspace.managers:
+            output.write('No configuration files found')
+            return True
+
+        summary = workspace.update(args.rewrite, args.jobs, output)
+
+        output.write('')
+        output.write('Projects: %d, failed: %d' % (len(workspace.managers), summary['failed_projects']))
+        write_summary(summary, output)
+
+        return not summary['failed_projects']
@@ -0,0 +1,57 @@
+import os
+from argparse import Namespace, ArgumentParser
+from darty.commands.abstract import AbstractCommand
+from darty.helpers.commands import get_managers, get_installed_dependencies
+from darty.output_writer import AbstractOutputWriter
+from darty.package.repository import RepositoryPool
+from darty.workspace import get_unique_dependencies
+
+
+class VerifyCommand(AbstractCommand):
+
+    @staticmethod
+    def get_command_name():
+        return 'verify'
+
+    @staticmethod
+    def get_description():
+        return 'Check that files of installed packages were not changed'
+
+    def configure(self, subparser: ArgumentParser):
+        subparser.add_argument('-c', '--config', type=str, action='append', default=[],
+                               help='Path or a glob pattern of configuration files whose packages must be checked, '
+                                    'all installed packages are checked by default (can be used several times)')
+        subparser.add_argument('--py-package', type=str, action='append', default=[],
+                               help='Name or a glob pattern of Python packages whose packages must be checked '
+                                    '(can be used several times)')
+        subparser.add_argument('--deep', action='store_true',
+                               help='Rehash the files instead of comparing their sizes and modification times')
+        subparser.add_argument('--repair', action='store_true',
+                               help='Download broken files again and remove files which don\'t belong to packages')
+        subparser.add_argument('-j', '--jobs', type=int, default=None,
+                               help='Number of threads or processes [number of CPUs]')
+
+    def run(self, args: Namespace, settings: dict, output: AbstractOutputWriter):
+        if args.jobs is not None and args.jobs < 1:
+            raise ValueError('Number of jobs must be positive')
+
+        if args.config or args.py_package:
+            managers = get_managers(args.config, args.py_package, args.profile, RepositoryPool())
+            dependencies = [dependency for dependency in get_unique_dependencies(managers)
+                            if dependency.get_package_info()]
+        else:
+            packages_dir = os.path.expanduser(settings['packages_dir'])
+            dependencies = get_installed_dependencies(packages_dir) if os.path.isdir(packages_dir) else []
+
+        if not dependencies:
+            output.write('No installed packages found')
+            return True
+
+        num_failed = 0
+        for dependency in dependencies:
+            num_failed += int(not dependency.verify(args.deep, args.repair, args.jobs, output))
+            output.write('')
+
+        output.write('Packages: %d, %s: %d' % (len(dependencies), 'failed' if args.repair else 'broken', num_failed))
+
+        return not num_failed
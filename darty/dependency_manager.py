@@ -1,12 +1,17 @@
-import yaml
 import os
+import threading
+from bisect import bisect_left
 from collections import OrderedDict
+from collections.abc import Mapping
 
+from darty import tracing
+from darty.helpers.file_cache import FileCache
 from darty.helpers.validation import validate_dependency_config
+from darty.output_writer import AbstractOutputWriter
 from darty.package.dependency import Dependency
-from darty.package.repository import Repository
+from darty.package.repository import Repository, RepositoryPool
 from darty.settings import get_settings
-from darty.utils import file_exists
+from darty.utils import file_exists, parse_size
 
 
 class DependencyManager(object):
@@ -14,8 +19,12 @@ class DependencyManager(object):
 
     DEFAULT_CONFIG_FILE = 'darty.yaml'
     DEFAULT_DARTY_PROFILE = 'default'
+    DEFAULT_MAX_CONCURRENT_DOWNLOADS = 4
 
-    def __init__(self, config_path: str = None, darty_profile: str = None):
+    # parsed and validated configuration files
+    _config_cache = FileCache()
+
+    def __init__(self, config_path: str = None, darty_profile: str = None, repository_pool: RepositoryPool = None):
         if not config_path:
             config_path = self.DEFAULT_CONFIG_FILE
 
@@ -29,12 +38,10 @@ class DependencyManager(object):
         # get packages directory
         settings = get_settings(darty_profile)
         packages_dir = os.path.expanduser(settings['packages_dir'])
+        packages_quota = parse_size(settings['max_size']) if settings.get('max_size') else None
 
         # read a config file
-        with open(config_path, 'r') as f:
-            config = yaml.load(f)
-
-        config = validate_dependency_config(config)
+        config = self._config_cache.get(os.path.abspath(config_path), self._load_config)
 
         project_dir = os.path.dirname(config_path)  # project directory
 
@@ -48,12 +55,18 @@ class DependencyManager(object):
         repositories = {}
         for rep_name, rep_config in config['repositories'].items():
             try:
-                repositories[rep_name] = Repository(rep_config)
+                repositories[rep_name] = repository_pool.get(rep_config) if repository_pool else Repository(rep_config)
             except ValueError as e:
                 raise ValueError('Repository "%s": %s' % (rep_name, str(e)))
 
-        # creating dependency objects
-        self._dependencies = OrderedDict()
+        # validating all the dependencies, objects are created on the first access
+        def create_dependency(dep_config: dict, repository_name: str):
+            dependency = Dependency(dep_config, repositories[repository_name], packages_dir, project_dir)
+            dependency.packages_quota = packages_quota
+
+            return dependency
+
+        self._dependencies = DependencyIndex(create_dependency)
 
         for i, dep_config in enumerate(config['dependencies']):
             # get repository object
@@ -61,44 +74,73 @@ class DependencyManager(object):
             if repository_name not in repositories:
                 raise ValueError('Repository "%s" doesn\'t exist' % repository_name)
 
-            # create an object for dependency
+            # check the dependency configuration
             try:
-                dependency = Dependency(dep_config, repositories[repository_name], packages_dir, project_dir)
+                Dependency.validate_config(dep_config)
             except ValueError as e:
                 raise ValueError('Dependency #%d: %s' % (i + 1, str(e)))
 
-            key = self._get_dependency_key(dependency.group, dependency.artifact)
+            key = self._get_dependency_key(dep_config['group'], dep_config['artifact'])
 
             if key in self._dependencies:
                 raise ValueError('Config contains two dependencies with the same name: "%s:%s"'
-                                 % (dependency.group, dependency.artifact))
+                                 % (dep_config['group'], dep_config['artifact']))
 
-            self._dependencies[key] = dependency
+            self._dependencies.add(key, dep_config, repository_name)
 
         # TODO:
         # check that dependencies with the same working directories
         # always contain "files" parameter and files are not overlapped
 
+        # state of the asyncio API: (event loop, semaphore, running downloads with the numbers of waiting tasks)
+        self.max_concurrent_downloads = self.DEFAULT_MAX_CONCURRENT_DOWNLOADS
+        self._async_state = None
+
+    @staticmethod
+    def _load_config(config_path: str) -> dict:
+        """Reads and validates a configuration file.
+        The result is cached, so it must not be modified.
+        """
+        with tracing.span('parse_config', path=config_path):
+            import yaml
+
+            # C implementation of the loader is much faster if it's available
+            loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+            with open(config_path, 'r') as f:
+                config = yaml.load(f, Loader=loader)
+
+        with tracing.span('validate_config', path=config_path):
+            return validate_dependency_config(config)
+
     @property
     def dependencies(self):
         return self._dependencies
 
     @classmethod
-    def from_py_package(cls, package_name: str, config_path: str = None, darty_profile: str = None):
+    def from_py_package(cls, package_name: str, config_path: str = None, darty_profile: str = None,
+                        repository_pool: RepositoryPool = None):
         """Creates an instance of DependencyManager by Python package name.
         It automatically finds a path to dependency file within a Python package.
 
         :param package_name:
         :param config_path:
         :param darty_profile:
+        :param repository_pool: repositories shared with other managers
         :return:
         """
-        import pkg_resources
+        from importlib.util import find_spec
 
         if not config_path:
             config_path = cls.DEFAULT_CONFIG_FILE
 
-        return cls(pkg_resources.resource_filename(package_name, config_path), darty_profile)
+        spec = find_spec(package_name)
+        if not spec or not spec.submodule_search_locations:
+            raise ImportError('Python package "%s" not found' % package_name)
+
+        package_dir = list(spec.submodule_search_locations)[0]
+
+        return cls(os.path.join(package_dir, config_path), darty_profile, repository_pool)
 
     def get_path(self, group: str, artifact: str, file_path: str = None):
         dependency = self.get_dependency_by_name(group, artifact)
@@ -107,6 +149,158 @@ class DependencyManager(object):
 
         return dependency.get_path(file_path)
 
+    def get_paths(self, items: list, return_exceptions: bool = False) -> list:
+        """Batch version of the "get_path()" method.
+
+        :param items: list of (group, artifact, file_path) tuples, "file_path" can be None
+        :param return_exceptions: return exceptions in place of the paths instead of raising the first one
+        :return: list of paths (or exceptions) in the same order as the items
+        """
+        res = [None] * len(items)
+
+        # group the files by packages, so every package info is loaded once
+        packages = OrderedDict()
+        for i, (group, artifact, file_path) in enumerate(items):
+            packages.setdefault((group, artifact), []).append((i, file_path))
+
+        for (group, artifact), package_items in packages.items():
+            dependency = self.get_dependency_by_name(group, artifact)
+            if dependency:
+                paths = dependency.get_paths([file_path for _, file_path in package_items], return_exceptions=True)
+            else:
+                error = ValueError('The package "%s:%s" was not found in the configuration file' % (group, artifact))
+                paths = [error] * len(package_items)
+
+            for (i, _), path in zip(package_items, paths):
+                res[i] = path
+
+        if not return_exceptions:
+            for path in res:
+                if isinstance(path, Exception):
+                    raise path
+
+        return res
+
+    def iter_files(self, group: str, artifact: str, pattern: str = None, prefetch: int = 16, shuffle: bool = False,
+                   seed=None, open_files: bool = False):
+        """Yields (relative path, content) pairs for the package files, the files are read ahead
+        by a pool of threads (see "Dependency.iter_files()").
+        """
+        dependency = self.get_dependency_by_name(group, artifact)
+        if not dependency:
+            raise ValueError('The package "%s:%s" was not found in the configuration file' % (group, artifact))
+
+        return dependency.iter_files(pattern, prefetch, shuffle, seed, open_files)
+
+    async def get_path_async(self, group: str, artifact: str, file_path: str = None):
+        """Asyncio version of the "get_path()" method.
+        The package is downloaded first if it's not installed yet.
+        """
+        from darty.helpers.aio import run_sync
+
+        await self.ensure(group, artifact)
+
+        return await run_sync(self.get_dependency_by_name(group, artifact).get_path, file_path)
+
+    async def ensure(self, group: str, artifact: str, output: AbstractOutputWriter = None):
+        """Downloads the package if it's not installed yet and returns the package info.
+        Concurrent calls for the same package share one download. Cancelling the calling task
+        doesn't cancel a download, because other tasks can wait for it.
+
+        :raises ValueError: if the package is not specified in the configuration file or can't be downloaded
+        """
+        import asyncio
+
+        dependency = self.get_dependency_by_name(group, artifact)
+        if not dependency:
+            raise ValueError('The package "%s:%s" was not found in the configuration file' % (group, artifact))
+
+        package_info = await asyncio.shield(self._download_async(dependency, output))
+        if not package_info:
+            raise ValueError('Package "%s:%s:%s" can\'t be downloaded'
+                             % (dependency.group, dependency.artifact, dependency.version))
+
+        return package_info
+
+    async def download_all(self, concurrency: int = None, output: AbstractOutputWriter = None) -> list:
+        """Downloads all the dependencies concurrently.
+        If the calling task is cancelled, the downloads are cancelled too, except the downloads
+        other tasks wait for (see "ensure()").
+
+        :param concurrency: maximum number of packages downloaded at the same time
+        :param output:
+        :return: package infos in the same order as dependencies ("None" if the download failed)
+        """
+        import asyncio
+
+        # the downloads started by this call are limited only by its own semaphore
+        semaphore = asyncio.Semaphore(concurrency or self.max_concurrent_downloads)
+
+        # packages with higher priorities are started first
+        dependencies = list(self._dependencies.values())
+        tasks = [None] * len(dependencies)
+        for i in sorted(range(len(dependencies)), key=lambda i: -dependencies[i].priority):
+            tasks[i] = asyncio.ensure_future(self._download_async(dependencies[i], output, semaphore))
+
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _download_async(self, dependency: Dependency, output: AbstractOutputWriter = None,
+                              semaphore=None):
+        """Downloads a package, concurrent downloads of the same package are merged into one.
+
+        A merged download has its own task: if a waiting task is cancelled, the download
+        is cancelled only if no other task waits for it.
+
+        :param semaphore: semaphore which limits the download if it's started by this call,
+                          the manager's semaphore (see "max_concurrent_downloads") by default
+        """
+        import asyncio
+
+        # installed packages don't need a task
+        package_info = dependency.get_package_info()
+        if package_info:
+            return package_info
+
+        loop = asyncio.get_event_loop()
+        if not self._async_state or self._async_state[0] is not loop:
+            self._async_state = (loop, asyncio.Semaphore(self.max_concurrent_downloads), {})
+
+        _, default_semaphore, downloads = self._async_state
+        if semaphore is None:
+            semaphore = default_semaphore
+
+        async def download():
+            try:
+                async with semaphore:
+                    return await dependency.download_async(output)
+            finally:
+                downloads.pop(key, None)
+
+        key = self._get_dependency_key(dependency.group, dependency.artifact)
+        if key not in downloads:
+            # the task and the number of tasks waiting for it
+            downloads[key] = [asyncio.ensure_future(download()), 0]
+
+        shared = downloads[key]
+        shared[1] += 1
+        try:
+            return await asyncio.shield(shared[0])
+        except asyncio.CancelledError:
+            if shared[1] == 1:
+                shared[0].cancel()
+                await asyncio.gather(shared[0], return_exceptions=True)
+
+            raise
+        finally:
+            shared[1] -= 1
+
     def get_dependency_by_name(self, group: str, artifact: str) -> Dependency:
         """Returns dependency object by group and artifact name or "None" if the dependency is not specified.
 
@@ -126,13 +320,101 @@ class DependencyManager(object):
         :param artifact:
         :return: [Dependency]
         """
-        res = []
-        for key, dependency in self._dependencies.items():
-            if dependency.artifact == artifact:
-                res.append(dependency)
+        return [self._dependencies[key] for key in self._dependencies.get_keys_by_artifact(artifact)]
 
-        return res
+    def search_dependencies_by_group(self, group: str) -> list:
+        """Finds dependencies by group name or by a parent group name
+        (for example, "group1" matches both "group1" and "group1.subgroup1").
+
+        :param group:
+        :return: [Dependency]
+        """
+        return [self._dependencies[key] for key in self._dependencies.get_keys_by_group(group)]
+
+    def get_dependencies_by_repository(self, repository_name: str) -> list:
+        """Returns dependencies which belong to the repository.
+
+        :param repository_name:
+        :return: [Dependency]
+        """
+        return [self._dependencies[key] for key in self._dependencies.get_keys_by_repository(repository_name)]
 
     def _get_dependency_key(self, group, artifact):
         """Returns a unique key for dependency for faster lookups."""
         return group + '.' + artifact
+
+
+class DependencyIndex(Mapping):
+    """Ordered mapping of dependency keys to dependency objects.
+    Objects are created on the first access, lookups by artifact, group and repository are indexed.
+    """
+
+    def __init__(self, factory):
+        """
+        :param factory: function which creates a dependency object from its configuration and a repository name
+        """
+        self._factory = factory
+        self._lock = threading.Lock()
+
+        self._configs = OrderedDict()
+        self._positions = {}
+        self._objects = {}
+
+        self._keys_by_artifact = {}
+        self._keys_by_group = {}
+        self._keys_by_repository = {}
+        self._sorted_groups = None
+
+    def add(self, key: str, config: dict, repository_name: str):
+        self._configs[key] = (config, repository_name)
+        self._positions[key] = len(self._positions)
+
+        self._keys_by_artifact.setdefault(config['artifact'], []).append(key)
+        self._keys_by_group.setdefault(config['group'], []).append(key)
+        self._keys_by_repository.setdefault(repository_name, []).append(key)
+        self._sorted_groups = None
+
+    def __getitem__(self, key: str) -> Dependency:
+        dependency = self._objects.get(key)
+        if dependency is None:
+            config, repository_name = self._configs[key]
+
+            with self._lock:
+                dependency = self._objects.get(key)
+                if dependency is None:
+                    dependency = self._factory(config, repository_name)
+                    self._objects[key] = dependency
+
+        return dependency
+
+    def __contains__(self, key) -> bool:
+        return key in self._configs
+
+    def __iter__(self):
+        return iter(self._configs)
+
+    def __len__(self) -> int:
+        return len(self._configs)
+
+    def get_keys_by_artifact(self, artifact: str) -> list:
+        return list(self._keys_by_artifact.get(artifact, []))
+
+    def get_keys_by_group(self, group: str) -> list:
+        if self._sorted_groups is None:
+            self._sorted_groups = sorted(self._keys_by_group)
+
+        # subgroups go right after the group itself in the sorted list
+        keys = list(self._keys_by_group.get(group, []))
+        subgroup_prefix = group + '.'
+        for i in range(bisect_left(self._sorted_groups, subgroup_prefix), len(self._sorted_groups)):
+            subgroup = self._sorted_groups[i]
+            if not subgroup.startswith(subgroup_prefix):
+                break
+
+            keys += self._keys_by_group[subgroup]
+
+        # keep the order of dependencies in the configuration file
+        return sorted(keys, key=self._positions.get)
+
+    def get_keys_by_repository(self, repository_name: str) -> list:
+        return list(self._keys_by_repository.get(repository_name, []))
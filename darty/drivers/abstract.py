@@ -18,12 +18,63 @@ class AbstractDriver(ABC):
         """Downloads the package from a repository to the temporary directory."""
         pass
 
+    def download_verified_package(self, group: str, artifact: str, version: str,
+                                  tmp_artifact_dir: str, output: AbstractOutputWriter, digests):
+        """Downloads the package and records digests of the files while they are written to disk
+        (see "PackageDigests"), so the package is verified without reading the files again.
+        If a driver doesn't override this method, the downloaded files are read to verify them.
+        """
+        self.download_package(group, artifact, version, tmp_artifact_dir, output)
+
+    def download_files(self, group: str, artifact: str, version: str, file_paths: list,
+                       tmp_artifact_dir: str, output: AbstractOutputWriter, digests):
+        """Downloads particular files of the package (paths within the "data" directory) to the temporary
+        directory, it's used to repair installed packages. Drivers which can't fetch single files
+        download the whole package.
+        """
+        self.download_verified_package(group, artifact, version, tmp_artifact_dir, output, digests)
+
     @abstractmethod
     def upload_package(self, group: str, artifact: str, version: str,
                        tmp_artifact_dir: str, output: AbstractOutputWriter):
         """Uploads the package from the temporary directory to a repository."""
         pass
 
+    def probe(self) -> bool:
+        """Sends the cheapest request to the storage, it's used to measure the latency of mirrors.
+
+        :return: False if the driver doesn't support probing
+        :raises DriverError: if the storage is not available
+        """
+        return False
+
+
+class AbstractAsyncDriver(ABC):
+    """
+    Asyncio counterpart of the "AbstractDriver" class. Drivers which don't implement it natively
+    are adapted with "AsyncDriverAdapter", so their blocking methods run in an executor.
+    """
+    def __init__(self, root: str, parameters: dict = None):
+        self._root = root
+        self._params = parameters if parameters else {}
+
+    @abstractmethod
+    async def download_package(self, group: str, artifact: str, version: str,
+                               tmp_artifact_dir: str, output: AbstractOutputWriter):
+        """Downloads the package from a repository to the temporary directory."""
+        pass
+
+    async def download_verified_package(self, group: str, artifact: str, version: str,
+                                        tmp_artifact_dir: str, output: AbstractOutputWriter, digests):
+        """Asyncio version of the "AbstractDriver.download_verified_package()" method."""
+        await self.download_package(group, artifact, version, tmp_artifact_dir, output)
+
+    @abstractmethod
+    async def upload_package(self, group: str, artifact: str, version: str,
+                             tmp_artifact_dir: str, output: AbstractOutputWriter):
+        """Uploads the package from the temporary directory to a repository."""
+        pass
+
 
 class DriverError(Exception):
     def __init__(self, msg: str):
@@ -0,0 +1,28 @@
+from darty.drivers.abstract import AbstractAsyncDriver, AbstractDriver
+from darty.helpers.aio import run_sync
+from darty.output_writer import AbstractOutputWriter
+
+
+class AsyncDriverAdapter(AbstractAsyncDriver):
+    """Runs methods of a synchronous driver in an executor, so any driver can be used with asyncio."""
+
+    def __init__(self, driver: AbstractDriver, executor=None):
+        super().__init__(driver._root, driver._params)
+
+        self._driver = driver
+        self._executor = executor
+
+    async def download_package(self, group: str, artifact: str, version: str,
+                               tmp_artifact_dir: str, output: AbstractOutputWriter):
+        return await run_sync(self._driver.download_package, group, artifact, version, tmp_artifact_dir, output,
+                              executor=self._executor)
+
+    async def download_verified_package(self, group: str, artifact: str, version: str,
+                                        tmp_artifact_dir: str, output: AbstractOutputWriter, digests):
+        return await run_sync(self._driver.download_verified_package, group, artifact, version, tmp_artifact_dir,
+                              output, digests, executor=self._executor)
+
+    async def upload_package(self, group: str, artifact: str, version: str,
+                             tmp_artifact_dir: str, output: AbstractOutputWriter):
+        return await run_sync(self._driver.upload_package, group, artifact, version, tmp_artifact_dir, output,
+                              executor=self._executor)
@@ -1,19 +1,114 @@
-import pkg_resources
-from darty.drivers.abstract import AbstractDriver
-from darty.drivers.test.driver import TestDriver
+import json
+import os
+import threading
+from darty import tracing
+from darty.drivers.abstract import AbstractDriver, AbstractAsyncDriver
 
 
 class DriverFactory(object):
+
+    # drivers shared by all the repositories of the process, keyed by the type, the root and the parameters
+    _drivers = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_driver(cls, driver_name, root: str, parameters: dict, peer_cache: str = None,
+                   mirrors: list = None) -> AbstractDriver:
+        """Returns a cached driver, it's created on the first call."""
+        return cls._get_cached('sync', driver_name, root, parameters, peer_cache, mirrors, cls.create_driver)
+
+    @classmethod
+    def get_async_driver(cls, driver_name, root: str, parameters: dict, peer_cache: str = None,
+                         mirrors: list = None) -> AbstractAsyncDriver:
+        """Returns a cached asyncio driver, it's created on the first call."""
+        return cls._get_cached('async', driver_name, root, parameters, peer_cache, mirrors, cls.create_async_driver)
+
+    @classmethod
+    def reset(cls):
+        """Drops cached drivers, it's called in child processes after "fork()"."""
+        cls._lock = threading.Lock()
+        cls._drivers = {}
+
     @classmethod
-    def create_driver(cls, driver_name, root: str, parameters: dict) -> AbstractDriver:
+    def _get_cached(cls, kind: str, driver_name, root: str, parameters: dict, peer_cache: str, mirrors: list,
+                    create_driver):
+        key = json.dumps([kind, driver_name, root, parameters, peer_cache, mirrors], sort_keys=True, default=str)
+
+        driver = cls._drivers.get(key)
+        if driver is None:
+            with cls._lock:
+                driver = cls._drivers.get(key)
+                if driver is None:
+                    with tracing.span('create_driver', kind=kind, type=driver_name, root=root):
+                        driver = create_driver(driver_name, root, parameters, peer_cache, mirrors)
+
+                    cls._drivers[key] = driver
+
+        return driver
+
+    @classmethod
+    def create_driver(cls, driver_name, root: str, parameters: dict, peer_cache: str = None,
+                      mirrors: list = None) -> AbstractDriver:
+        """Creates a driver. If mirrors are specified (configurations with the "type", "root" and "parameters"
+        keys), packages are downloaded from the fastest of them. If the URL of a peer cache is specified,
+        the driver downloads packages from the peer first.
+        """
+        driver = cls._create_driver(driver_name, root, parameters)
+        if mirrors:
+            from darty.drivers.mirrors import MirrorDriver
+            driver = MirrorDriver('%s:%s' % (driver_name, root), driver, [
+                ('%s:%s' % (mirror['type'], mirror['root']),
+                 cls._create_driver(mirror['type'], mirror['root'], mirror.get('parameters', {})))
+                for mirror in mirrors])
+
+        if peer_cache:
+            from darty.drivers.peer import PeerCacheDriver
+            driver = PeerCacheDriver(peer_cache, driver_name, driver)
+
+        return driver
+
+    @classmethod
+    def _create_driver(cls, driver_name, root: str, parameters: dict) -> AbstractDriver:
         # driver for unit tests
         if driver_name == 'test':
+            from darty.drivers.test.driver import TestDriver
             return TestDriver(root, parameters)
 
         # search the driver
-        for entry_point in pkg_resources.iter_entry_points('darty_drivers'):
+        for entry_point in cls._get_entry_points('darty_drivers'):
             if driver_name == entry_point.name:
                 driver = entry_point.load()
                 return driver(root, parameters)
 
         raise ValueError('Driver "%s" not found' % driver_name)
+
+    @classmethod
+    def create_async_driver(cls, driver_name, root: str, parameters: dict, peer_cache: str = None,
+                            mirrors: list = None) -> AbstractAsyncDriver:
+        # search the native asyncio driver (peer caches and mirrors are supported only by synchronous drivers)
+        for entry_point in cls._get_entry_points('darty_async_drivers'):
+            if driver_name == entry_point.name and not peer_cache and not mirrors:
+                driver = entry_point.load()
+                return driver(root, parameters)
+
+        # otherwise run the synchronous driver in an executor
+        from darty.drivers.async_adapter import AsyncDriverAdapter
+        return AsyncDriverAdapter(cls.create_driver(driver_name, root, parameters, peer_cache, mirrors))
+
+    @staticmethod
+    def _get_entry_points(group: str):
+        """Returns entry points for the group using "importlib.metadata",
+        which is much faster to import than "pkg_resources".
+        """
+        from importlib.metadata import entry_points
+
+        eps = entry_points()
+        if hasattr(eps, 'select'):
+            return eps.select(group=group)
+
+        # Python < 3.10
+        return eps.get(group, [])
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=DriverFactory.reset)
@@ -0,0 +1,143 @@
+import errno
+import logging
+import os
+import uuid
+from shutil import rmtree
+from darty import metrics, scheduler, tracing
+from darty.drivers.abstract import AbstractDriver, PackageNotFoundError, VersionExistsError, DriverError, \
+    ReadAccessError, WriteAccessError
+from darty.helpers.inventory import FileInventory
+from darty.output_writer import AbstractOutputWriter
+from darty.package.integrity import PackageDigests
+from darty.utils import FileDigest, copy_file
+
+
+class FsDriver(AbstractDriver):
+    """Stores packages in a directory, for example on a network file system shared by the hosts of a cluster.
+
+    The "path" parameter is the base directory, the root is a subdirectory in it. Files are stored
+    the same way the "s3_files" driver stores them. A package is copied to a temporary directory
+    and then renamed, so readers never see partially published packages.
+    """
+
+    def __init__(self, root: str, parameters: dict = None):
+        super().__init__(root, parameters)
+
+        if not self._params.get('path'):
+            raise ValueError('The "path" parameter of the "fs" driver must be specified')
+
+        self._root_dir = os.path.join(os.path.expanduser(self._params['path']), root)
+
+    def download_package(self, group: str, artifact: str, version: str,
+                         tmp_artifact_dir: str, output: AbstractOutputWriter):
+        self.download_verified_package(group, artifact, version, tmp_artifact_dir, output, None)
+
+    def download_verified_package(self, group: str, artifact: str, version: str,
+                                  tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        artifact_dir = self._get_artifact_dir(group, artifact, version)
+        if not self._package_exists(artifact_dir):
+            raise PackageNotFoundError()
+
+        try:
+            entries = FileInventory.scan(artifact_dir)
+        except PermissionError:
+            raise ReadAccessError()
+
+        self._copy_files([entry.path for entry in entries], artifact_dir, tmp_artifact_dir, output, digests,
+                         entries.total_size)
+
+    def download_files(self, group: str, artifact: str, version: str, file_paths: list,
+                       tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        artifact_dir = self._get_artifact_dir(group, artifact, version)
+        if not self._package_exists(artifact_dir):
+            raise PackageNotFoundError()
+
+        self._copy_files([os.path.join('data', file_path) for file_path in file_paths], artifact_dir,
+                         tmp_artifact_dir, output, digests)
+
+    def upload_package(self, group: str, artifact: str, version: str,
+                       tmp_artifact_dir: str, output: AbstractOutputWriter):
+        artifact_dir = self._get_artifact_dir(group, artifact, version)
+        if self._package_exists(artifact_dir):
+            raise VersionExistsError()
+
+        # copy the files next to the package directory and rename the copy
+        tmp_dir = '%s.tmp-%s' % (artifact_dir, uuid.uuid4().hex)
+        try:
+            os.makedirs(os.path.dirname(artifact_dir), exist_ok=True)
+            entries = FileInventory.scan(tmp_artifact_dir)
+            with metrics.timer('transfer_seconds', direction='upload'), \
+                    metrics.TransferProgress('upload', output, entries.total_size) as progress:
+                for entry in entries:
+                    self._copy_file(os.path.join(tmp_artifact_dir, entry.path), os.path.join(tmp_dir, entry.path),
+                                    'upload', progress)
+
+            os.rename(tmp_dir, artifact_dir)
+        except PermissionError:
+            rmtree(tmp_dir, True)
+            raise WriteAccessError()
+        except OSError as e:
+            rmtree(tmp_dir, True)
+            if e.errno in (errno.EEXIST, errno.ENOTEMPTY):
+                # another host published the package at the same time
+                raise VersionExistsError()
+
+            raise DriverError('Upload Error: %s' % str(e))
+
+    def probe(self) -> bool:
+        try:
+            os.stat(self._root_dir)
+        except FileNotFoundError:
+            # nothing is published yet
+            pass
+        except OSError as e:
+            raise DriverError(str(e))
+
+        return True
+
+    def _copy_files(self, file_paths: list, artifact_dir: str, tmp_artifact_dir: str, output: AbstractOutputWriter,
+                    digests: PackageDigests, total_bytes: int = None):
+        with metrics.timer('transfer_seconds', direction='download'), \
+                metrics.TransferProgress('download', output, total_bytes) as progress:
+            for file_path in file_paths:
+                src_path = os.path.join(artifact_dir, file_path)
+                dst_path = os.path.join(tmp_artifact_dir, file_path)
+
+                try:
+                    file_digest = self._copy_file(src_path, dst_path, 'download', progress)
+                except FileNotFoundError:
+                    raise DriverError('File "%s" not found in the repository' % file_path)
+                except PermissionError:
+                    raise ReadAccessError()
+                except OSError as e:
+                    raise DriverError('Download Error: %s' % str(e))
+
+                if digests is not None:
+                    digests.add(dst_path, file_digest)
+
+    @staticmethod
+    def _copy_file(src_path: str, dst_path: str, direction: str, progress: metrics.TransferProgress) -> FileDigest:
+        """Copies a file within the transfer limits and returns its digest."""
+        logging.debug('Copying "%s" to "%s"' % (src_path, dst_path))
+
+        file_digest = FileDigest()
+
+        def update(data: bytes):
+            scheduler.throttle(len(data), direction=direction)
+            file_digest.update(data)
+            progress.update(len(data))
+
+        with scheduler.connection(direction=direction), tracing.span('copy_file', 'fs', path=src_path):
+            copy_file(src_path, dst_path, update)
+
+        progress.add_object()
+
+        return file_digest
+
+    @staticmethod
+    def _package_exists(artifact_dir: str) -> bool:
+        # packages appear atomically, so a package exists if it has the "info.json" file
+        return os.path.isfile(os.path.join(artifact_dir, 'info.json'))
+
+    def _get_artifact_dir(self, group: str, artifact: str, version: str) -> str:
+        return os.path.join(self._root_dir, *group.split('.'), '.artifacts', artifact + '-' + version)
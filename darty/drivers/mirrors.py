@@ -0,0 +1,340 @@
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from shutil import rmtree
+from darty import metrics
+from darty.drivers.abstract import AbstractDriver, DriverError, PackageNotFoundError
+from darty.helpers.inventory import FileInventory
+from darty.output_writer import AbstractOutputWriter, NullOutputWriter
+from darty.package.integrity import PackageDigests
+
+
+# weight of a new sample in the moving averages of latencies and throughputs
+EWMA_WEIGHT = 0.3
+
+# size of a typical package, it's used to compare mirrors with different latencies and throughputs
+REFERENCE_SIZE = 64 * 1024 ** 2
+
+
+class MirrorStats(object):
+    """Latency, throughput and health of a mirror measured by probes and downloads."""
+
+    # a failed mirror is skipped for this number of seconds, the time doubles with every failure in a row
+    COOLDOWN = 30
+    MAX_COOLDOWN = 600
+
+    def __init__(self):
+        self.latency = None  # seconds
+        self.throughput = None  # bytes per second
+        self.duration = None  # seconds per download
+        self.failures = 0  # failures in a row
+        self.down_until = 0
+        self.probe_time = 0
+
+    def is_healthy(self, now: float) -> bool:
+        return self.down_until <= now
+
+    def get_estimate(self, best_throughput: float) -> float:
+        """Estimated time to download a package of the reference size. Mirrors without downloads
+        are estimated with the best known throughput, so they get a chance to be measured.
+        """
+        throughput = self.throughput if self.throughput else best_throughput
+        return (self.latency or 0) + (REFERENCE_SIZE / throughput if throughput else 0)
+
+
+class MirrorRegistry(object):
+    """Process-wide statistics of mirrors, mirrors are identified by names: "{type}:{root}"."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def get_stats(self, name: str) -> MirrorStats:
+        with self._lock:
+            return self._get(name)
+
+    def start_probe(self, name: str, interval: float) -> bool:
+        """Returns True if the mirror must be probed (it wasn't probed for "interval" seconds)."""
+        now = time.time()
+        with self._lock:
+            stats = self._get(name)
+            if now - stats.probe_time < interval:
+                return False
+
+            stats.probe_time = now
+            return True
+
+    def record_latency(self, name: str, seconds: float):
+        with self._lock:
+            stats = self._get(name)
+            stats.latency = _ewma(stats.latency, seconds)
+
+    def record_download(self, name: str, num_bytes: int, seconds: float):
+        with self._lock:
+            stats = self._get(name)
+            stats.duration = _ewma(stats.duration, seconds)
+            if seconds > 0 and num_bytes:
+                stats.throughput = _ewma(stats.throughput, num_bytes / seconds)
+
+            stats.failures = 0
+            stats.down_until = 0
+
+    def record_failure(self, name: str):
+        with self._lock:
+            stats = self._get(name)
+            stats.failures += 1
+            stats.down_until = time.time() + min(stats.COOLDOWN * 2 ** (stats.failures - 1), stats.MAX_COOLDOWN)
+
+    def rank(self, names: list) -> list:
+        """Sorts mirrors: healthy mirrors go first, then the mirrors with the shortest estimated
+        download time. The order of the list is kept for equal mirrors.
+        """
+        now = time.time()
+        with self._lock:
+            stats = {name: self._get(name) for name in names}
+            throughputs = [s.throughput for s in stats.values() if s.throughput]
+            best_throughput = max(throughputs) if throughputs else None
+
+            return sorted(names, key=lambda name: (not stats[name].is_healthy(now),
+                                                   stats[name].get_estimate(best_throughput)))
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def _get(self, name: str) -> MirrorStats:
+        if name not in self._stats:
+            self._stats[name] = MirrorStats()
+
+        return self._stats[name]
+
+
+def _ewma(average: float, value: float) -> float:
+    return value if average is None else average + EWMA_WEIGHT * (value - average)
+
+
+# statistics of the mirrors used by the process
+_registry = MirrorRegistry()
+
+
+def get_registry() -> MirrorRegistry:
+    return _registry
+
+
+class MirrorDriver(AbstractDriver):
+    """Downloads packages from the fastest healthy mirror of a repository, packages are published
+    only to the primary repository.
+
+    Mirrors are probed to measure their latencies, throughputs are measured by downloads. If a download
+    fails, the next mirror is used. If a download takes much longer than usual, it's hedged: the package
+    is downloaded from the next mirror at the same time and the first finished download wins (the other
+    one can't be interrupted, its files are removed when it finishes).
+    """
+
+    # mirrors are probed again after this number of seconds
+    PROBE_INTERVAL = 300
+    # maximum time to wait for probes before a download
+    PROBE_TIMEOUT = 2
+
+    # a download is hedged if it takes longer than the usual download time of the mirror multiplied
+    # by this factor (but not sooner than after "MIN_HEDGE_DELAY" seconds)
+    HEDGE_FACTOR = 3
+    MIN_HEDGE_DELAY = 10
+    # hedge delay of mirrors without downloads
+    DEFAULT_HEDGE_DELAY = 60
+
+    def __init__(self, name: str, driver: AbstractDriver, mirrors: list):
+        """
+        :param name: name of the primary repository
+        :param driver: driver of the primary repository
+        :param mirrors: list of (name, driver) tuples
+        """
+        super().__init__(driver._root, driver._params)
+
+        self._driver = driver
+        self._candidates = dict([(name, driver)] + mirrors)
+
+    def download_package(self, group: str, artifact: str, version: str,
+                         tmp_artifact_dir: str, output: AbstractOutputWriter):
+        self.download_verified_package(group, artifact, version, tmp_artifact_dir, output, None)
+
+    def download_verified_package(self, group: str, artifact: str, version: str,
+                                  tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        def download(driver: AbstractDriver, attempt_dir: str, attempt_output: AbstractOutputWriter,
+                     attempt_digests: PackageDigests):
+            driver.download_verified_package(group, artifact, version, attempt_dir, attempt_output, attempt_digests)
+
+        self._download(download, tmp_artifact_dir, output, digests)
+
+    def download_files(self, group: str, artifact: str, version: str, file_paths: list,
+                       tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        def download(driver: AbstractDriver, attempt_dir: str, attempt_output: AbstractOutputWriter,
+                     attempt_digests: PackageDigests):
+            driver.download_files(group, artifact, version, file_paths, attempt_dir, attempt_output, attempt_digests)
+
+        self._download(download, tmp_artifact_dir, output, digests)
+
+    def upload_package(self, group: str, artifact: str, version: str,
+                       tmp_artifact_dir: str, output: AbstractOutputWriter):
+        self._driver.upload_package(group, artifact, version, tmp_artifact_dir, output)
+
+    def probe(self) -> bool:
+        return self._driver.probe()
+
+    def get_ranked_mirrors(self) -> list:
+        """Probes the mirrors if needed and returns their names, the best mirror goes first."""
+        self._probe()
+        return _registry.rank(list(self._candidates))
+
+    def _download(self, download, tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        """Runs downloads in threads: every download writes to its own directory,
+        the files of the first successful download are moved to the temporary directory.
+        """
+        names = self.get_ranked_mirrors()
+        results = queue.Queue()
+        state = _DownloadState()
+        errors = []
+        num_running = 0
+        hedged = False
+
+        def start(index: int, attempt_output: AbstractOutputWriter):
+            name = names[index]
+            attempt_dir = '%s.mirror-%d' % (tmp_artifact_dir, index)
+            rmtree(attempt_dir, True)
+            os.makedirs(attempt_dir)
+
+            attempt_digests = PackageDigests() if digests is not None else None
+            args = (name, download, attempt_dir, attempt_output, attempt_digests, state, results)
+            threading.Thread(target=contextvars.copy_context().run, args=(self._attempt,) + args,
+                             daemon=True).start()
+
+        start(0, output)
+        num_running += 1
+        next_index = 1
+
+        try:
+            while True:
+                timeout = None
+                if not hedged and next_index < len(names):
+                    timeout = self._get_hedge_delay(names[next_index - 1])
+
+                try:
+                    name, attempt_dir, attempt_digests, error = results.get(timeout=timeout)
+                except queue.Empty:
+                    # the download is too slow, download from the next mirror at the same time
+                    output.write('[!] Mirror "%s" is slow, downloading from "%s" too'
+                                 % (names[next_index - 1], names[next_index]))
+                    metrics.inc('mirror_hedges')
+                    start(next_index, NullOutputWriter())
+                    num_running += 1
+                    next_index += 1
+                    hedged = True
+                    continue
+
+                num_running -= 1
+                if error is None:
+                    break
+
+                errors.append(error)
+                if next_index < len(names):
+                    output.write('[!] Mirror "%s" failed (%s), trying "%s"' % (name, str(error), names[next_index]))
+                    start(next_index, output)
+                    num_running += 1
+                    next_index += 1
+                elif not num_running:
+                    # all the mirrors failed, a missing package is reported only if no mirror has it
+                    raise next((e for e in errors if not isinstance(e, PackageNotFoundError)), errors[0])
+        finally:
+            # downloads which are still running remove their files when they finish
+            state.close()
+
+        for file_name in os.listdir(attempt_dir):
+            os.replace(os.path.join(attempt_dir, file_name), os.path.join(tmp_artifact_dir, file_name))
+        os.rmdir(attempt_dir)
+
+        if digests is not None:
+            digests.update(attempt_digests, attempt_dir, tmp_artifact_dir)
+
+    def _attempt(self, name: str, download, attempt_dir: str, output: AbstractOutputWriter,
+                 digests: PackageDigests, state: '_DownloadState', results: queue.Queue):
+        """Downloads the package from a mirror and records the statistics."""
+        start_time = time.perf_counter()
+        try:
+            download(self._candidates[name], attempt_dir, output, digests)
+        except Exception as e:
+            if isinstance(e, PackageNotFoundError):
+                metrics.inc('mirror_downloads', mirror=name, result='not_found')
+            else:
+                logging.debug('Mirror "%s": %s' % (name, str(e)))
+                metrics.inc('mirror_downloads', mirror=name, result='error')
+                _registry.record_failure(name)
+
+            rmtree(attempt_dir, True)
+            results.put((name, attempt_dir, digests, e))
+            return
+
+        elapsed = time.perf_counter() - start_time
+        _registry.record_download(name, FileInventory.scan(attempt_dir).total_size, elapsed)
+
+        if not state.win():
+            # another download won or the package is not needed anymore
+            metrics.inc('mirror_downloads', mirror=name, result='lost')
+            rmtree(attempt_dir, True)
+            return
+
+        metrics.inc('mirror_downloads', mirror=name, result='ok')
+        results.put((name, attempt_dir, digests, None))
+
+    def _probe(self):
+        """Measures latencies of the mirrors which were not probed recently."""
+        def probe(name: str, driver: AbstractDriver):
+            start_time = time.perf_counter()
+            try:
+                if driver.probe():
+                    _registry.record_latency(name, time.perf_counter() - start_time)
+            except (DriverError, OSError) as e:
+                logging.debug('Mirror "%s": %s' % (name, str(e)))
+                _registry.record_failure(name)
+
+        threads = [threading.Thread(target=probe, args=(name, driver), daemon=True)
+                   for name, driver in self._candidates.items()
+                   if _registry.start_probe(name, self.PROBE_INTERVAL)]
+
+        for thread in threads:
+            thread.start()
+
+        # slow mirrors are not waited for, they are ranked by their previous measurements
+        deadline = time.perf_counter() + self.PROBE_TIMEOUT
+        for thread in threads:
+            thread.join(max(deadline - time.perf_counter(), 0))
+
+    def _get_hedge_delay(self, name: str) -> float:
+        duration = _registry.get_stats(name).duration
+        if duration is None:
+            return self.DEFAULT_HEDGE_DELAY
+
+        return max(self.MIN_HEDGE_DELAY, self.HEDGE_FACTOR * duration)
+
+
+class _DownloadState(object):
+    """Chooses the winner among concurrent downloads of a package."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = False
+
+    def win(self) -> bool:
+        """Returns True for the first finished download, if the package is still needed."""
+        with self._lock:
+            if self._done:
+                return False
+
+            self._done = True
+            return True
+
+    def close(self):
+        with self._lock:
+            self._done = True
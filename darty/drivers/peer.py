@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import queue
+import urllib.parse
+from shutil import rmtree
+from darty import metrics, scheduler, tracing
+from darty.drivers.abstract import AbstractDriver, DriverError
+from darty.output_writer import AbstractOutputWriter
+from darty.package.integrity import PackageDigests
+from darty.utils import FileDigest, COPY_BUFFER_SIZE
+
+
+# version of the URL scheme of the peer cache server
+URL_PREFIX = '/v1'
+
+
+def get_url_path(repository_type: str, root: str, group: str, artifact: str, version: str, file_path: str) -> str:
+    """URL path of a package file on a peer cache server ("info.json" or "data/{path}")."""
+    return '/'.join([URL_PREFIX] + [urllib.parse.quote(part, safe='')
+                                    for part in (repository_type, root, group, artifact, version)]
+                    + [urllib.parse.quote(file_path.replace('\\', '/'))])
+
+
+class PeerError(DriverError):
+    """The peer cache is not available or doesn't have the package."""
+    pass
+
+
+class PeerCacheDriver(AbstractDriver):
+    """Downloads packages from a peer cache (a host running "darty serve") before the repository.
+
+    If the peer is not available or can't serve the package, the package is downloaded with
+    the repository driver. Packages are always published with the repository driver.
+    """
+
+    # the peer fetches a missing package from the repository before it answers,
+    # so only connecting to the peer has a short timeout
+    CONNECT_TIMEOUT = 3
+    READ_TIMEOUT = 600
+
+    # number of files downloaded from the peer at the same time
+    MAX_CONCURRENCY = 8
+
+    def __init__(self, url: str, repository_type: str, driver: AbstractDriver):
+        super().__init__(driver._root, driver._params)
+
+        parsed_url = urllib.parse.urlsplit(url)
+        if parsed_url.scheme not in ('http', 'https') or not parsed_url.hostname:
+            raise ValueError('Invalid peer cache URL "%s"' % url)
+
+        self.url = url
+        self._parsed_url = parsed_url
+        self._type = repository_type
+        self._driver = driver
+
+    def download_package(self, group: str, artifact: str, version: str,
+                         tmp_artifact_dir: str, output: AbstractOutputWriter):
+        self.download_verified_package(group, artifact, version, tmp_artifact_dir, output, None)
+
+    def download_verified_package(self, group: str, artifact: str, version: str,
+                                  tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        if self._download_from_peer(group, artifact, version, None, tmp_artifact_dir, output, digests):
+            return
+
+        self._driver.download_verified_package(group, artifact, version, tmp_artifact_dir, output, digests)
+
+    def download_files(self, group: str, artifact: str, version: str, file_paths: list,
+                       tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        if self._download_from_peer(group, artifact, version, file_paths, tmp_artifact_dir, output, digests):
+            return
+
+        self._driver.download_files(group, artifact, version, file_paths, tmp_artifact_dir, output, digests)
+
+    def upload_package(self, group: str, artifact: str, version: str,
+                       tmp_artifact_dir: str, output: AbstractOutputWriter):
+        self._driver.upload_package(group, artifact, version, tmp_artifact_dir, output)
+
+    def _download_from_peer(self, group: str, artifact: str, version: str, file_paths: list,
+                            tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests) -> bool:
+        """Downloads the package (or particular files) from the peer.
+
+        :return: False if the peer can't serve the package, the temporary directory is cleaned up then
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        # digests are added only when all the files were downloaded
+        peer_digests = PackageDigests()
+        connections = queue.LifoQueue()
+
+        def download_file(file_path: str):
+            self._download_file(connections, self._get_url_path(group, artifact, version, file_path),
+                                os.path.join(tmp_artifact_dir, file_path), progress, peer_digests)
+
+        try:
+            with metrics.timer('transfer_seconds', direction='download'), \
+                    metrics.TransferProgress('download', output) as progress, \
+                    tracing.span('download_from_peer', 'peer', url=self.url):
+                if file_paths is None:
+                    download_file('info.json')
+                    with open(os.path.join(tmp_artifact_dir, 'info.json')) as f:
+                        file_paths = json.load(f)['files']
+
+                with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENCY) as executor:
+                    for _ in executor.map(download_file, ['data/' + file_path for file_path in file_paths]):
+                        pass
+        except (PeerError, OSError, ValueError, KeyError, TypeError) as e:
+            logging.debug('Peer cache "%s": %s' % (self.url, str(e)))
+            output.write('[!] Peer cache is not available (%s), using the repository' % str(e))
+
+            for name in os.listdir(tmp_artifact_dir):
+                path = os.path.join(tmp_artifact_dir, name)
+                rmtree(path) if os.path.isdir(path) else os.remove(path)
+
+            metrics.inc('peer_cache', result='miss')
+            return False
+        finally:
+            while not connections.empty():
+                connections.get().close()
+
+        if digests is not None:
+            digests.update(peer_digests)
+
+        metrics.inc('peer_cache', result='hit')
+        return True
+
+    def _download_file(self, connections: queue.LifoQueue, url_path: str, local_file_path: str,
+                       progress: metrics.TransferProgress, digests: PackageDigests):
+        """Streams a file to disk using a connection from the pool and records its digest."""
+        import http.client
+
+        try:
+            connection = connections.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+
+        os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+        file_digest = FileDigest()
+
+        try:
+            with scheduler.connection(direction='download'):
+                connection.request('GET', url_path)
+                response = connection.getresponse()
+                if response.status != 200:
+                    response.read()
+                    raise PeerError('HTTP %d for "%s"' % (response.status, url_path))
+
+                with open(local_file_path, 'wb') as f:
+                    while True:
+                        chunk = response.read(COPY_BUFFER_SIZE)
+                        if not chunk:
+                            break
+
+                        scheduler.throttle(len(chunk), direction='download')
+                        f.write(chunk)
+                        file_digest.update(chunk)
+                        progress.update(len(chunk))
+        except http.client.HTTPException as e:
+            connection.close()
+            raise PeerError('Invalid response for "%s": %s' % (url_path, str(e) or type(e).__name__))
+        except BaseException:
+            connection.close()
+            raise
+
+        # the connection is kept alive for the next file
+        connections.put(connection)
+        digests.add(local_file_path, file_digest)
+        progress.add_object()
+
+    def _connect(self):
+        import http.client
+
+        connection_class = http.client.HTTPSConnection if self._parsed_url.scheme == 'https' \
+            else http.client.HTTPConnection
+        connection = connection_class(self._parsed_url.hostname, self._parsed_url.port,
+                                      timeout=self.CONNECT_TIMEOUT)
+        connection.connect()
+        connection.sock.settimeout(self.READ_TIMEOUT)
+
+        return connection
+
+    def _get_url_path(self, group: str, artifact: str, version: str, file_path: str) -> str:
+        return self._parsed_url.path.rstrip('/') + get_url_path(self._type, self._root, group, artifact, version,
+                                                                 file_path)
@@ -0,0 +1,86 @@
+import os
+import threading
+from darty import metrics
+
+
+# size of the connection pool of every client, clients are shared by all the drivers of the process,
+# so the pool is bigger than the boto3 default (10)
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+
+
+class ClientRegistry(object):
+    """Process-wide S3 clients shared by all the drivers and repositories.
+
+    Clients are keyed by the region, the endpoint URL and the credentials profile, so sessions,
+    credential chains and connection pools are created only once. boto3 clients are thread-safe,
+    but they can't be used after "fork()", so the registry is cleared in child processes.
+    """
+
+    def __init__(self, max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS):
+        self.max_pool_connections = max_pool_connections
+
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def get_client(self, region: str = None, endpoint_url: str = None, profile: str = None):
+        """Returns a client, it's created on the first call."""
+        key = (region, endpoint_url, profile)
+
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._create_client(region, endpoint_url, profile)
+                    self._clients[key] = client
+
+        return client
+
+    def configure(self, max_pool_connections: int):
+        """Changes the size of connection pools, existing clients are dropped."""
+        if max_pool_connections < 1:
+            raise ValueError('Size of the connection pool must be positive')
+
+        with self._lock:
+            self.max_pool_connections = max_pool_connections
+            self._clients = {}
+
+    def reset(self):
+        """Drops all the clients. The lock is created again, because after "fork()"
+        it could be held by a thread which doesn't exist in the child process.
+        """
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def _create_client(self, region: str, endpoint_url: str, profile: str):
+        # boto3 is imported only when a network operation runs
+        import boto3
+        from botocore.config import Config
+
+        session = boto3.session.Session(profile_name=profile)
+        client = session.client('s3', region_name=region, endpoint_url=endpoint_url,
+                                config=Config(max_pool_connections=self.max_pool_connections))
+
+        return metrics.instrument_boto_client(client)
+
+
+# process-wide registry
+_registry = ClientRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_registry.reset)
+
+
+def get_registry() -> ClientRegistry:
+    return _registry
+
+
+def get_client(parameters: dict):
+    """Returns a shared client for the driver parameters: "region", "endpoint_url" and "profile"
+    (the name of the AWS credentials profile), all of them are optional.
+    """
+    return _registry.get_client(parameters.get('region'), parameters.get('endpoint_url'), parameters.get('profile'))
+
+
+def configure(max_pool_connections: int):
+    _registry.configure(max_pool_connections)
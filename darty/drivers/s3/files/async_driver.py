@@ -0,0 +1,75 @@
+import asyncio
+import functools
+from darty import metrics
+from darty.drivers.abstract import AbstractAsyncDriver, PackageNotFoundError, VersionExistsError
+from darty.drivers.s3.files.driver import S3FilesDriver
+from darty.helpers.aio import run_sync
+from darty.output_writer import AbstractOutputWriter
+from darty.package.integrity import PackageDigests
+
+
+class AsyncS3FilesDriver(AbstractAsyncDriver):
+    """Asyncio version of the "s3_files" driver. It's not a native asyncio driver: every file is transferred
+    by the blocking "s3_files" driver in an executor thread, but files of a package are transferred concurrently.
+
+    Parameters:
+        - max_concurrency: maximum number of files transferred at the same time (10 by default)
+    """
+
+    DEFAULT_MAX_CONCURRENCY = 10
+
+    def __init__(self, root: str, parameters: dict):
+        super().__init__(root, parameters)
+
+        self._driver = S3FilesDriver(root, parameters)
+        self._max_concurrency = int(self._params.get('max_concurrency', self.DEFAULT_MAX_CONCURRENCY))
+
+    async def download_package(self, group: str, artifact: str, version: str,
+                               tmp_artifact_dir: str, output: AbstractOutputWriter):
+        await self.download_verified_package(group, artifact, version, tmp_artifact_dir, output, None)
+
+    async def download_verified_package(self, group: str, artifact: str, version: str,
+                                        tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        # check that package exists in the repository
+        package_exists = await run_sync(self._driver._package_exists, group, artifact, version)
+        if not package_exists:
+            raise PackageNotFoundError()
+
+        # download the files
+        paths = await run_sync(self._driver._get_download_paths, group, artifact, version, tmp_artifact_dir)
+        await self._transfer(functools.partial(self._driver._download_file, digests=digests), paths,
+                             metrics.TransferProgress('download', output))
+
+    async def upload_package(self, group: str, artifact: str, version: str,
+                             tmp_artifact_dir: str, output: AbstractOutputWriter):
+        # check that this version of the package doesn't exist in the repository
+        package_exists = await run_sync(self._driver._package_exists, group, artifact, version)
+        if package_exists:
+            raise VersionExistsError()
+
+        # upload files to S3
+        paths = await run_sync(self._driver._get_upload_paths, group, artifact, version, tmp_artifact_dir)
+        await self._transfer(self._driver._upload_file, paths, metrics.TransferProgress('upload', output))
+
+    async def _transfer(self, transfer_file, paths: list, progress: metrics.TransferProgress):
+        """Transfers files concurrently. If one of the transfers fails, the other ones are cancelled."""
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        progress.total_bytes = sum(size for _, _, size in paths)
+
+        async def transfer(src_path: str, dst_path: str):
+            async with semaphore:
+                await run_sync(transfer_file, src_path, dst_path, progress)
+
+        tasks = [asyncio.ensure_future(transfer(src_path, dst_path)) for src_path, dst_path, _ in paths]
+        try:
+            with metrics.timer('transfer_seconds', direction=progress.direction):
+                await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+
+            # wait for the running transfers, so the caller can clean up the directory
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            progress.close()
@@ -1,52 +1,49 @@
 import logging
 import os
-import boto3
-from botocore.exceptions import ClientError
+from darty import metrics, scheduler, tracing
 from darty.drivers.abstract import AbstractDriver, PackageNotFoundError, ReadAccessError, DriverError, \
     VersionExistsError
+from darty.drivers.s3 import clients
 from darty.output_writer import AbstractOutputWriter
-from darty.drivers.s3.files.utils import get_dir_files
+from darty.helpers.inventory import FileInventory
+from darty.package.integrity import PackageDigests
+from darty.utils import RangeDigest
 
 
 class S3FilesDriver(AbstractDriver):
 
-    def __init__(self, root: str, parameters: dict):
-        super().__init__(root, parameters)
-
-        self._s3 = boto3.resource('s3')
-        self._client = self._s3.meta.client
+    @property
+    def _client(self):
+        # clients are shared by all the drivers of the process
+        return clients.get_client(self._params)
 
     def download_package(self, group: str, artifact: str, version: str,
                          tmp_artifact_dir: str, output: AbstractOutputWriter):
+        self.download_verified_package(group, artifact, version, tmp_artifact_dir, output, None)
+
+    def download_verified_package(self, group: str, artifact: str, version: str,
+                                  tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
         # check that package exists in the repository
         package_exists = self._package_exists(group, artifact, version)
         if not package_exists:
             raise PackageNotFoundError()
 
-        # get a list of package files
-        s3_prefix = self._get_s3_file_path(group, artifact, version, '')
-
-        bucket = self._s3.Bucket(self._root)
-        try:
-            s3_file_paths = [obj.key for obj in bucket.objects.filter(Prefix=s3_prefix)]
-        except ClientError as e:
-            raise DriverError(e.response['Error']['Message'])
-
         # download the files
-        bucket = self._s3.Bucket(self._root)
-        for s3_file_path in s3_file_paths:
-            local_file_path = os.path.join(tmp_artifact_dir, s3_file_path[len(s3_prefix):])
-
-            logging.debug('Downloading "s3://%s/%s" to "%s"' % (self._root, s3_file_path, local_file_path))
-
-            os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
-            try:
-                bucket.download_file(s3_file_path, local_file_path)
-            except ClientError as e:
-                if e.response['Error']['Code'] == '403':
-                    raise ReadAccessError()
-                else:
-                    raise DriverError('Download Error: %s' % e.response['Error']['Message'])
+        paths = self._get_download_paths(group, artifact, version, tmp_artifact_dir)
+        with metrics.timer('transfer_seconds', direction='download'), \
+                metrics.TransferProgress('download', output, sum(size for _, _, size in paths)) as progress:
+            for s3_file_path, local_file_path, _ in paths:
+                self._download_file(s3_file_path, local_file_path, progress, digests)
+
+    def download_files(self, group: str, artifact: str, version: str, file_paths: list,
+                       tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        paths = [(self._get_s3_file_path(group, artifact, version, 'data/' + file_path.replace('\\', '/')),
+                  os.path.join(tmp_artifact_dir, 'data', file_path)) for file_path in file_paths]
+
+        with metrics.timer('transfer_seconds', direction='download'), \
+                metrics.TransferProgress('download', output) as progress:
+            for s3_file_path, local_file_path in paths:
+                self._download_file(s3_file_path, local_file_path, progress, digests)
 
     def upload_package(self, group: str, artifact: str, version: str,
                        tmp_artifact_dir: str, output: AbstractOutputWriter):
@@ -56,22 +53,106 @@ class S3FilesDriver(AbstractDriver):
             raise VersionExistsError()
 
         # upload files to S3
-        for file_path in get_dir_files(tmp_artifact_dir):
-            s3_file_path = self._get_s3_file_path(group, artifact, version, file_path)
-            local_file_path = os.path.join(tmp_artifact_dir, file_path)
+        paths = self._get_upload_paths(group, artifact, version, tmp_artifact_dir)
+        with metrics.timer('transfer_seconds', direction='upload'), \
+                metrics.TransferProgress('upload', output, sum(size for _, _, size in paths)) as progress:
+            for local_file_path, s3_file_path, _ in paths:
+                self._upload_file(local_file_path, s3_file_path, progress)
+
+    def probe(self) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self._client.head_bucket(Bucket=self._root)
+        except ClientError as e:
+            raise DriverError(e.response['Error'].get('Message') or e.response['Error']['Code'])
+
+        return True
+
+    def _get_download_paths(self, group: str, artifact: str, version: str, tmp_artifact_dir: str) -> list:
+        """Returns a list of (S3 path, local path, size) tuples for all files of the package."""
+        from botocore.exceptions import ClientError
+
+        # get a list of package files
+        s3_prefix = self._get_s3_file_path(group, artifact, version, '')
+
+        try:
+            pages = self._client.get_paginator('list_objects_v2').paginate(Bucket=self._root, Prefix=s3_prefix)
+            s3_objects = [(obj['Key'], obj['Size']) for page in pages for obj in page.get('Contents', [])]
+        except ClientError as e:
+            raise DriverError(e.response['Error']['Message'])
+
+        return [(s3_file_path, os.path.join(tmp_artifact_dir, s3_file_path[len(s3_prefix):]), size)
+                for s3_file_path, size in s3_objects]
 
-            logging.debug('Uploading "%s" to "s3://%s/%s"' % (local_file_path, self._root, s3_file_path))
+    def _get_upload_paths(self, group: str, artifact: str, version: str, tmp_artifact_dir: str) -> list:
+        """Returns a list of (local path, S3 path, size) tuples for all files of the package."""
+        return [(os.path.join(tmp_artifact_dir, entry.path),
+                 self._get_s3_file_path(group, artifact, version, entry.path), entry.size)
+                for entry in FileInventory.scan(tmp_artifact_dir)]
 
-            try:
-                self._client.upload_file(os.path.join(tmp_artifact_dir, file_path), self._root, s3_file_path)
-            except ClientError as e:
-                raise DriverError('Upload Error: %s' % e.response['Error']['Message'])
+    def _download_file(self, s3_file_path: str, local_file_path: str, progress: metrics.TransferProgress = None,
+                       digests: PackageDigests = None):
+        """Downloads a file. If "digests" is specified, the digest of the file is computed
+        from the downloaded parts while they are written, so the file is not read again.
+        """
+        from botocore.exceptions import ClientError
+
+        logging.debug('Downloading "s3://%s/%s" to "%s"' % (self._root, s3_file_path, local_file_path))
+
+        os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+        callback = scheduler.throttled(progress.update if progress else None, direction='download')
+        range_digest = RangeDigest() if digests is not None else None
+
+        try:
+            # the transfer manager downloads large files by parts in parallel and retries broken streams
+            with scheduler.connection(direction='download'), \
+                    tracing.span('download_file', 's3_files', key=s3_file_path):
+                if range_digest is None:
+                    self._client.download_file(self._root, s3_file_path, local_file_path, Callback=callback)
+                else:
+                    with open(local_file_path, 'wb') as f:
+                        self._client.download_fileobj(self._root, s3_file_path, _DigestWriter(f, range_digest),
+                                                      Callback=callback)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('403', 'AccessDenied'):
+                raise ReadAccessError()
+            elif e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                raise DriverError('File "%s" not found in the repository' % s3_file_path)
+            else:
+                raise DriverError('Download Error: %s' % e.response['Error']['Message'])
+
+        if range_digest is not None:
+            digests.add(local_file_path, range_digest.get_file_digest(local_file_path))
+
+        if progress:
+            progress.add_object()
+
+    def _upload_file(self, local_file_path: str, s3_file_path: str, progress: metrics.TransferProgress = None):
+        from botocore.exceptions import ClientError
+
+        logging.debug('Uploading "%s" to "s3://%s/%s"' % (local_file_path, self._root, s3_file_path))
+
+        try:
+            with scheduler.connection(direction='upload'), \
+                    tracing.span('upload_file', 's3_files', key=s3_file_path):
+                self._client.upload_file(local_file_path, self._root, s3_file_path,
+                                         Callback=scheduler.throttled(progress.update if progress else None,
+                                                                      direction='upload'))
+        except ClientError as e:
+            raise DriverError('Upload Error: %s' % e.response['Error']['Message'])
+
+        if progress:
+            progress.add_object()
 
     def _package_exists(self, group: str, artifact: str, version: str) -> bool:
+        from botocore.exceptions import ClientError
+
         prefix = self._get_s3_file_path(group, artifact, version, '')
 
         try:
-            res = self._client.list_objects_v2(Bucket=self._root, Prefix=prefix)
+            with metrics.timer('stage_seconds', stage='exists_check'):
+                res = self._client.list_objects_v2(Bucket=self._root, Prefix=prefix)
         except ClientError as e:
             if e.response['Error']['Code'] == '403':
                 raise ReadAccessError()
@@ -84,3 +165,29 @@ class S3FilesDriver(AbstractDriver):
     def _get_s3_file_path(group: str, artifact: str, version: str, file_path: str) -> str:
         path = group.replace('.', '/') + '/.artifacts/' + artifact + '-' + version + '/' + file_path
         return path
+
+
+class _DigestWriter(object):
+    """File object for the transfer manager: parts of the file are written at their offsets
+    and hashed on the way.
+    """
+
+    def __init__(self, fileobj, range_digest: RangeDigest):
+        self._fileobj = fileobj
+        self._range_digest = range_digest
+        self._offset = fileobj.tell()
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        self._offset = self._fileobj.seek(offset, whence)
+        return self._offset
+
+    def tell(self) -> int:
+        return self._offset
+
+    def write(self, data: bytes) -> int:
+        self._range_digest.update(self._offset, data)
+        self._offset += len(data)
+        return self._fileobj.write(data)
@@ -1,10 +1,13 @@
 import os
-import boto3
+import zipfile
+from darty import metrics, scheduler
 from darty.drivers.abstract import AbstractDriver, VersionExistsError, DriverError, PackageNotFoundError, \
     ReadAccessError
+from darty.drivers.s3 import clients
 from darty.output_writer import AbstractOutputWriter
-from darty.drivers.s3.zip.utils import pack_archive, unpack_archive
-from botocore.exceptions import ClientError
+from darty.package.integrity import PackageDigests
+from darty.drivers.s3.zip.utils import unpack_archive, extract_member, ArchiveReader, RangeReader, \
+    COMPRESSION_METHODS
 
 
 class S3ZipDriver(AbstractDriver):
@@ -12,11 +15,25 @@ class S3ZipDriver(AbstractDriver):
     def __init__(self, root: str, parameters: dict):
         super().__init__(root, parameters)
 
-        self._s3 = boto3.resource('s3')
-        self._client = self._s3.meta.client
+        compression = self._params.get('compression', 'stored')
+        if compression not in COMPRESSION_METHODS:
+            raise ValueError('Unknown compression method "%s"' % compression)
+
+        self._compression = COMPRESSION_METHODS[compression]
+
+    @property
+    def _client(self):
+        # clients are shared by all the drivers of the process
+        return clients.get_client(self._params)
 
     def download_package(self, group: str, artifact: str, version: str,
                          tmp_artifact_dir: str, output: AbstractOutputWriter):
+        self.download_verified_package(group, artifact, version, tmp_artifact_dir, output, None)
+
+    def download_verified_package(self, group: str, artifact: str, version: str,
+                                  tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        from botocore.exceptions import ClientError
+
         # check that package exists in the repository
         package_exists = self._package_exists(group, artifact, version)
         if not package_exists:
@@ -27,43 +44,103 @@ class S3ZipDriver(AbstractDriver):
         archive_path = os.path.join(tmp_artifact_dir, 'package.zip')
 
         try:
-            self._s3.Bucket(self._root).download_file(s3_path, archive_path)
+            with metrics.timer('transfer_seconds', direction='download'), \
+                    metrics.TransferProgress('download', output) as progress:
+                with scheduler.connection(direction='download'):
+                    self._client.download_file(self._root, s3_path, archive_path,
+                                               Callback=scheduler.throttled(progress.update, direction='download'))
+                progress.add_object()
         except ClientError as e:
             raise DriverError('Download Error: %s' % e.response['Error']['Message'])
 
         # unarchive a package
-        unpack_archive(archive_path, tmp_artifact_dir)
+        with metrics.timer('stage_seconds', stage='unpack'):
+            unpack_archive(archive_path, tmp_artifact_dir, digests=digests)
 
         # remove an archive
         os.remove(archive_path)
 
+    def download_files(self, group: str, artifact: str, version: str, file_paths: list,
+                       tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        from botocore.exceptions import ClientError
+
+        s3_path = self._get_s3_artifact_path(group, artifact, version)
+
+        def read_range(start: int, end: int) -> bytes:
+            with scheduler.connection(direction='download'):
+                res = self._client.get_object(Bucket=self._root, Key=s3_path, Range='bytes=%d-%d' % (start, end))
+                data = res['Body'].read()
+
+            scheduler.throttle(len(data), direction='download')
+            progress.update(len(data))
+            return data
+
+        # only the central directory of the archive and the requested files are fetched
+        try:
+            with metrics.timer('transfer_seconds', direction='download'), \
+                    metrics.TransferProgress('download', output) as progress:
+                size = self._client.head_object(Bucket=self._root, Key=s3_path)['ContentLength']
+                with zipfile.ZipFile(RangeReader(read_range, size)) as archive:
+                    for file_path in file_paths:
+                        member_name = 'data/' + file_path.replace('\\', '/')
+                        try:
+                            member = archive.getinfo(member_name)
+                        except KeyError:
+                            raise DriverError('File "%s" not found in the archive' % member_name)
+
+                        extract_member(archive, member, tmp_artifact_dir, digests)
+                        progress.add_object()
+        except ClientError as e:
+            if e.response['Error']['Code'] == '404':
+                raise PackageNotFoundError()
+            elif e.response['Error']['Code'] == '403':
+                raise ReadAccessError()
+            else:
+                raise DriverError('Download Error: %s' % e.response['Error']['Message'])
+
     def upload_package(self, group: str, artifact: str, version: str,
                        tmp_artifact_dir: str, output: AbstractOutputWriter):
+        from botocore.exceptions import ClientError
+
         # check that this version of the package doesn't exist in the repository
         package_exists = self._package_exists(group, artifact, version)
         if package_exists:
             raise VersionExistsError()
 
-        # archive a package
-        archive_path = os.path.join(tmp_artifact_dir, 'package.zip')
-        pack_archive(tmp_artifact_dir, archive_path)
-
-        # upload an archive to S3
+        # stream an archive to S3 while it's being created,
+        # if archiving fails, the multipart upload is aborted
         s3_path = self._get_s3_artifact_path(group, artifact, version)
+        with ArchiveReader(tmp_artifact_dir, self._compression) as archive, \
+                metrics.timer('transfer_seconds', direction='upload'), \
+                metrics.TransferProgress('upload', output) as progress:
+            try:
+                with scheduler.connection(direction='upload'):
+                    self._client.upload_fileobj(archive, self._root, s3_path,
+                                                Callback=scheduler.throttled(progress.update, direction='upload'))
+            except ClientError as e:
+                raise DriverError('Upload Error: %s' % e.response['Error']['Message'])
+
+            progress.add_object()
+
+    def probe(self) -> bool:
+        from botocore.exceptions import ClientError
+
         try:
-            self._client.upload_file(archive_path, self._root, s3_path)
+            self._client.head_bucket(Bucket=self._root)
         except ClientError as e:
-            raise DriverError('Upload Error: %s' % e.response['Error']['Message'])
+            raise DriverError(e.response['Error'].get('Message') or e.response['Error']['Code'])
 
-        # remove an archive
-        os.remove(archive_path)
+        return True
 
     def _package_exists(self, group: str, artifact: str, version: str) -> bool:
+        from botocore.exceptions import ClientError
+
         path = self._get_s3_artifact_path(group, artifact, version)
         exists = True
 
         try:
-            self._client.head_object(Bucket=self._root, Key=path)
+            with metrics.timer('stage_seconds', stage='exists_check'):
+                self._client.head_object(Bucket=self._root, Key=path)
         except ClientError as e:
             if e.response['Error']['Code'] == '404':
                 exists = False
@@ -1,37 +1,218 @@
-import zipfile
 import os
+import threading
+import zipfile
+from darty.helpers.inventory import FileInventory
+from darty.package.integrity import PackageDigests
+from darty.utils import FileDigest, COPY_BUFFER_SIZE
+
+
+# supported values of the "compression" parameter
+COMPRESSION_METHODS = {
+    'stored': zipfile.ZIP_STORED,
+    'deflated': zipfile.ZIP_DEFLATED,
+}
 
 
 def get_dir_files(dir_path: str):
     """Returns paths for all files in the directory."""
-    for cur_dir, directories, filenames in os.walk(dir_path):
-        cur_rel_dir = os.path.relpath(cur_dir, dir_path)
-        if cur_rel_dir == '.':
-            cur_rel_dir = ''
+    return FileInventory.scan(dir_path).paths
+
+
+def get_empty_dirs(dir_path: str) -> list:
+    """Returns paths of empty subdirectories, they are stored in archives as directory entries."""
+    empty_dirs = []
+    for cur_dir, dir_names, file_names in os.walk(dir_path):
+        dir_names.sort()
+        if not dir_names and not file_names and cur_dir != dir_path:
+            empty_dirs.append(os.path.relpath(cur_dir, dir_path))
 
-        for filename in filenames:
-            yield os.path.join(cur_rel_dir, filename)
+    return empty_dirs
 
 
-def unpack_archive(archive_path: str, dst_dir: str, delete_file: bool = False):
-    """Unpacks downloaded package."""
-    archive = zipfile.ZipFile(archive_path)
-    archive.extractall(dst_dir)
+def unpack_archive(archive_path: str, dst_dir: str, delete_file: bool = False, digests: PackageDigests = None):
+    """Unpacks downloaded package.
+
+    :param digests: if specified, digests of the files are computed while they are extracted
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        if digests is None:
+            archive.extractall(dst_dir)
+        else:
+            for member in archive.infolist():
+                extract_member(archive, member, dst_dir, digests)
 
     if delete_file:
         os.remove(archive_path)
 
 
-def pack_archive(src_dir: str, archive_path: str):
+def extract_member(archive: zipfile.ZipFile, member: zipfile.ZipInfo, dst_dir: str, digests: PackageDigests):
+    """Extracts a file from an archive and records its digest."""
+    dst_dir = os.path.abspath(dst_dir)
+    dst_path = os.path.normpath(os.path.join(dst_dir, member.filename))
+    if not dst_path.startswith(dst_dir + os.sep):
+        raise ValueError('Archive member "%s" is outside of the package directory' % member.filename)
+
+    if member.is_dir():
+        os.makedirs(dst_path, exist_ok=True)
+        return
+
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+
+    # CRC of the member is checked by "zipfile" when the whole member was read
+    file_digest = FileDigest()
+    with archive.open(member) as f_src, open(dst_path, 'wb') as f_dst:
+        while True:
+            buf = f_src.read(COPY_BUFFER_SIZE)
+            if not buf:
+                break
+
+            f_dst.write(buf)
+            file_digest.update(buf)
+
+    digests.add(dst_path, file_digest)
+
+
+def pack_archive(src_dir: str, archive_path: str, compression: int = zipfile.ZIP_STORED):
     """Creates a new package."""
 
     # get all paths before an archive is created
-    file_paths = list(get_dir_files(src_dir))
+    file_paths = get_dir_files(src_dir)
+    dir_paths = get_empty_dirs(src_dir)
 
     # create an archive
-    archive = zipfile.ZipFile(archive_path, 'w')
+    with open(archive_path, 'wb') as f:
+        write_archive(src_dir, file_paths, f, compression, dir_paths)
+
+
+def write_archive(src_dir: str, file_paths: list, fileobj, compression: int = zipfile.ZIP_STORED,
+                  dir_paths: list = None):
+    """Writes an archive with the files to a file object.
+    The file object doesn't have to be seekable, so an archive can be streamed.
+
+    :param dir_paths: empty directories to keep in the archive
+    """
+    archive = zipfile.ZipFile(fileobj, 'w', compression)
+
+    for dir_path in (dir_paths or []):
+        archive.write(os.path.join(src_dir, dir_path), arcname=dir_path)
 
     for file_path in file_paths:
         archive.write(os.path.join(src_dir, file_path), arcname=file_path)
 
     archive.close()
+
+
+class ArchiveReader(object):
+    """Readable stream of an archive which is being created on the fly.
+
+    The archive is written to a pipe by a background thread, so it's never stored on disk
+    and every file is read only once. If creating the archive fails, the error is raised
+    by the "read()" method instead of returning the end of the stream.
+    """
+
+    def __init__(self, src_dir: str, compression: int = zipfile.ZIP_STORED):
+        file_paths = get_dir_files(src_dir)
+        dir_paths = get_empty_dirs(src_dir)
+
+        read_fd, write_fd = os.pipe()
+        self._reader = os.fdopen(read_fd, 'rb')
+        self._writer = os.fdopen(write_fd, 'wb')
+        self._error = None
+
+        self._thread = threading.Thread(target=self._write, args=(src_dir, file_paths, dir_paths, compression),
+                                        daemon=True)
+        self._thread.start()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._reader.read(size)
+        if not data:
+            self._thread.join()
+            if self._error:
+                raise self._error
+
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def close(self):
+        # the writer gets an error if it's still running
+        self._reader.close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _write(self, src_dir: str, file_paths: list, dir_paths: list, compression: int):
+        try:
+            with self._writer:
+                write_archive(src_dir, file_paths, self._writer, compression, dir_paths)
+        except Exception as e:
+            self._error = e
+
+
+class RangeReader(object):
+    """Seekable read-only stream of a remote object which is fetched by byte ranges,
+    so single files can be extracted from a remote archive without downloading all of it.
+
+    :param read_range: function which returns bytes of the object from "start" to "end" (inclusive)
+    :param size: size of the object
+    :param min_read_size: reads are rounded up to this size, because "zipfile" makes many small reads
+    """
+
+    def __init__(self, read_range, size: int, min_read_size: int = 256 * 1024):
+        self._read_range = read_range
+        self._size = size
+        self._min_read_size = min_read_size
+        self._pos = 0
+        self._buffer = b''
+        self._buffer_pos = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._size - self._pos
+
+        size = min(size, self._size - self._pos)
+        if size <= 0:
+            return b''
+
+        # fetch the range if it's not buffered
+        offset = self._pos - self._buffer_pos
+        if offset < 0 or offset + size > len(self._buffer):
+            end = min(self._pos + max(size, self._min_read_size), self._size) - 1
+            self._buffer = self._read_range(self._pos, end)
+            self._buffer_pos = self._pos
+            offset = 0
+
+        data = self._buffer[offset:offset + size]
+        self._pos += len(data)
+
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._size
+
+        self._pos = max(0, offset)
+
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def close(self):
+        self._buffer = b''
@@ -0,0 +1,127 @@
+import logging
+import os
+from shutil import rmtree
+from darty import metrics
+from darty.drivers.abstract import AbstractDriver, DriverError, PackageNotFoundError, VersionExistsError
+from darty.output_writer import AbstractOutputWriter
+from darty.package.integrity import PackageDigests, IntegrityError, verify_package
+from darty.package.repository import Repository
+
+
+class TieredDriver(AbstractDriver):
+    """Stack of repositories: the "tiers" parameter is a list of repository configurations
+    ("type", "root" and "parameters"), the nearest (fastest) tier goes first and the last tier is authoritative.
+
+    Packages are downloaded from the first tier which has them and then copied to the tiers which missed
+    them. Packages are published to the authoritative tier and then copied to the other tiers. Failures
+    of the other tiers are reported, but they don't fail downloads or publishing.
+    """
+
+    def __init__(self, root: str, parameters: dict = None):
+        super().__init__(root, parameters)
+
+        tiers = self._params.get('tiers')
+        if not isinstance(tiers, list) or len(tiers) < 2:
+            raise ValueError('The "tiers" parameter of the "tiered" driver must be a list of at least 2 repositories')
+
+        # tier drivers are created lazily and shared with other repositories
+        self._tiers = [Repository(config) for config in tiers]
+
+    def download_package(self, group: str, artifact: str, version: str,
+                         tmp_artifact_dir: str, output: AbstractOutputWriter):
+        self.download_verified_package(group, artifact, version, tmp_artifact_dir, output, None)
+
+    def download_verified_package(self, group: str, artifact: str, version: str,
+                                  tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        def download(tier: Repository, tier_digests: PackageDigests):
+            tier.driver.download_verified_package(group, artifact, version, tmp_artifact_dir, output, tier_digests)
+
+        tier, tier_digests, missed = self._download(download, tmp_artifact_dir, output, digests is not None)
+
+        # copy the package to the tiers which don't have it, only if it's not corrupted
+        if missed:
+            try:
+                verify_package(tmp_artifact_dir, tier_digests)
+            except IntegrityError as e:
+                output.write('[!] The package is not copied to the other tiers: %s' % str(e))
+            else:
+                self._copy_to_tiers(missed, group, artifact, version, tmp_artifact_dir, output)
+
+        if digests is not None:
+            digests.update(tier_digests)
+
+    def download_files(self, group: str, artifact: str, version: str, file_paths: list,
+                       tmp_artifact_dir: str, output: AbstractOutputWriter, digests: PackageDigests):
+        def download(tier: Repository, tier_digests: PackageDigests):
+            tier.driver.download_files(group, artifact, version, file_paths, tmp_artifact_dir, output, tier_digests)
+
+        _, tier_digests, _ = self._download(download, tmp_artifact_dir, output, digests is not None)
+
+        if digests is not None:
+            digests.update(tier_digests)
+
+    def upload_package(self, group: str, artifact: str, version: str,
+                       tmp_artifact_dir: str, output: AbstractOutputWriter):
+        # "VersionExistsError" of the authoritative tier fails the publishing
+        self._tiers[-1].driver.upload_package(group, artifact, version, tmp_artifact_dir, output)
+        self._copy_to_tiers(self._tiers[:-1], group, artifact, version, tmp_artifact_dir, output)
+
+    def _download(self, download, tmp_artifact_dir: str, output: AbstractOutputWriter, record_digests: bool):
+        """Tries the tiers one by one until one of them has the package.
+
+        :return: (tier, digests, missed tiers) tuple, "missed tiers" don't have the package
+        :raises PackageNotFoundError: if the authoritative tier doesn't have the package
+        """
+        missed = []
+        for i, tier in enumerate(self._tiers):
+            authoritative = (i == len(self._tiers) - 1)
+            tier_name = self._get_tier_name(tier)
+
+            # digests of a failed attempt must not be used to verify files of another tier
+            tier_digests = PackageDigests() if record_digests else None
+
+            try:
+                download(tier, tier_digests)
+            except PackageNotFoundError:
+                metrics.inc('tier_lookups', tier=tier_name, result='miss')
+                if authoritative:
+                    raise
+
+                missed.append(tier)
+            except (DriverError, OSError) as e:
+                metrics.inc('tier_lookups', tier=tier_name, result='error')
+                if authoritative:
+                    raise
+
+                logging.debug('Tier "%s": %s' % (tier_name, str(e)))
+                output.write('[!] Tier "%s" is not available (%s)' % (tier_name, str(e)))
+            else:
+                metrics.inc('tier_lookups', tier=tier_name, result='hit')
+                return tier, tier_digests, missed
+
+            self._clean_dir(tmp_artifact_dir)
+
+    def _copy_to_tiers(self, tiers: list, group: str, artifact: str, version: str,
+                       tmp_artifact_dir: str, output: AbstractOutputWriter):
+        for tier in tiers:
+            tier_name = self._get_tier_name(tier)
+            try:
+                tier.driver.upload_package(group, artifact, version, tmp_artifact_dir, output)
+            except VersionExistsError:
+                # the tier got the package from another host
+                continue
+            except (DriverError, OSError) as e:
+                output.write('[!] The package is not copied to the tier "%s" (%s)' % (tier_name, str(e)))
+                continue
+
+            output.write('[+] The package was copied to the tier "%s"' % tier_name)
+
+    @staticmethod
+    def _clean_dir(dir_path: str):
+        for name in os.listdir(dir_path):
+            path = os.path.join(dir_path, name)
+            rmtree(path) if os.path.isdir(path) else os.remove(path)
+
+    @staticmethod
+    def _get_tier_name(tier: Repository) -> str:
+        return '%s:%s' % (tier.type, tier.root)
@@ -0,0 +1,23 @@
+import asyncio
+import contextvars
+import functools
+
+
+async def run_sync(func, *args, executor=None, **kwargs):
+    """Runs a blocking function in an executor.
+
+    A running thread can't be interrupted, so if the calling task is cancelled,
+    the function is still awaited before "CancelledError" is re-raised. After that
+    the caller can safely clean up the files the function was working with.
+
+    Context variables of the calling task (for example, the transfer priority) are visible to the function.
+    """
+    loop = asyncio.get_event_loop()
+    context = contextvars.copy_context()
+    future = loop.run_in_executor(executor, functools.partial(context.run, func, *args, **kwargs))
+
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
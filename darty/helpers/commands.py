@@ -1,4 +1,8 @@
+import glob
+import os
+from fnmatch import fnmatchcase
 from darty.dependency_manager import DependencyManager
+from darty.package.repository import RepositoryPool
 
 
 def get_dependencies_by_name(manager: DependencyManager, group: str, artifact: str):
@@ -16,3 +20,88 @@ def get_dependencies_by_name(manager: DependencyManager, group: str, artifact: s
         dependencies = list(manager.dependencies.values())
 
     return dependencies
+
+
+def get_managers(config_patterns: list, py_package_patterns: list, darty_profile: str,
+                 repository_pool: RepositoryPool = None) -> list:
+    """Creates dependency managers for configuration files and Python packages, names can be glob patterns."""
+    managers = []
+
+    for pattern in config_patterns:
+        config_paths = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        if not config_paths:
+            raise ValueError('No configuration files match "%s"' % pattern)
+
+        for config_path in config_paths:
+            try:
+                managers.append(DependencyManager(config_path, darty_profile, repository_pool))
+            except ValueError as e:
+                raise ValueError('%s: %s' % (config_path, str(e)))
+
+    for pattern in py_package_patterns:
+        package_names = find_py_packages(pattern) if glob.has_magic(pattern) else [pattern]
+        if not package_names:
+            raise ValueError('No Python packages match "%s"' % pattern)
+
+        for package_name in package_names:
+            try:
+                managers.append(DependencyManager.from_py_package(package_name, darty_profile=darty_profile,
+                                                                  repository_pool=repository_pool))
+            except ImportError:
+                raise ValueError('Python package "%s" not found' % package_name)
+
+    return managers
+
+
+def find_py_packages(pattern: str) -> list:
+    """Returns names of installed top-level Python packages which match a glob pattern
+    and contain a Darty configuration file.
+    """
+    import pkgutil
+
+    package_names = []
+    for module_info in pkgutil.iter_modules():
+        if module_info.ispkg and fnmatchcase(module_info.name, pattern):
+            finder_path = getattr(module_info.module_finder, 'path', None)
+            if finder_path and os.path.isfile(os.path.join(finder_path, module_info.name,
+                                                           DependencyManager.DEFAULT_CONFIG_FILE)):
+                package_names.append(module_info.name)
+
+    return sorted(set(package_names))
+
+
+def get_installed_dependencies(packages_dir: str) -> list:
+    """Returns dependencies for all the packages installed in the packages directory. Repositories
+    are restored from the paths of the packages, so they don't have driver parameters.
+    """
+    from darty.package.dependency import Dependency
+    from darty.package.package_info import PackageInfo
+    from darty.package.repository import Repository
+    from darty.package.storage import scan_artifacts, ENV_TMP
+
+    dependencies = {}
+    for artifact in scan_artifacts(packages_dir):
+        if artifact.env == ENV_TMP:
+            continue
+
+        # path: {repository_type}/{repository_root}/{group path}/{environment}/{artifact}-{version}
+        path_parts = os.path.relpath(artifact.path, packages_dir).split(os.sep)
+        if len(path_parts) < 5:
+            continue
+
+        try:
+            package_info = PackageInfo.from_artifact_dir(artifact.path, False)
+            package_info.files.close()
+
+            dependency = Dependency({'group': package_info.group, 'artifact': package_info.artifact,
+                                     'version': package_info.version},
+                                    Repository({'type': path_parts[0], 'root': path_parts[1]}),
+                                    packages_dir, packages_dir)
+        except (OSError, ValueError, KeyError):
+            # not a package
+            continue
+
+        if os.path.normpath(dependency.get_artifact_dir(artifact.env)) == os.path.normpath(artifact.path):
+            dependencies.setdefault(dependency.get_artifact_dir(), dependency)
+
+    return list(dependencies.values())
@@ -0,0 +1,51 @@
+import os
+import threading
+
+
+class FileCache(object):
+    """Thread-safe in-process cache for values loaded from files.
+
+    A cached value is reused while the size, the modification time and the inode
+    of the file stay the same, so checking an entry costs a single "stat" call.
+    Entries can also be invalidated explicitly when a file is known to be changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, path: str, loader):
+        """Returns a cached value for the file or loads it using the "loader" function.
+
+        :param path: path to the file
+        :param loader: function which takes a file path and returns a value
+        :raises FileNotFoundError: if the file doesn't exist
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.invalidate(path)
+            raise
+
+        signature = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+        with self._lock:
+            entry = self._entries.get(path)
+
+        if entry and entry[0] == signature:
+            return entry[1]
+
+        value = loader(path)
+
+        with self._lock:
+            self._entries[path] = (signature, value)
+
+        return value
+
+    def invalidate(self, path: str = None):
+        """Removes a cached value for the file or all the cached values if the path is not specified."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
@@ -0,0 +1,111 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# a file within an inventory: path relative to the inventory root, size in bytes and modification time
+FileEntry = namedtuple('FileEntry', ['path', 'size', 'mtime_ns'])
+
+
+class FileInventory(object):
+    """List of files in a directory with their stat results.
+
+    The directory is scanned only once using "os.scandir()", subdirectories are scanned
+    in parallel. Files are always ordered the same way as "os.walk()" would return them
+    if every directory listing was sorted by name: files of a directory go first,
+    then the content of its subdirectories.
+    """
+
+    # number of threads to scan subdirectories
+    DEFAULT_WORKERS = 8
+
+    def __init__(self, root: str, entries: list):
+        self.root = root
+        self._entries = entries
+
+    @classmethod
+    def scan(cls, root: str, follow_links: bool = False, workers: int = DEFAULT_WORKERS):
+        """Scans a directory.
+
+        :param root: directory to scan
+        :param follow_links: scan directories which are symbolic links
+        :param workers: number of threads to scan subdirectories
+        """
+        listings = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            pending = {executor.submit(_scan_dir, root, '', follow_links): ''}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rel_dir = pending.pop(future)
+                    files, subdirs = future.result()
+                    listings[rel_dir] = (files, subdirs)
+
+                    for subdir in subdirs:
+                        rel_subdir = os.path.join(rel_dir, subdir)
+                        pending[executor.submit(_scan_dir, root, rel_subdir, follow_links)] = rel_subdir
+
+        # put the listings together in a deterministic order
+        entries = []
+        stack = ['']
+        while stack:
+            rel_dir = stack.pop()
+            files, subdirs = listings[rel_dir]
+            entries += files
+            stack += [os.path.join(rel_dir, subdir) for subdir in reversed(subdirs)]
+
+        return cls(root, entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def paths(self) -> list:
+        """Relative paths of all the files."""
+        return [entry.path for entry in self._entries]
+
+    @property
+    def total_size(self) -> int:
+        return sum(entry.size for entry in self._entries)
+
+    def get_abs_path(self, entry: FileEntry) -> str:
+        return os.path.join(self.root, entry.path)
+
+
+def sort_paths(paths) -> list:
+    """Sorts relative file paths in the same order as a "FileInventory" lists them."""
+    def get_key(path: str):
+        parts = path.replace('\\', '/').split('/')
+        return [(1, part) for part in parts[:-1]] + [(0, parts[-1])]
+
+    return sorted(paths, key=get_key)
+
+
+def _scan_dir(root: str, rel_dir: str, follow_links: bool):
+    """Returns sorted lists of files and subdirectories of a directory."""
+    files = []
+    subdirs = []
+
+    with os.scandir(os.path.join(root, rel_dir)) as dir_entries:
+        for dir_entry in dir_entries:
+            # the same classification as "os.walk()" uses
+            try:
+                is_dir = dir_entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if is_dir:
+                if follow_links or not dir_entry.is_symlink():
+                    subdirs.append(dir_entry.name)
+            else:
+                stat = dir_entry.stat()
+                files.append(FileEntry(os.path.join(rel_dir, dir_entry.name), stat.st_size, stat.st_mtime_ns))
+
+    files.sort()
+    subdirs.sort()
+
+    return files, subdirs
@@ -0,0 +1,155 @@
+import contextvars
+import queue
+import threading
+import time
+from darty import metrics
+
+
+class Stage(object):
+    """Stage of a pipeline: a function which processes an item and returns False
+    if the item must not go to the next stages.
+    """
+
+    def __init__(self, name: str, func, workers: int = 1):
+        if workers < 1:
+            raise ValueError('Number of workers of the "%s" stage must be positive' % name)
+
+        self.name = name
+        self.func = func
+        self.workers = workers
+
+
+class Pipeline(object):
+    """Runs items through a sequence of stages. Every stage has its own threads, so stages of different
+    items overlap: for example, one package is downloaded while another one is verified.
+
+    Queues between stages are bounded: if a stage is slow, the previous stage waits (back-pressure),
+    so the number of items between stages stays limited. Busy time of the stages is recorded
+    as the "pipeline_busy_seconds" timer, the time the stages were running multiplied by the number
+    of workers is recorded as the "pipeline_capacity_seconds" counter.
+    """
+
+    def __init__(self, stages: list, queue_size: int = 1):
+        """
+        :param stages: list of "Stage" objects
+        :param queue_size: maximum number of items waiting for a stage
+        """
+        if not stages:
+            raise ValueError('Pipeline must have at least one stage')
+
+        self.stages = stages
+        self.queue_size = queue_size
+
+        self._lock = threading.Lock()
+        self._busy_seconds = {stage.name: 0.0 for stage in stages}
+        self._wall_seconds = 0.0
+
+    def run(self, items: list, feed_order: list = None):
+        """Processes the items and yields them in the input order as soon as they are done.
+
+        :param items: list of items
+        :param feed_order: indexes of the items in the order they enter the pipeline (the input order by default)
+        :return: generator of (item, exception) tuples, "exception" is raised by a stage or None
+        """
+        num_items = len(items)
+        queues = [queue.Queue(self.queue_size) for _ in self.stages]
+        done = [threading.Event() for _ in range(num_items)]
+        errors = [None] * num_items
+        cancelled = threading.Event()
+        running_workers = [stage.workers for stage in self.stages]
+        start_time = time.perf_counter()
+
+        def finish(index: int, error: Exception = None):
+            errors[index] = error
+            done[index].set()
+
+        def feed():
+            for index in (feed_order if feed_order is not None else range(num_items)):
+                if cancelled.is_set():
+                    finish(index)
+                else:
+                    queues[0].put(index)
+
+            for _ in range(self.stages[0].workers):
+                queues[0].put(None)
+
+        def work(stage_index: int):
+            stage = self.stages[stage_index]
+            is_last = (stage_index == len(self.stages) - 1)
+
+            while True:
+                index = queues[stage_index].get()
+                if index is None:
+                    break
+
+                if cancelled.is_set():
+                    finish(index)
+                    continue
+
+                stage_start = time.perf_counter()
+                try:
+                    keep = stage.func(items[index])
+                except Exception as e:
+                    self._add_busy_time(stage.name, time.perf_counter() - stage_start)
+                    finish(index, e)
+                    continue
+
+                self._add_busy_time(stage.name, time.perf_counter() - stage_start)
+
+                if is_last or keep is False:
+                    finish(index)
+                else:
+                    # waits if the next stage is busy
+                    queues[stage_index + 1].put(index)
+
+            # the last worker of the stage stops the next stage
+            with self._lock:
+                running_workers[stage_index] -= 1
+                stopped = not running_workers[stage_index]
+
+            if stopped and not is_last:
+                for _ in range(self.stages[stage_index + 1].workers):
+                    queues[stage_index + 1].put(None)
+
+        # every thread gets its own copy of the context (transfer priorities, traces)
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(feed,), daemon=True)]
+        for stage_index, stage in enumerate(self.stages):
+            threads += [threading.Thread(target=contextvars.copy_context().run, args=(work, stage_index),
+                                         daemon=True) for _ in range(stage.workers)]
+
+        for thread in threads:
+            thread.start()
+
+        interrupted = False
+        try:
+            for index in range(num_items):
+                done[index].wait()
+                yield items[index], errors[index]
+        except BaseException as e:
+            # running stages can't be interrupted, so they are not waited for after Ctrl+C
+            interrupted = not isinstance(e, GeneratorExit)
+            raise
+        finally:
+            # if the caller stops early, the remaining items are skipped
+            cancelled.set()
+            if not interrupted:
+                for thread in threads:
+                    thread.join()
+
+            wall_seconds = time.perf_counter() - start_time
+            with self._lock:
+                self._wall_seconds += wall_seconds
+
+            for stage in self.stages:
+                metrics.inc('pipeline_capacity_seconds', wall_seconds * stage.workers, stage=stage.name)
+
+    def get_utilization(self) -> dict:
+        """Returns the fraction of time the workers of every stage were busy."""
+        with self._lock:
+            return {stage.name: (self._busy_seconds[stage.name] / (self._wall_seconds * stage.workers)
+                                 if self._wall_seconds else 0.0) for stage in self.stages}
+
+    def _add_busy_time(self, stage_name: str, seconds: float):
+        metrics.observe('pipeline_busy_seconds', seconds, stage=stage_name)
+        with self._lock:
+            self._busy_seconds[stage_name] += seconds
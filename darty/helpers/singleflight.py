@@ -0,0 +1,53 @@
+import threading
+
+
+class SingleFlight(object):
+    """Collapses concurrent calls with the same key into one: the first caller runs the function,
+    the other ones wait for it and get the same result (or the same exception).
+
+    Results are not cached, a call which starts after the previous one finished runs the function again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """Runs the function or waits for the running call with the same key.
+
+        :return: (result, shared) tuple, "shared" is True if the result came from another caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.done.set()
+
+        return call.result, False
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import time
+
+
+class StatCache(object):
+    """Persistent cache of file digests for a directory, keyed by the size and the modification time
+    of every file, so only files whose stat changed are hashed again.
+
+    The cache file is loaded only when it's used for the first time. A file can be modified within
+    the resolution of the file system timestamps right after it was hashed, so digests of files
+    modified shortly before the cache is saved are not kept.
+    """
+
+    # files modified less than this number of seconds before saving the cache are hashed again next time
+    RACY_INTERVAL = 2
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self._entries = None
+        self._changed = False
+
+    @classmethod
+    def for_dir(cls, cache_dir: str, dir_path: str):
+        """Returns a cache for a directory, the cache file is stored in the cache directory."""
+        key = hashlib.sha1(os.path.abspath(dir_path).encode('utf-8')).hexdigest()
+        return cls(os.path.join(cache_dir, key + '.json'))
+
+    def load(self):
+        try:
+            with open(self.cache_path) as f:
+                self._entries = {file_path: tuple(entry) for file_path, entry in json.load(f).items()}
+        except (OSError, ValueError, AttributeError, TypeError):
+            # the cache is missing or corrupted
+            self._entries = {}
+
+    def get(self, file_path: str, size: int, mtime_ns: int) -> str:
+        """Returns a digest of the file if its size and modification time didn't change."""
+        if self._entries is None:
+            self.load()
+
+        entry = self._entries.get(file_path)
+        if entry and entry[0] == size and entry[1] == mtime_ns:
+            return entry[2]
+
+        return None
+
+    def set(self, file_path: str, size: int, mtime_ns: int, digest: str):
+        if self._entries is None:
+            self.load()
+
+        if self._entries.get(file_path) != (size, mtime_ns, digest):
+            self._entries[file_path] = (size, mtime_ns, digest)
+            self._changed = True
+
+    def retain(self, file_paths):
+        """Removes entries of the files which don't exist anymore (if the cache was used)."""
+        if self._entries is None:
+            return
+
+        file_paths = set(file_paths)
+        for file_path in list(self._entries):
+            if file_path not in file_paths:
+                del self._entries[file_path]
+                self._changed = True
+
+    def save(self):
+        """Writes the cache atomically if it was changed."""
+        if not self._changed:
+            return
+
+        min_mtime_ns = (time.time() - self.RACY_INTERVAL) * 1e9
+        entries = {file_path: entry for file_path, entry in self._entries.items() if entry[1] < min_mtime_ns}
+
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = '%s.%d.tmp' % (self.cache_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f, separators=(',', ':'))
+
+        os.replace(tmp_path, self.cache_path)
+        self._changed = False
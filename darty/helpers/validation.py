@@ -1,14 +1,20 @@
-from schema import Schema, Use
+from functools import lru_cache
 
 
 def validate_dependency_config(data):
     # TODO: move all validations for the config file here
-    schema = Schema({
+    return _get_dependency_config_schema().validate(data)
+
+
+@lru_cache(maxsize=None)
+def _get_dependency_config_schema():
+    """The schema is built once, "schema" is imported only when a configuration is validated."""
+    from schema import Schema, Use
+
+    return Schema({
         'repositories': object,
         'dependencies': [{
             'version': Use(str),
             object: object,
         }],
     })
-
-    return schema.validate(data)
@@ -0,0 +1,338 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from darty import tracing
+from darty.output_writer import AbstractOutputWriter
+
+
+# supported formats of a metrics file
+METRICS_FORMATS = ('json', 'prometheus')
+
+# prefix of metric names in the Prometheus format
+PROMETHEUS_PREFIX = 'darty_'
+
+# descriptions of the metrics Darty collects
+METRICS_HELP = {
+    'transfer_bytes': 'Bytes transferred to or from a repository',
+    'transfer_objects': 'Objects (files or archives) transferred to or from a repository',
+    'transfer_seconds': 'Time spent transferring packages',
+    's3_requests': 'Requests sent to the S3 API',
+    'package_cache': 'Lookups of already installed packages',
+    'stage_seconds': 'Time spent in a stage of downloading, publishing or updating a package',
+    'queue_wait_seconds': 'Time transfers waited for a free connection or for the bandwidth limit',
+    'peer_cache': 'Packages downloaded from a peer cache (hits) or from the repository after the peer failed (misses)',
+    'server_requests': 'Requests handled by the package server',
+    'tier_lookups': 'Package lookups in the tiers of a tiered repository',
+    'mirror_downloads': 'Downloads from the mirrors of a repository',
+    'mirror_hedges': 'Slow downloads which were repeated from another mirror at the same time',
+    'pipeline_busy_seconds': 'Time the workers of an install pipeline stage spent processing packages',
+    'pipeline_capacity_seconds': 'Time an install pipeline was running multiplied by the number of workers of a stage',
+}
+
+
+class MetricsRegistry(object):
+    """Thread-safe registry of counters and timers.
+
+    A metric is identified by a name and a set of labels, for example
+    "transfer_bytes" with the label "direction" set to "download".
+
+    Besides the sum of durations, a timer measured by "timer()" keeps its wall-clock time:
+    the time at least one block was running. Blocks running at the same time (concurrent
+    downloads) or nested blocks are counted once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+        self._running = {}  # key -> (number of running blocks, start of the first one)
+        self._wall_times = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Increases a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Adds a duration to a timer."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            count, total = self._timers.get(key, (0, 0.0))
+            self._timers[key] = (count + 1, total + seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Measures the duration of a "with" block, including the blocks which raised an exception.
+        If tracing is enabled, the block is also recorded as a span.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        start = time.perf_counter()
+        with self._lock:
+            num_running, first_start = self._running.get(key, (0, start))
+            self._running[key] = (num_running + 1, first_start)
+
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                if key in self._running:
+                    num_running, first_start = self._running.pop(key)
+                    if num_running > 1:
+                        self._running[key] = (num_running - 1, first_start)
+                    else:
+                        self._wall_times[key] = self._wall_times.get(key, 0.0) + end - first_start
+
+            self.observe(name, end - start, **labels)
+            tracing.add_span(_get_span_name(name, labels), start, end, 'metrics', **labels)
+
+    def get_counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def get_timer(self, name: str, **labels) -> tuple:
+        """Returns the number of measurements and the total duration in seconds."""
+        with self._lock:
+            return self._timers.get((name, tuple(sorted(labels.items()))), (0, 0.0))
+
+    def get_wall_time(self, name: str, **labels) -> float:
+        """Returns the time in seconds at least one block of the timer was running (see "timer()")."""
+        with self._lock:
+            return self._wall_times.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+            self._running.clear()
+            self._wall_times.clear()
+
+    def get_throughput(self) -> dict:
+        """Returns average transfer speed in bytes per second for every direction.
+
+        Bytes are divided by the wall-clock time of the transfers, so concurrent transfers
+        don't lower the speed. Durations added by "observe()" are only summed.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            timers = dict(self._timers)
+            wall_times = dict(self._wall_times)
+
+        throughput = {}
+        for key, (count, seconds) in timers.items():
+            name, labels = key
+            seconds = wall_times.get(key, seconds)
+            if name == 'transfer_seconds' and seconds > 0:
+                direction = dict(labels).get('direction')
+                throughput[direction] = counters.get(('transfer_bytes', labels), 0) / seconds
+
+        return throughput
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            timers = sorted(self._timers.items())
+
+        res = {'counters': {}, 'timers': {}, 'throughput': self.get_throughput()}
+
+        for (name, labels), value in counters:
+            res['counters'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+
+        for (name, labels), (count, seconds) in timers:
+            res['timers'].setdefault(name, []).append({'labels': dict(labels), 'count': count, 'sum': seconds})
+
+        return res
+
+    def to_prometheus(self) -> str:
+        """Returns metrics in the Prometheus text format, counters are exported with the "_total" suffix
+        and timers as summaries.
+        """
+        data = self.to_dict()
+        lines = []
+
+        for name, samples in data['counters'].items():
+            metric_name = PROMETHEUS_PREFIX + name + '_total'
+            lines += _get_prometheus_header(metric_name, name, 'counter')
+            for sample in samples:
+                lines.append('%s%s %s' % (metric_name, _format_labels(sample['labels']), _format_value(sample['value'])))
+
+        for name, samples in data['timers'].items():
+            metric_name = PROMETHEUS_PREFIX + name
+            lines += _get_prometheus_header(metric_name, name, 'summary')
+            for sample in samples:
+                labels = _format_labels(sample['labels'])
+                lines.append('%s_sum%s %s' % (metric_name, labels, _format_value(sample['sum'])))
+                lines.append('%s_count%s %d' % (metric_name, labels, sample['count']))
+
+        if data['throughput']:
+            metric_name = PROMETHEUS_PREFIX + 'transfer_throughput_bytes_per_second'
+            lines += ['# HELP %s Average transfer speed' % metric_name, '# TYPE %s gauge' % metric_name]
+            for direction, value in sorted(data['throughput'].items()):
+                lines.append('%s%s %s' % (metric_name, _format_labels({'direction': direction}), _format_value(value)))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, file_path: str, metrics_format: str = 'json'):
+        """Writes metrics to a file. The file is replaced atomically,
+        so it can be used as a textfile for the Prometheus node exporter.
+        """
+        if metrics_format not in METRICS_FORMATS:
+            raise ValueError('Unknown metrics format "%s"' % metrics_format)
+
+        if metrics_format == 'prometheus':
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_dict(), indent=2)
+
+        tmp_file_path = file_path + '.tmp'
+        with open(tmp_file_path, 'w') as f:
+            f.write(content)
+
+        os.replace(tmp_file_path, file_path)
+
+
+class TransferProgress(object):
+    """Counts transferred bytes and shows the speed and the remaining time using an output writer.
+
+    The "update()" method can be used as a callback for boto3 transfers,
+    it's thread-safe and refreshes the output at most every "REFRESH_INTERVAL" seconds.
+    """
+
+    REFRESH_INTERVAL = 0.5
+
+    def __init__(self, direction: str, output: AbstractOutputWriter, total_bytes: int = None,
+                 registry: MetricsRegistry = None):
+        self.direction = direction
+        self.total_bytes = total_bytes
+        self.transferred_bytes = 0
+
+        self._output = output
+        self._registry = registry if registry else _registry
+        self._lock = threading.Lock()
+        self._start_time = time.perf_counter()
+        self._refresh_time = self._start_time
+
+    def update(self, num_bytes: int):
+        self._registry.inc('transfer_bytes', num_bytes, direction=self.direction)
+
+        with self._lock:
+            self.transferred_bytes += num_bytes
+
+            now = time.perf_counter()
+            if now - self._refresh_time < self.REFRESH_INTERVAL:
+                return
+
+            self._refresh_time = now
+            message = self.get_message(now)
+
+        self._output.write_progress(message)
+
+    def add_object(self):
+        """Counts a transferred object."""
+        self._registry.inc('transfer_objects', direction=self.direction)
+
+    def get_message(self, now: float = None) -> str:
+        elapsed = (now if now else time.perf_counter()) - self._start_time
+        speed = self.transferred_bytes / elapsed if elapsed > 0 else 0
+
+        message = '%s: %s' % (self.direction.capitalize(), format_size(self.transferred_bytes))
+        if self.total_bytes:
+            message += ' / %s' % format_size(self.total_bytes)
+
+        message += ', %s/s' % format_size(speed)
+
+        if self.total_bytes and speed:
+            eta = max(self.total_bytes - self.transferred_bytes, 0) / speed
+            message += ', ETA %d:%02d' % divmod(int(eta), 60)
+
+        return message
+
+    def close(self):
+        self._output.end_progress()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def format_size(num_bytes: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024:
+            return '%.1f %s' % (num_bytes, unit) if unit != 'B' else '%d B' % num_bytes
+        num_bytes /= 1024
+
+    return '%.1f TB' % num_bytes
+
+
+def instrument_boto_client(client):
+    """Counts requests sent by a boto3 client using its event system.
+    If tracing is enabled, every request (including parts of multipart transfers) is recorded as a span.
+    """
+    def before_call(model, context, **kwargs):
+        _registry.inc('s3_requests', api=model.name)
+        context['darty_start_time'] = time.perf_counter()
+
+    def after_call(model, context, **kwargs):
+        if 'darty_start_time' in context:
+            tracing.add_span('s3:' + model.name, context['darty_start_time'], time.perf_counter(), 's3')
+
+    client.meta.events.register('before-call.s3', before_call, unique_id='darty-metrics-before-call')
+    client.meta.events.register('after-call.s3', after_call, unique_id='darty-metrics-after-call')
+
+    return client
+
+
+def _get_span_name(name: str, labels: dict) -> str:
+    """Converts a timer name to a span name, for example: "stage_seconds" with the "unpack" stage
+    becomes "stage:unpack".
+    """
+    if name.endswith('_seconds'):
+        name = name[:-len('_seconds')]
+
+    return ':'.join([name] + [str(value) for _, value in sorted(labels.items())])
+
+
+def _get_prometheus_header(metric_name: str, name: str, metric_type: str) -> list:
+    lines = []
+    if name in METRICS_HELP:
+        lines.append('# HELP %s %s' % (metric_name, METRICS_HELP[name]))
+    lines.append('# TYPE %s %s' % (metric_name, metric_type))
+
+    return lines
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+
+    return '{%s}' % ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                             for key, value in sorted(labels.items()))
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# process-wide registry
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    return _registry
+
+
+def inc(name: str, value: float = 1, **labels):
+    _registry.inc(name, value, **labels)
+
+
+def observe(name: str, seconds: float, **labels):
+    _registry.observe(name, seconds, **labels)
+
+
+def timer(name: str, **labels):
+    return _registry.timer(name, **labels)
@@ -24,6 +24,14 @@ class AbstractOutputWriter(ABC):
         yield
         self.decrease_indent()
 
+    def write_progress(self, message: str):
+        """Shows a status line which is replaced by the next one. Does nothing by default."""
+        pass
+
+    def end_progress(self):
+        """Finishes a status line."""
+        pass
+
 
 class OutputWriter(AbstractOutputWriter):
     def __init__(self):
@@ -37,10 +45,28 @@ class OutputWriter(AbstractOutputWriter):
         logger.addHandler(stream_handler)
 
         self._logger = logger
+        self._progress_width = 0
 
     def write(self, message: str):
+        self.end_progress()
         self._logger.info(' ' * self._indent + message)
 
+    def write_progress(self, message: str):
+        # a status line can be rewritten only in a terminal
+        if not sys.stdout.isatty():
+            return
+
+        line = ' ' * self._indent + message
+        sys.stdout.write('\r' + line.ljust(self._progress_width))
+        sys.stdout.flush()
+        self._progress_width = len(line)
+
+    def end_progress(self):
+        if self._progress_width:
+            sys.stdout.write('\n')
+            sys.stdout.flush()
+            self._progress_width = 0
+
 
 class NullOutputWriter(AbstractOutputWriter):
     def __init__(self):
@@ -48,3 +74,21 @@ class NullOutputWriter(AbstractOutputWriter):
 
     def write(self, message):
         pass
+
+
+class BufferedOutputWriter(AbstractOutputWriter):
+    """Collects messages in memory, so the output of concurrent operations is not interleaved."""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def write(self, message: str):
+        self.messages.append(' ' * self._indent + message)
+
+    def flush(self, output: AbstractOutputWriter):
+        """Writes collected messages to another output writer."""
+        for message in self.messages:
+            output.write(message)
+
+        self.messages = []
@@ -1,13 +1,39 @@
 import json
 import os
-from collections import OrderedDict
+import time
+from collections import OrderedDict, namedtuple, deque
 from shutil import rmtree
+from darty import metrics, scheduler, tracing
+from darty.helpers.file_cache import FileCache
+from darty.helpers.inventory import FileInventory, sort_paths
+from darty.helpers.stat_cache import StatCache
 from darty.output_writer import AbstractOutputWriter, NullOutputWriter
+from darty.package.file_index import convert_info_json
+from darty.package.integrity import PackageDigests, IntegrityError, VerificationReport, verify_package, \
+    verify_installed_package
 from darty.package.package_info import PackageInfo
 from darty.package.repository import Repository
+from darty.package.storage import access_tracker, collect_garbage
 from darty.package.validators import check_group_name, check_artifact_name, check_version_number, \
      check_files_file_path
-from darty.utils import file_exists, dir_exists, get_dir_hash, is_dir_empty, copy_dir, copy_file, convert_path_w2u
+from darty.utils import file_exists, dir_exists, is_dir_empty, copy_dir, copy_file, move_dir, convert_path_w2u, \
+    DirHash, FileDigest
+
+
+# difference between a working directory and an installed package
+PackageDiff = namedtuple('PackageDiff', ['added', 'modified', 'deleted'])
+
+
+class FetchedPackage(object):
+    """Result of "Dependency.fetch()": an installed package has only the package info,
+    a downloaded one has the temporary directory and the digests of the files.
+    """
+
+    def __init__(self, package_info, tmp_artifact_dir: str, digests: PackageDigests):
+        self.package_info = package_info
+        self.tmp_artifact_dir = tmp_artifact_dir
+        self.digests = digests
+        self.installed_size = None  # size of the installed package, set by "Dependency.install_fetched()"
 
 
 class Dependency(object):
@@ -22,6 +48,13 @@ class Dependency(object):
     ENV_LOCAL = '.local-artifacts'
     ENV_TMP = '.tmp-artifacts'
 
+    # directory in the packages directory for stat caches of working directories
+    STAT_CACHE_DIR = '.stat-cache'
+
+    # package infos shared by all the dependency objects, so "info.json" files
+    # are parsed only once and then only checked for changes
+    _package_info_cache = FileCache()
+
     def __init__(self, config: dict, repository: Repository, packages_dir: str, project_dir: str):
 
         self.group = config.get('group', '')
@@ -30,6 +63,7 @@ class Dependency(object):
         self.working_dir = config.get('workingDir', None)
         self.files = config.get('files', None)
         self.default_file = config.get('defaultFile', None)
+        self.priority = config.get('priority', 0)
         self.name = config.get('name', '')
         self.description = config.get('description', '')
 
@@ -37,32 +71,54 @@ class Dependency(object):
         self.packages_dir = packages_dir
         self.project_dir = project_dir
 
+        # maximum size of the packages directory in bytes, least recently used
+        # packages are removed after a download if the directory is bigger
+        self.packages_quota = None
+
+        self.validate_config(config)
+
+    @staticmethod
+    def validate_config(config: dict):
+        """Checks a dependency configuration.
+
+        :raises ValueError: if the configuration is invalid
+        """
+        group = config.get('group', '')
+        artifact = config.get('artifact', '')
+        version = config.get('version', '')
+        files = config.get('files', None)
+        priority = config.get('priority', 0)
+
         # check group name
-        if not self.group:
+        if not group:
             raise ValueError('Group name must be specified')
-        if not check_group_name(self.group):
+        if not check_group_name(group):
             raise ValueError('Group name has invalid format')
 
         # check artifact name
-        if not self.artifact:
+        if not artifact:
             raise ValueError('Artifact name must be specified')
-        if not check_artifact_name(self.artifact):
+        if not check_artifact_name(artifact):
             raise ValueError('Artifact name has invalid format')
 
         # check version number
-        if not self.version:
+        if not version:
             raise ValueError('Version number must be specified')
-        if not check_version_number(self.version):
+        if not check_version_number(version):
             raise ValueError('Version number has invalid format')
 
         # check filenames
-        if self.files:
-            for file_path in self.files:
+        if files:
+            for file_path in files:
                 if not file_path:
                     raise ValueError('Path cannot be empty')
                 if not check_files_file_path(file_path):
                     raise ValueError('Path "%s" has invalid format' % file_path)
 
+        # check transfer priority
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            raise ValueError('Priority must be an integer')
+
     @property
     def group_dir(self):
         """Returns absolute local path to the directory where all of a group's artifacts are stored."""
@@ -91,18 +147,25 @@ class Dependency(object):
 
     def get_package_info(self):
         """Returns a package info if package is published locally or downloaded."""
-        package_info = None
-
         for env in (self.ENV_LOCAL, self.ENV_PRODUCTION):
             info_path = self.get_artifact_info_path(env)
-            if file_exists(info_path):
-                with open(info_path) as f:
-                    info = json.load(f)
+            local = (env == self.ENV_LOCAL)
 
-                package_info = PackageInfo(info, (env == self.ENV_LOCAL))
-                break
+            try:
+                return self._package_info_cache.get(info_path, lambda path: self._load_package_info(path, local))
+            except FileNotFoundError:
+                continue
 
-        return package_info
+        return None
+
+    def invalidate_cache(self):
+        """Drops cached package infos, must be called every time the package is installed or removed."""
+        for env in (self.ENV_LOCAL, self.ENV_PRODUCTION):
+            self._package_info_cache.invalidate(self.get_artifact_info_path(env))
+
+    @staticmethod
+    def _load_package_info(info_path: str, local: bool):
+        return PackageInfo.from_artifact_dir(os.path.dirname(info_path), local)
 
     def get_path(self, file_path: str = None):
         """Returns a path to the package directory
@@ -129,46 +192,164 @@ class Dependency(object):
         :param file_path: get a path to a particular file within the package
         :return: str
         """
-        # convert relative path from windows format to linux one
-        # because only linux format is accepted for file paths in "files"
-        if file_path:
-            file_path = convert_path_w2u(file_path)
-
-        # return a working directory if "file_path" is not specified and the directory is not empty
-        if self.working_dir and not file_path and not self.files:
-            working_dir = os.path.normpath(os.path.join(self.project_dir, self.working_dir))
-            if not is_dir_empty(working_dir):
-                return working_dir
-
-        # raise an error if "file_path" specified, but doesn't exist in the list of working files
-        if self.working_dir and file_path and self.files and (file_path not in self.files):
-            raise ValueError('File "%s" is not a part of the package "%s:%s"'
-                             % (file_path, self.group, self.artifact))
-
-        # return file path from a working directory if "file_path" is specified and the file exists
-        if self.working_dir and file_path:
-            res_path = os.path.normpath(os.path.join(self.project_dir, self.working_dir, file_path))
-            if file_exists(res_path):
-                return res_path
-
-        # otherwise return absolute path
+        return self.get_paths([file_path])[0]
+
+    def get_paths(self, file_paths: list, return_exceptions: bool = False) -> list:
+        """Batch version of the "get_path()" method: returns paths for the list of files
+        in the same order. "None" in the list stands for the package directory.
+
+        The package info is loaded once, the working directory is checked once and
+        directories missing in the working directory are checked only once per directory.
+
+        :param file_paths: list of file paths within the package
+        :param return_exceptions: return exceptions in place of the paths instead of raising the first one
+        :return: list of paths (or exceptions)
+        """
+        res = [None] * len(file_paths)
+        central = []  # (index, file path) of the files which must be resolved from the central directory
+        working_dir = os.path.normpath(os.path.join(self.project_dir, self.working_dir)) if self.working_dir else None
+        working_dir_empty = None
+        dirs_exist = {}
+        files = frozenset(self.files) if self.files else None
+
+        for i, file_path in enumerate(file_paths):
+            # convert relative path from windows format to linux one
+            # because only linux format is accepted for file paths in "files"
+            if file_path:
+                file_path = convert_path_w2u(file_path)
+
+            # return a working directory if "file_path" is not specified and the directory is not empty
+            if working_dir and not file_path and not files:
+                if working_dir_empty is None:
+                    working_dir_empty = is_dir_empty(working_dir)
+
+                if not working_dir_empty:
+                    res[i] = working_dir
+                    continue
+
+            # the file is specified, but doesn't exist in the list of working files
+            if working_dir and file_path and files and (file_path not in files):
+                res[i] = ValueError('File "%s" is not a part of the package "%s:%s"'
+                                    % (file_path, self.group, self.artifact))
+                continue
+
+            # return file path from a working directory if "file_path" is specified and the file exists
+            if working_dir and file_path:
+                res_path = os.path.normpath(os.path.join(working_dir, file_path))
+                parent_dir = os.path.dirname(res_path)
+                if parent_dir not in dirs_exist:
+                    dirs_exist[parent_dir] = dir_exists(parent_dir)
+
+                if dirs_exist[parent_dir] and file_exists(res_path):
+                    res[i] = res_path
+                    continue
+
+            central.append((i, file_path))
+
+        if central:
+            self._get_central_paths(central, res)
+
+        if not return_exceptions:
+            for path in res:
+                if isinstance(path, Exception):
+                    raise path
+
+        return res
+
+    def _get_central_paths(self, items: list, res: list):
+        """Resolves (index, file path) items from the central package directory."""
         package_info = self.get_package_info()
         if not package_info:
-            raise ValueError('Package "%s:%s:%s" is not installed' % (self.group, self.artifact, self.version))
+            error = ValueError('Package "%s:%s:%s" is not installed' % (self.group, self.artifact, self.version))
+            for i, _ in items:
+                res[i] = error
+            return
 
-        # check that the file exists in the package
-        if file_path and (file_path not in package_info.files):
-            raise FileNotFoundError('File "%s" doesn\'t exist in the package "%s:%s:%s"'
-                                    % (file_path, self.group, self.artifact, self.version))
+        # check that the files exist in the package
+        existing = package_info.select_files([file_path for _, file_path in items if file_path])
 
         # get package data directory
         env = Dependency.ENV_LOCAL if package_info.local else Dependency.ENV_PRODUCTION
         data_dir = self.get_artifact_data_dir(env)
 
-        # package path or file path
-        res_path = os.path.normpath(os.path.join(data_dir, file_path)) if file_path else data_dir
+        # the package is in use, so it must not be garbage collected
+        access_tracker.touch(self.get_artifact_dir(env))
+
+        for i, file_path in items:
+            if not file_path:
+                res[i] = data_dir
+            elif file_path not in existing:
+                res[i] = FileNotFoundError('File "%s" doesn\'t exist in the package "%s:%s:%s"'
+                                           % (file_path, self.group, self.artifact, self.version))
+            else:
+                res[i] = os.path.normpath(os.path.join(data_dir, file_path))
+
+    def iter_files(self, pattern: str = None, prefetch: int = 16, shuffle: bool = False, seed=None,
+                   open_files: bool = False):
+        """Yields (relative path, content) pairs for the files of the installed package.
+
+        Files are read ahead by a pool of threads, so the caller doesn't wait for every read. Files are
+        read from the package directory (not from the working directory). If the package is not installed,
+        it's downloaded first.
+
+        :param pattern: glob pattern of the files (see "FileIndex.glob()")
+        :param prefetch: maximum number of files which are read ahead
+        :param shuffle: yield the files in a random order instead of the manifest order
+                        (all the paths are loaded into memory then)
+        :param seed: seed of the random order
+        :param open_files: yield file objects instead of bytes, the caller must close them
+        :raises ValueError: if the package can't be downloaded
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from fnmatch import fnmatchcase
 
-        return res_path
+        if prefetch < 1:
+            raise ValueError('Number of prefetched files must be positive')
+
+        package_info = self.get_package_info() or self.download()
+        if not package_info:
+            raise ValueError('Package "%s:%s:%s" can\'t be downloaded' % (self.group, self.artifact, self.version))
+
+        env = self.ENV_LOCAL if package_info.local else self.ENV_PRODUCTION
+        data_dir = self.get_artifact_data_dir(env)
+        access_tracker.touch(self.get_artifact_dir(env))
+
+        file_paths = iter(package_info.files)
+        if pattern:
+            file_paths = (file_path for file_path in file_paths if fnmatchcase(file_path, pattern))
+
+        if shuffle:
+            import random
+
+            file_paths = list(file_paths)
+            random.Random(seed).shuffle(file_paths)
+
+        read_file = _open_file if open_files else _read_file
+
+        # the package can't be garbage collected while its files are read
+        with access_tracker.pin(self.get_artifact_dir(env)):
+            executor = ThreadPoolExecutor(max_workers=min(prefetch, 32))
+            pending = deque()
+            try:
+                for file_path in file_paths:
+                    pending.append((file_path, executor.submit(read_file, os.path.join(data_dir, file_path))))
+                    if len(pending) >= prefetch:
+                        file_path, future = pending.popleft()
+                        yield file_path, future.result()
+
+                while pending:
+                    file_path, future = pending.popleft()
+                    yield file_path, future.result()
+            finally:
+                # the caller stopped the iteration: files which were opened ahead are closed
+                for _, future in pending:
+                    if not future.cancel() and open_files:
+                        try:
+                            future.result().close()
+                        except OSError:
+                            pass
+
+                executor.shutdown(wait=False)
 
     def update(self, rewrite_working_dir: bool = False, output: AbstractOutputWriter = None):
         """Downloads the package and updates the package's working directory."""
@@ -179,8 +360,16 @@ class Dependency(object):
         if not package_info or not self.working_dir:
             return
 
+        self.update_working_dir(package_info, rewrite_working_dir, output)
+
+    def update_working_dir(self, package_info: PackageInfo, rewrite_working_dir: bool = False,
+                           output: AbstractOutputWriter = None):
+        """Copies files of an installed package to the working directory, it's the last stage of "update()"."""
+        if not output:
+            output = NullOutputWriter()
+
         # copy files to a working directory
-        with output.indent():
+        with output.indent(), metrics.timer('stage_seconds', stage='working_dir_copy'):
             output.write('Copying files to the working directory "%s"...' % self.working_dir)
 
             with output.indent():
@@ -195,7 +384,7 @@ class Dependency(object):
                 if self.files:
                     # copy only specified files if they don't exist in a target directory
                     for filename in self.files:
-                        if filename in package_info.files:
+                        if package_info.has_file(filename):
                             src_path = os.path.join(data_dir, filename)
                             dst_path = os.path.join(working_dir, filename)
 
@@ -247,7 +436,7 @@ class Dependency(object):
 
         with output.indent():
             try:
-                tmp_artifact_dir = self._build()
+                tmp_artifact_dir, file_stats = self._build()
             except Exception as e:
                 output.write('[-] ' + str(e))
                 return False
@@ -257,8 +446,10 @@ class Dependency(object):
             output.write('Publishing the package locally... ')
 
             # move temporary directory to local one
-            copy_dir(tmp_artifact_dir, local_artifact_dir)
-            rmtree(tmp_artifact_dir)
+            convert_info_json(tmp_artifact_dir, file_stats)
+            move_dir(tmp_artifact_dir, local_artifact_dir)
+            self.invalidate_cache()
+            self._record_install(local_artifact_dir)
 
             with output.indent():
                 output.write('[+] Package "%s:%s:%s" was successfully published locally.' %
@@ -271,22 +462,24 @@ class Dependency(object):
                 driver = self.repository.driver
 
                 try:
-                    driver.upload_package(self.group, self.artifact, self.version, tmp_artifact_dir, output)
+                    with metrics.timer('stage_seconds', stage='upload'):
+                        driver.upload_package(self.group, self.artifact, self.version, tmp_artifact_dir, output)
                 except Exception as e:
                     rmtree(tmp_artifact_dir)  # remove building directory
                     output.write('[-] ' + str(e))
                     return False
 
                 # move temporary directory to production one
-                copy_dir(tmp_artifact_dir, artifact_dir)
-
-                # remove building directory
-                rmtree(tmp_artifact_dir)
+                convert_info_json(tmp_artifact_dir, file_stats)
+                move_dir(tmp_artifact_dir, artifact_dir)
 
                 # remove local version of the same package if it exists
                 if dir_exists(local_artifact_dir):
                     rmtree(local_artifact_dir)
 
+                self.invalidate_cache()
+                self._record_install(artifact_dir)
+
                 output.write('[+] Package "%s:%s:%s" was successfully published.' %
                              (self.group, self.artifact, self.version))
 
@@ -308,45 +501,457 @@ class Dependency(object):
         if not output:
             output = NullOutputWriter()
 
+        fetched = self.fetch(output)
+        if not fetched:
+            return None
+
+        return self.install_fetched(fetched, output)
+
+    def fetch(self, output: AbstractOutputWriter = None):
+        """Downloads the package to the temporary directory, it's the network stage of "download()".
+
+        :return: "FetchedPackage" (only with the package info if the package is already installed),
+                 None if the download failed
+        """
+        if not output:
+            output = NullOutputWriter()
+
         output.write('Downloading package "%s:%s:%s"... ' % (self.group, self.artifact, self.version))
 
         with output.indent():
             # check if a package is already downloaded or published locally
-            package_info = self.get_package_info()
+            package_info = self._get_downloaded_package_info(output)
             if package_info:
-                if package_info.local:
-                    output.write('[+] It\'s a locally published package')
-                else:
-                    output.write('[+] The package was already downloaded')
+                return FetchedPackage(package_info, None, None)
+
+            # download dependency, the files are hashed while they are written
+            driver = self.repository.driver
+            tmp_artifact_dir = self._create_tmp_artifact_dir()
+            digests = PackageDigests()
+
+            try:
+                with metrics.timer('stage_seconds', stage='download'), scheduler.priority(self.priority):
+                    driver.download_verified_package(self.group, self.artifact, self.version, tmp_artifact_dir,
+                                                     output, digests)
+            except Exception as e:
+                output.write('[-] ' + str(e))
+                return None
+
+        return FetchedPackage(None, tmp_artifact_dir, digests)
 
+    def install_fetched(self, fetched: 'FetchedPackage', output: AbstractOutputWriter = None):
+        """Verifies a fetched package and installs it, it's the CPU and disk stage of "download()".
+
+        :return: package info, None if the package is corrupted
+        """
+        if fetched.package_info:
+            return fetched.package_info
+
+        if not output:
+            output = NullOutputWriter()
+
+        with output.indent():
+            return self._install_downloaded_package(fetched, output)
+
+    async def download_async(self, output: AbstractOutputWriter = None):
+        """Asyncio version of the "download()" method.
+        If the task is cancelled, the partially downloaded package is removed.
+        """
+        import asyncio
+        from darty.helpers.aio import run_sync
+
+        if not output:
+            output = NullOutputWriter()
+
+        output.write('Downloading package "%s:%s:%s"... ' % (self.group, self.artifact, self.version))
+
+        with output.indent():
+            # check if a package is already downloaded or published locally
+            package_info = self._get_downloaded_package_info(output)
+            if package_info:
                 return package_info
 
-            # download dependency
-            driver = self.repository.driver
-            tmp_artifact_dir = self.get_artifact_dir(self.ENV_TMP)
-            os.makedirs(tmp_artifact_dir, exist_ok=True)
+            # download dependency, the files are hashed while they are written
+            driver = self.repository.async_driver
+            tmp_artifact_dir = self._create_tmp_artifact_dir()
+            digests = PackageDigests()
 
             try:
-                driver.download_package(self.group, self.artifact, self.version, tmp_artifact_dir, output)
+                with metrics.timer('stage_seconds', stage='download'), scheduler.priority(self.priority):
+                    await driver.download_verified_package(self.group, self.artifact, self.version,
+                                                           tmp_artifact_dir, output, digests)
+            except asyncio.CancelledError:
+                rmtree(tmp_artifact_dir, True)
+                raise
             except Exception as e:
                 output.write('[-] ' + str(e))
                 return None
 
-            # TODO: check "tmp_dir" contains info.json file, format is correct and a list of files matches "data" directory
+            package_info = await run_sync(self._install_downloaded_package,
+                                          FetchedPackage(None, tmp_artifact_dir, digests), output)
+
+        return package_info
+
+    def verify(self, deep: bool = False, repair: bool = False, jobs: int = None,
+               output: AbstractOutputWriter = None) -> bool:
+        """Checks that the files of the installed package were not changed (see "verify_installed_package()").
+
+        :param deep: rehash the files instead of comparing their sizes and modification times
+        :param repair: download broken files again and remove files which don't belong to the package
+        :param jobs: number of threads or processes, the number of CPUs by default
+        :return: True if the package is intact or it was repaired
+        """
+        if not output:
+            output = NullOutputWriter()
+
+        output.write('Verifying package "%s:%s:%s"... ' % (self.group, self.artifact, self.version))
+
+        with output.indent():
+            package_info = self.get_package_info()
+            if not package_info:
+                output.write('[-] The package is not installed')
+                return False
+
+            env = self.ENV_LOCAL if package_info.local else self.ENV_PRODUCTION
+            artifact_dir = self.get_artifact_dir(env)
+
+            with metrics.timer('stage_seconds', stage='verify'):
+                report = verify_installed_package(artifact_dir, deep, jobs)
+
+            for file_path in report.modified:
+                output.write('[-] "%s": size or modification time changed' % file_path)
+            for file_path in report.corrupted:
+                output.write('[-] "%s": content changed' % file_path)
+            for file_path in report.missing:
+                output.write('[-] "%s": file is missing' % file_path)
+            for file_path in report.unexpected:
+                output.write('[-] "%s": file doesn\'t belong to the package' % file_path)
+
+            if report.hash_mismatch:
+                output.write('[-] Files don\'t match the package hash')
+            elif report.num_unverified and not deep:
+                output.write('[!] Sizes of %d files were not recorded, use the deep mode to check them'
+                             % report.num_unverified)
+
+            if report.ok:
+                output.write('[+] %d files verified' % report.num_files)
+                return True
+
+            if not repair:
+                return False
+
+            if package_info.local:
+                output.write('[-] Locally published package can\'t be repaired')
+                return False
+
+            return self._repair(artifact_dir, report, output)
+
+    def _repair(self, artifact_dir: str, report: VerificationReport, output: AbstractOutputWriter) -> bool:
+        """Downloads broken files of the installed package again."""
+        from darty.package.file_index import SqliteFileIndex, SQLITE_INDEX_FILENAME, update_file_stats
+
+        data_dir = os.path.join(artifact_dir, 'data')
+        db_path = os.path.join(artifact_dir, SQLITE_INDEX_FILENAME)
+
+        output.write('Repairing the package... ')
+
+        with output.indent(), metrics.timer('stage_seconds', stage='repair'):
+            # remove files which don't belong to the package
+            for file_path in report.unexpected:
+                os.remove(os.path.join(data_dir, file_path))
+                output.write('[+] "%s": file removed' % file_path)
+
+            # it's unknown which files are broken if they don't have digests
+            if report.hash_mismatch:
+                return self._reinstall(output)
+
+            index = SqliteFileIndex(db_path)
+            try:
+                digests_before = {file_path: index.get_stats(file_path)[2] for file_path in report.broken}
+            finally:
+                index.close()
+
+            # files with changed modification times are downloaded only if their content changed
+            broken_files = report.corrupted + report.missing
+            file_stats = {}
+            for file_path in report.modified:
+                file_digest = FileDigest.from_file(os.path.join(data_dir, file_path))
+                if file_digest.hexdigest() == digests_before[file_path]:
+                    stat = os.stat(os.path.join(data_dir, file_path))
+                    file_stats[file_path] = (stat.st_size, stat.st_mtime_ns, digests_before[file_path])
+                    output.write('[+] "%s": content is intact' % file_path)
+                else:
+                    broken_files.append(file_path)
+
+            try:
+                if broken_files and not self._restore_files(broken_files, data_dir, digests_before, file_stats, output):
+                    return False
+            finally:
+                update_file_stats(db_path, file_stats)
+
+        output.write('[+] The package was repaired')
+
+        return True
+
+    def _restore_files(self, file_paths: list, data_dir: str, expected_digests: dict, file_stats: dict,
+                       output: AbstractOutputWriter) -> bool:
+        """Downloads files through the driver and replaces them in the data directory.
+        Sizes, modification times and digests of the restored files are added to "file_stats".
+        """
+        tmp_artifact_dir = self.get_artifact_dir(self.ENV_TMP)
+        if dir_exists(tmp_artifact_dir):
+            rmtree(tmp_artifact_dir)
+
+        os.makedirs(tmp_artifact_dir)
+
+        try:
+            digests = PackageDigests()
+            try:
+                with metrics.timer('stage_seconds', stage='download'), scheduler.priority(self.priority):
+                    self.repository.driver.download_files(self.group, self.artifact, self.version, file_paths,
+                                                          tmp_artifact_dir, output, digests)
+            except Exception as e:
+                output.write('[-] ' + str(e))
+                return False
+
+            for file_path in file_paths:
+                tmp_path = os.path.join(tmp_artifact_dir, 'data', file_path)
+                if not file_exists(tmp_path):
+                    output.write('[-] "%s": file not found in the repository' % file_path)
+                    return False
+
+                file_digest = digests.get(tmp_path) or FileDigest.from_file(tmp_path)
+                if expected_digests[file_path] is not None and file_digest.hexdigest() != expected_digests[file_path]:
+                    output.write('[-] "%s": file in the repository doesn\'t match the manifest' % file_path)
+                    return False
+
+                # every file is replaced atomically
+                dst_path = os.path.join(data_dir, file_path)
+                os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+                os.replace(tmp_path, dst_path)
+
+                stat = os.stat(dst_path)
+                file_stats[file_path] = (stat.st_size, stat.st_mtime_ns, file_digest.hexdigest())
+                output.write('[+] "%s": file restored' % file_path)
+        finally:
+            rmtree(tmp_artifact_dir, True)
+
+        return True
+
+    def _reinstall(self, output: AbstractOutputWriter) -> bool:
+        """Downloads the whole package again, the broken package is kept if the download fails."""
+        artifact_dir = self.get_artifact_dir()
+        broken_dir = '%s.broken-%d' % (artifact_dir, os.getpid())
+
+        os.rename(artifact_dir, broken_dir)
+        self.invalidate_cache()
+
+        if not self.download(output):
+            os.rename(broken_dir, artifact_dir)
+            self.invalidate_cache()
+            return False
+
+        rmtree(broken_dir, True)
+
+        return True
+
+    def diff(self) -> PackageDiff:
+        """Compares the working directory with the installed package.
+
+        A file is hashed only if its size is the same as in the package, but its modification time
+        is different and changed since the last comparison (see "StatCache"). So if nothing changed,
+        the working directory is compared using only "stat()" calls.
+
+        :return: added, modified and deleted files
+        :raises ValueError: if the dependency doesn't have a working directory or the package is not installed
+        """
+        if not self.working_dir:
+            raise ValueError('Package doesn\'t have working directory')
+
+        working_dir = os.path.join(self.project_dir, self.working_dir)
+        if not dir_exists(working_dir):
+            raise ValueError('Working directory doesn\'t exist')
+
+        package_info = self.get_package_info()
+        if not package_info:
+            raise ValueError('Package "%s:%s:%s" is not installed' % (self.group, self.artifact, self.version))
+
+        env = self.ENV_LOCAL if package_info.local else self.ENV_PRODUCTION
+        package_files = self._get_package_file_stats(self.get_artifact_dir(env))
+        working_files = self._get_working_file_stats(working_dir)
+
+        if self.files:
+            package_files = {file_path: stats for file_path, stats in package_files.items() if file_path in self.files}
+
+        stat_cache = StatCache.for_dir(os.path.join(self.packages_dir, self.STAT_CACHE_DIR), working_dir)
+
+        added = []
+        modified = []
+        for file_path, (size, mtime_ns) in working_files.items():
+            package_stats = package_files.get(file_path)
+            if package_stats is None:
+                added.append(file_path)
+                continue
+
+            package_size, package_mtime_ns, package_digest = package_stats
+            if size != package_size:
+                modified.append(file_path)
+                continue
+
+            # the file was copied from the package (or to the package) with its modification time
+            if mtime_ns == package_mtime_ns:
+                continue
+
+            digest = stat_cache.get(file_path, size, mtime_ns)
+            if digest is None:
+                digest = FileDigest.from_file(os.path.join(working_dir, file_path)).hexdigest()
+                stat_cache.set(file_path, size, mtime_ns, digest)
+
+            if digest != package_digest:
+                modified.append(file_path)
+
+        deleted = [file_path for file_path in package_files if file_path not in working_files]
+
+        stat_cache.retain(working_files)
+        stat_cache.save()
+
+        return PackageDiff(sort_paths(added), sort_paths(modified), sort_paths(deleted))
+
+    def _get_working_file_stats(self, working_dir: str) -> dict:
+        """Returns sizes and modification times of the files in the working directory."""
+        if not self.files:
+            return {entry.path: (entry.size, entry.mtime_ns)
+                    for entry in FileInventory.scan(working_dir, follow_links=True)}
+
+        working_files = {}
+        for file_path in self.files:
+            try:
+                stat = os.stat(os.path.join(working_dir, file_path))
+            except FileNotFoundError:
+                continue
+
+            working_files[file_path] = (stat.st_size, stat.st_mtime_ns)
+
+        return working_files
+
+    @staticmethod
+    def _get_package_file_stats(artifact_dir: str) -> dict:
+        """Returns sizes, modification times and digests of the package files from the manifest.
+        Files installed by older versions don't have them in the manifest, so they are hashed once.
+        """
+        import sqlite3
+        from darty.package.file_index import SqliteFileIndex, SQLITE_INDEX_FILENAME, open_file_index, \
+            update_file_stats
+
+        index = open_file_index(artifact_dir)
+        try:
+            package_files = {row[0]: row[1:] for row in index.iter_stats(batch_size=10000)}
+        finally:
+            index.close()
+
+        missing_stats = {}
+        for file_path, (size, mtime_ns, digest) in package_files.items():
+            if digest is None:
+                abs_path = os.path.join(artifact_dir, 'data', file_path)
+                try:
+                    stat = os.stat(abs_path)
+                    missing_stats[file_path] = (stat.st_size, stat.st_mtime_ns,
+                                                FileDigest.from_file(abs_path).hexdigest())
+                except FileNotFoundError:
+                    # the file was deleted from the package, it never matches a file in the working directory
+                    continue
+
+        if missing_stats:
+            package_files.update(missing_stats)
+            if isinstance(index, SqliteFileIndex):
+                try:
+                    update_file_stats(os.path.join(artifact_dir, SQLITE_INDEX_FILENAME), missing_stats)
+                except (OSError, sqlite3.Error):
+                    # the packages directory is read-only
+                    pass
+
+        return package_files
+
+    def _get_downloaded_package_info(self, output: AbstractOutputWriter):
+        """Returns a package info if the package is already downloaded or published locally."""
+        package_info = self.get_package_info()
+        if package_info:
+            if package_info.local:
+                output.write('[+] It\'s a locally published package')
+            else:
+                output.write('[+] The package was already downloaded')
+
+        metrics.inc('package_cache', result='hit' if package_info else 'miss')
+
+        if package_info:
+            env = self.ENV_LOCAL if package_info.local else self.ENV_PRODUCTION
+            access_tracker.touch(self.get_artifact_dir(env))
+
+        return package_info
+
+    def _create_tmp_artifact_dir(self):
+        tmp_artifact_dir = self.get_artifact_dir(self.ENV_TMP)
+        os.makedirs(tmp_artifact_dir, exist_ok=True)
+
+        return tmp_artifact_dir
+
+    def _install_downloaded_package(self, fetched: FetchedPackage, output: AbstractOutputWriter):
+        """Verifies a downloaded package and moves it from the temporary directory to the production one.
+        The size of the installed package is set to "fetched.installed_size".
+        """
+        tmp_artifact_dir = fetched.tmp_artifact_dir
+
+        # check that the files match "info.json", a corrupted package is never installed
+        try:
+            with metrics.timer('stage_seconds', stage='verify'):
+                file_stats = verify_package(tmp_artifact_dir, fetched.digests)
+        except IntegrityError as e:
+            rmtree(tmp_artifact_dir)
+            output.write('[-] Integrity check failed: ' + str(e))
+            return None
+
+        with metrics.timer('stage_seconds', stage='install'):
+            # index the list of files
+            try:
+                convert_info_json(tmp_artifact_dir, file_stats)
+            except (OSError, ValueError, KeyError) as e:
+                rmtree(tmp_artifact_dir)
+                output.write('[-] Invalid package info: ' + str(e))
+                return None
 
             # move temporary directory to production one
             artifact_dir = self.get_artifact_dir(self.ENV_PRODUCTION)
-            copy_dir(tmp_artifact_dir, artifact_dir)
-            rmtree(tmp_artifact_dir)
+            move_dir(tmp_artifact_dir, artifact_dir)
+            self.invalidate_cache()
+            fetched.installed_size = self._record_install(artifact_dir)
 
-            package_info = self.get_package_info()
+        # keep the packages directory under the quota
+        if self.packages_quota is not None:
+            with metrics.timer('stage_seconds', stage='gc'):
+                collect_garbage(self.packages_dir, self.packages_quota, keep={artifact_dir}, output=output)
+
+        package_info = self.get_package_info()
 
-            output.write('[+] The package was successfully downloaded')
+        output.write('[+] The package was successfully downloaded')
 
         return package_info
 
+    @staticmethod
+    def _record_install(artifact_dir: str) -> int:
+        """Records the size and the access time of an installed package.
+
+        :return: size of the package
+        """
+        size = FileInventory.scan(artifact_dir).total_size
+        access_tracker.touch(artifact_dir, size)
+
+        return size
+
     def _build(self):
-        """Builds package."""
+        """Builds package.
+
+        :return: artifact directory and sizes, modification times and digests of the files
+        """
         if not self.working_dir:
             raise ValueError('Package doesn\'t have working directory')
 
@@ -367,23 +972,42 @@ class Dependency(object):
         # create artifact data directory
         os.makedirs(data_dir, exist_ok=True)
 
-        # copy files to package data directory
+        # get the list of files to publish,
+        # files are always listed in the same order, so the hash is deterministic
         if self.files:
-            for filename in self.files:
-                src_path = os.path.join(working_dir, filename)
-                if not file_exists(src_path):
+            files = sort_paths(self.files)
+            for filename in files:
+                if not file_exists(os.path.join(working_dir, filename)):
                     raise FileNotFoundError('File "%s" doesn\'t exist in the working directory' % filename)
-
-                copy_file(src_path, os.path.join(data_dir, filename))
         else:
-            copy_dir(working_dir, data_dir)
+            files = FileInventory.scan(working_dir, follow_links=True).paths
+
+        # copy files to package data directory and hash them on the way,
+        # so every file of the working directory is read only once
+        dir_hash = DirHash()
+        file_stats = {}
+        hashing_time = 0.0
+
+        start = time.perf_counter()
+        with tracing.span('copy_and_hash_files', files=len(files)):
+            for filename in files:
+                file_digest = FileDigest()
+
+                def update_hash(data: bytes):
+                    nonlocal hashing_time
+                    hashing_start = time.perf_counter()
+                    file_digest.update(data)
+                    hashing_time += time.perf_counter() - hashing_start
+
+                dst_path = os.path.join(data_dir, filename)
+                copy_file(os.path.join(working_dir, filename), dst_path, update_hash)
+                dir_hash.add_file_digest(filename, file_digest)
 
-        # get the list of copied files
-        files = []
-        for cur_dir, directories, filenames in os.walk(data_dir):
-            relative_dir = cur_dir.replace(data_dir, '').lstrip(os.sep)
-            for filename in filenames:
-                files.append(os.path.join(relative_dir, filename))
+                stat = os.stat(dst_path)
+                file_stats[filename] = (stat.st_size, stat.st_mtime_ns, file_digest.hexdigest())
+
+        metrics.observe('stage_seconds', hashing_time, stage='hashing')
+        metrics.observe('stage_seconds', time.perf_counter() - start - hashing_time, stage='staging_copy')
 
         # create info.json file
         package_info = OrderedDict([
@@ -393,9 +1017,26 @@ class Dependency(object):
             ('files', files),
             ('name', self.name),
             ('description', self.description),
-            ('hash', get_dir_hash(data_dir))
+            ('hash', dir_hash.hexdigest())
         ])
         with open(info_path, 'w+') as f:
             json.dump(package_info, f, indent=2)
 
-        return artifact_dir
+        return artifact_dir, file_stats
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _open_file(path: str):
+    """Opens a file and asks the OS to read it ahead."""
+    f = open(path, 'rb')
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+
+    return f
@@ -0,0 +1,376 @@
+import json
+import os
+import sqlite3
+import threading
+import urllib.parse
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+
+
+SQLITE_INDEX_FILENAME = 'manifest.db'
+
+
+class FileIndex(ABC):
+    """Read-only collection of package files which supports fast lookups.
+
+    Iteration follows the order of files in the package manifest.
+    """
+
+    @abstractmethod
+    def __contains__(self, file_path) -> bool:
+        pass
+
+    @abstractmethod
+    def __iter__(self):
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def iter_prefix(self, prefix: str):
+        """Returns sorted file paths which start with the prefix."""
+        pass
+
+    def glob(self, pattern: str):
+        """Returns sorted file paths which match a glob pattern (the same syntax as "fnmatch" uses)."""
+        for file_path in self.iter_prefix(get_glob_prefix(pattern)):
+            if fnmatchcase(file_path, pattern):
+                yield file_path
+
+    def select_existing(self, file_paths: list) -> set:
+        """Returns the paths from the list which belong to the package."""
+        return {file_path for file_path in file_paths if file_path in self}
+
+    def iter_stats(self, batch_size: int = 1000):
+        """Yields (path, size, mtime_ns, digest) tuples in the manifest order. Values which were not
+        recorded are None.
+        """
+        for file_path in self:
+            yield file_path, None, None, None
+
+    def close(self):
+        """Releases resources held by the index, it can still be used afterwards."""
+        pass
+
+
+class ListFileIndex(FileIndex):
+    """Index for a list of files loaded into memory (from the "info.json" file)."""
+
+    def __init__(self, files: list, meta: dict = None):
+        self._files = files
+        self._meta = meta if meta is not None else {}
+        self._files_set = frozenset(files)
+        self._sorted_files = None
+
+    def __contains__(self, file_path) -> bool:
+        return file_path in self._files_set
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def iter_prefix(self, prefix: str):
+        if self._sorted_files is None:
+            self._sorted_files = sorted(self._files_set)
+
+        for i in range(bisect_left(self._sorted_files, prefix), len(self._sorted_files)):
+            file_path = self._sorted_files[i]
+            if not file_path.startswith(prefix):
+                break
+
+            yield file_path
+
+    def get_meta(self) -> dict:
+        """Returns package metadata (the "info.json" file without the list of files)."""
+        return self._meta
+
+
+class _PooledConnection(object):
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+class ConnectionPool(object):
+    """Keeps a limited number of open SQLite connections, least recently used idle
+    connections are closed, so package infos cached for thousands of packages
+    don't hold a file descriptor each.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._connections = OrderedDict()  # owner -> _PooledConnection
+
+    @contextmanager
+    def connection(self, owner, connect):
+        """Returns a connection of the owner, a connection is used by a single thread at a time.
+
+        :param owner: object the connection belongs to
+        :param connect: function which opens a new connection
+        """
+        with self._lock:
+            pooled = self._connections.get(owner)
+            if pooled:
+                self._connections.move_to_end(owner)
+            else:
+                pooled = self._connections[owner] = _PooledConnection(connect())
+
+            pooled.users += 1
+            self._close_unused()
+
+        try:
+            with pooled.lock:
+                yield pooled.connection
+        finally:
+            with self._lock:
+                pooled.users -= 1
+                if self._connections.get(owner) is not pooled:
+                    # the connection was closed while it was in use
+                    if not pooled.users:
+                        pooled.connection.close()
+                else:
+                    self._close_unused()
+
+    def close(self, owner):
+        """Closes a connection of the owner (when it's not used anymore)."""
+        with self._lock:
+            pooled = self._connections.pop(owner, None)
+            if pooled and not pooled.users:
+                pooled.connection.close()
+
+    def get_size(self) -> int:
+        with self._lock:
+            return len(self._connections)
+
+    def _close_unused(self):
+        # connections in use are never closed, so the pool can exceed the limit for a while
+        for owner in list(self._connections):
+            if len(self._connections) <= self._max_size:
+                break
+
+            pooled = self._connections[owner]
+            if not pooled.users:
+                del self._connections[owner]
+                pooled.connection.close()
+
+
+class SqliteFileIndex(FileIndex):
+    """Index stored in an SQLite database next to the "info.json" file.
+
+    Files are never loaded into memory all at once: a single path is looked up
+    using the database index and prefix listings are range scans.
+
+    Connections are taken from a shared pool, so an index which is not queried
+    doesn't keep its database open.
+    """
+
+    connection_pool = ConnectionPool(16)
+
+    def __init__(self, db_path: str):
+        self._db_path = db_path
+
+    def __contains__(self, file_path) -> bool:
+        return bool(self._query('SELECT 1 FROM files WHERE path = ?', (file_path,)))
+
+    def __iter__(self):
+        return self._iter_batches('SELECT id, path FROM files WHERE id > ? ORDER BY id LIMIT ?', 0, ())
+
+    def __len__(self) -> int:
+        return self._query('SELECT COUNT(*) FROM files', ())[0][0]
+
+    def iter_prefix(self, prefix: str):
+        # the prefix itself goes before all the other paths which start with it
+        if prefix in self:
+            yield prefix
+
+        upper_bound = get_prefix_upper_bound(prefix)
+        if upper_bound is None:
+            yield from self._iter_batches('SELECT path, path FROM files WHERE path > ? ORDER BY path LIMIT ?',
+                                          prefix, ())
+        else:
+            yield from self._iter_batches('SELECT path, path FROM files WHERE path > ? AND path < ? '
+                                          'ORDER BY path LIMIT ?', prefix, (upper_bound,))
+
+    def iter_stats(self, batch_size: int = 1000):
+        """Yields (path, size, mtime_ns, digest) tuples in the manifest order. Values which were not
+        recorded are None (indexes created by older versions don't have them at all).
+        """
+        if not self.has_stats():
+            for file_path in self:
+                yield file_path, None, None, None
+            return
+
+        key = 0
+        while True:
+            rows = self._query('SELECT id, path, size, mtime_ns, digest FROM files WHERE id > ? ORDER BY id LIMIT ?',
+                               (key, batch_size))
+            for row in rows:
+                yield row[1:]
+
+            if len(rows) < batch_size:
+                break
+
+            key = rows[-1][0]
+
+    def get_stats(self, file_path: str) -> tuple:
+        """Returns (size, mtime_ns, digest) of a file, values which were not recorded are None."""
+        if not self.has_stats():
+            return None, None, None
+
+        rows = self._query('SELECT size, mtime_ns, digest FROM files WHERE path = ?', (file_path,))
+        return rows[0] if rows else (None, None, None)
+
+    def has_stats(self) -> bool:
+        """Checks if the index has columns for sizes, modification times and digests of the files."""
+        columns = {row[1] for row in self._query('PRAGMA table_info(files)', ())}
+        return 'digest' in columns
+
+    def select_existing(self, file_paths: list) -> set:
+        """Returns the paths from the list which belong to the package."""
+        existing = set()
+        for i in range(0, len(file_paths), 500):
+            batch = file_paths[i:i + 500]
+            rows = self._query('SELECT path FROM files WHERE path IN (%s)' % ','.join('?' * len(batch)), tuple(batch))
+            existing.update(row[0] for row in rows)
+
+        return existing
+
+    def get_meta(self) -> dict:
+        """Returns package metadata stored in the index."""
+        return {key: json.loads(value) for key, value in self._query('SELECT key, value FROM meta', ())}
+
+    def close(self):
+        self.connection_pool.close(self)
+
+    def _connect(self):
+        uri = 'file:%s?mode=ro' % urllib.parse.quote(self._db_path)
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    def _query(self, sql: str, params: tuple) -> list:
+        with self.connection_pool.connection(self, self._connect) as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def _iter_batches(self, sql: str, start_key, params: tuple, batch_size: int = 1000):
+        """Yields paths in batches, so a listing never holds all the paths in memory.
+        The query must select a key column and a path, filter by "key > ?" and have a limit.
+        """
+        key = start_key
+        while True:
+            rows = self._query(sql, (key,) + params + (batch_size,))
+            for row in rows:
+                yield row[1]
+
+            if len(rows) < batch_size:
+                break
+
+            key = rows[-1][0]
+
+
+def create_sqlite_index(db_path: str, info: dict, file_stats: dict = None):
+    """Creates an SQLite index from the package info (the content of an "info.json" file).
+
+    :param db_path: path to the index
+    :param info: package info
+    :param file_stats: sizes, modification times and digests of the files: a dictionary
+                       of file paths to (size, mtime_ns, digest) tuples (see "verify_package()")
+    """
+    if file_stats is None:
+        file_stats = {}
+
+    tmp_db_path = db_path + '.tmp'
+    if os.path.exists(tmp_db_path):
+        os.remove(tmp_db_path)
+
+    connection = sqlite3.connect(tmp_db_path)
+    try:
+        connection.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        connection.execute('CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, '
+                           'size INTEGER, mtime_ns INTEGER, digest TEXT)')
+
+        connection.executemany('INSERT INTO meta (key, value) VALUES (?, ?)',
+                               [(key, json.dumps(value)) for key, value in info.items() if key != 'files'])
+        connection.executemany('INSERT INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)',
+                               ((path,) + tuple(file_stats.get(path, (None, None, None))) for path in info['files']))
+        connection.commit()
+    finally:
+        connection.close()
+
+    # the index appears atomically, so readers never see a half-written database
+    os.replace(tmp_db_path, db_path)
+
+
+def update_file_stats(db_path: str, file_stats: dict):
+    """Updates sizes, modification times and digests of files in an SQLite index.
+
+    :param db_path: path to the index
+    :param file_stats: dictionary of file paths to (size, mtime_ns, digest) tuples
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        columns = {row[1] for row in connection.execute('PRAGMA table_info(files)')}
+        if 'digest' not in columns:
+            for column, column_type in (('size', 'INTEGER'), ('mtime_ns', 'INTEGER'), ('digest', 'TEXT')):
+                connection.execute('ALTER TABLE files ADD COLUMN %s %s' % (column, column_type))
+
+        connection.executemany('UPDATE files SET size = ?, mtime_ns = ?, digest = ? WHERE path = ?',
+                               (tuple(stats) + (path,) for path, stats in file_stats.items()))
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def convert_info_json(artifact_dir: str, file_stats: dict = None):
+    """Creates an SQLite index for an artifact directory that contains an "info.json" file."""
+    with open(os.path.join(artifact_dir, 'info.json')) as f:
+        info = json.load(f)
+
+    create_sqlite_index(os.path.join(artifact_dir, SQLITE_INDEX_FILENAME), info, file_stats)
+
+
+def open_file_index(artifact_dir: str) -> FileIndex:
+    """Opens the index of an installed package. Packages installed by older versions don't have
+    an SQLite index, it's created on the way. If it can't be created (the packages directory
+    is read-only), the list of files is loaded from the "info.json" file.
+    """
+    db_path = os.path.join(artifact_dir, SQLITE_INDEX_FILENAME)
+    if not os.path.isfile(db_path):
+        try:
+            convert_info_json(artifact_dir)
+        except (OSError, sqlite3.Error):
+            with open(os.path.join(artifact_dir, 'info.json')) as f:
+                info = json.load(f)
+
+            return ListFileIndex(info.pop('files'), info)
+
+    return SqliteFileIndex(db_path)
+
+
+def get_glob_prefix(pattern: str) -> str:
+    """Returns the longest part of a glob pattern without special characters."""
+    for i, char in enumerate(pattern):
+        if char in '*?[':
+            return pattern[:i]
+
+    return pattern
+
+
+def get_prefix_upper_bound(prefix: str):
+    """Returns the smallest string which is greater than all the strings starting with the prefix."""
+    while prefix:
+        last_char = ord(prefix[-1])
+        if last_char < 0x10FFFF:
+            return prefix[:-1] + chr(last_char + 1)
+
+        prefix = prefix[:-1]
+
+    return None
@@ -0,0 +1,300 @@
+import json
+import os
+import threading
+from darty.helpers.inventory import FileInventory
+from darty.utils import DirHash, FileDigest
+
+
+class IntegrityError(Exception):
+    """Downloaded package doesn't match its "info.json" file."""
+    pass
+
+
+class PackageDigests(object):
+    """Digests of the package files recorded by a driver while the files were written to disk.
+
+    Files are identified by their absolute paths, digests can be added from several threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._digests = {}
+
+    def add(self, file_path: str, file_digest: FileDigest):
+        with self._lock:
+            self._digests[os.path.normpath(file_path)] = file_digest
+
+    def get(self, file_path: str) -> FileDigest:
+        with self._lock:
+            return self._digests.get(os.path.normpath(file_path))
+
+    def update(self, digests: 'PackageDigests', src_dir: str = None, dst_dir: str = None):
+        """Adds digests recorded by another object. If the files were moved from "src_dir"
+        to "dst_dir", their paths are changed.
+        """
+        with digests._lock:
+            other = dict(digests._digests)
+
+        if src_dir is not None:
+            src_dir, dst_dir = os.path.normpath(src_dir), os.path.normpath(dst_dir)
+            other = {os.path.join(dst_dir, os.path.relpath(path, src_dir)): file_digest
+                     for path, file_digest in other.items()}
+
+        with self._lock:
+            self._digests.update(other)
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+
+def verify_package(artifact_dir: str, digests: PackageDigests = None) -> dict:
+    """Checks that a downloaded package matches its "info.json" file: the list of files
+    must match the "data" directory and the hash of the files must match the package hash.
+
+    Digests recorded by the driver are used, so the files are not read again. Files without
+    a recorded digest (if the driver doesn't record them) are read from disk.
+
+    :param artifact_dir: directory with the "info.json" file and the "data" directory
+    :param digests: digests recorded during the download
+    :return: dictionary of file paths to (size, mtime_ns, digest) tuples
+    :raises IntegrityError: if the package is corrupted
+    """
+    info_path = os.path.join(artifact_dir, 'info.json')
+    try:
+        with open(info_path) as f:
+            info = json.load(f)
+
+        files = info['files']
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise IntegrityError('Invalid package info: %s' % str(e))
+
+    if not isinstance(files, list):
+        raise IntegrityError('Invalid package info: list of files expected')
+
+    # compare the list of files with the "data" directory (only the metadata is read)
+    data_dir = os.path.join(artifact_dir, 'data')
+    entries = {}
+    if os.path.isdir(data_dir):
+        entries = {entry.path.replace('\\', '/'): entry for entry in FileInventory.scan(data_dir)}
+
+    for file_path in files:
+        if file_path.replace('\\', '/') not in entries:
+            raise IntegrityError('File "%s" is missing' % file_path)
+
+    if len(entries) != len(files):
+        unexpected = sorted(set(entries) - {file_path.replace('\\', '/') for file_path in files})
+        raise IntegrityError('Unexpected file "%s"' % (unexpected[0] if unexpected else ''))
+
+    # hash the files in the manifest order
+    dir_hash = DirHash()
+    file_stats = {}
+    for file_path in files:
+        entry = entries[file_path.replace('\\', '/')]
+        abs_path = os.path.join(data_dir, entry.path)
+
+        file_digest = digests.get(abs_path) if digests else None
+        if file_digest is None:
+            file_digest = FileDigest.from_file(abs_path)
+        elif file_digest.size != entry.size:
+            raise IntegrityError('File "%s" has %d bytes on disk, but %d bytes were downloaded'
+                                 % (file_path, entry.size, file_digest.size))
+
+        dir_hash.add_file_digest(file_path, file_digest)
+        file_stats[file_path] = (entry.size, entry.mtime_ns, file_digest.hexdigest())
+
+    if info.get('hash') and dir_hash.hexdigest() != info['hash']:
+        raise IntegrityError('Hash of the package files doesn\'t match the hash in "info.json"')
+
+    return file_stats
+
+
+class VerificationReport(object):
+    """Result of the verification of an installed package."""
+
+    def __init__(self):
+        self.num_files = 0
+        self.modified = []  # size or modification time doesn't match the manifest
+        self.corrupted = []  # content doesn't match the manifest
+        self.missing = []
+        self.unexpected = []  # files which don't belong to the package
+        self.num_unverified = 0  # files without recorded sizes or digests
+        self.hash_mismatch = False  # content doesn't match the package hash (files don't have digests)
+
+    @property
+    def broken(self) -> list:
+        """Files which must be downloaded again."""
+        return self.modified + self.corrupted + self.missing
+
+    @property
+    def ok(self) -> bool:
+        return not (self.broken or self.unexpected or self.hash_mismatch)
+
+
+def verify_installed_package(artifact_dir: str, deep: bool = False, jobs: int = None,
+                             batch_size: int = 1000) -> VerificationReport:
+    """Compares files of an installed package with its manifest.
+
+    The fast mode compares sizes and modification times of the files with the manifest, it uses only "stat()"
+    calls. The deep mode rehashes the files in parallel processes and compares their digests. The manifest and
+    the data directory are read in batches, so packages with millions of files are never loaded into memory.
+
+    :param artifact_dir: artifact directory
+    :param deep: rehash the files
+    :param jobs: number of threads (fast mode) or processes (deep mode), the number of CPUs by default
+    :param batch_size: number of files processed by a thread or a process at once
+    """
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+    from darty.package.file_index import open_file_index
+
+    jobs = jobs or os.cpu_count() or 1
+    data_dir = os.path.join(artifact_dir, 'data')
+
+    # packages installed by older versions may not have an index
+    index = open_file_index(artifact_dir)
+    report = VerificationReport()
+
+    try:
+        package_hash = index.get_meta().get('hash')
+        dir_hash = DirHash()
+        with_blocks = deep and bool(package_hash) and not _has_digests(index)
+
+        executor_class = ProcessPoolExecutor if deep else ThreadPoolExecutor
+        with executor_class(max_workers=jobs) as executor:
+            func = _hash_files if deep else _stat_files
+            batches = _iter_batches(index.iter_stats(batch_size), batch_size)
+
+            def submit(batch: list):
+                return executor.submit(func, data_dir, [row[0] for row in batch], with_blocks)
+
+            for batch, results in _map_bounded(submit, batches, jobs * 2):
+                for (file_path, size, mtime_ns, digest), res in zip(batch, results):
+                    report.num_files += 1
+
+                    if res is None:
+                        report.missing.append(file_path)
+                    elif deep:
+                        if with_blocks:
+                            dir_hash.add_file_digest(file_path, res)
+
+                        if digest is None:
+                            report.num_unverified += 1
+                        elif res.size != size or res.hexdigest() != digest:
+                            report.corrupted.append(file_path)
+                    else:
+                        if size is None:
+                            report.num_unverified += 1
+                        elif res != (size, mtime_ns):
+                            report.modified.append(file_path)
+
+        if with_blocks and not report.missing and dir_hash.hexdigest() != package_hash:
+            report.hash_mismatch = True
+
+        # files which don't belong to the package
+        for batch in _iter_batches(_iter_dir_files(data_dir), batch_size):
+            existing = index.select_existing(batch)
+            report.unexpected += [file_path for file_path in batch if file_path not in existing]
+    finally:
+        index.close()
+
+    return report
+
+
+def _has_digests(index) -> bool:
+    for _, _, _, digest in index.iter_stats(1):
+        return digest is not None
+
+    return True
+
+
+def _iter_batches(iterable, batch_size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def _map_bounded(submit, items, max_pending: int):
+    """Submits a task for every item ("submit()" returns a future) and yields (item, result) tuples
+    in the same order. At most "max_pending" tasks are submitted at once, so the items are never
+    all held in memory.
+    """
+    from collections import deque
+
+    pending = deque()
+    for item in items:
+        pending.append((item, submit(item)))
+        if len(pending) >= max_pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+
+def _iter_dir_files(dir_path: str):
+    """Yields relative paths of the files in a directory without listing the whole tree first."""
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            entries = sorted(os.scandir(os.path.join(dir_path, rel_dir)), key=lambda entry: entry.name)
+        except FileNotFoundError:
+            continue
+
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(rel_path)
+            else:
+                yield rel_path
+
+
+def _stat_files(data_dir: str, file_paths: list, with_blocks: bool) -> list:
+    """Returns (size, mtime_ns) of the files, None for missing files."""
+    res = []
+    for file_path in file_paths:
+        try:
+            stat = os.stat(os.path.join(data_dir, file_path))
+        except FileNotFoundError:
+            res.append(None)
+        else:
+            res.append((stat.st_size, stat.st_mtime_ns))
+
+    return res
+
+
+def _hash_files(data_dir: str, file_paths: list, with_blocks: bool) -> list:
+    """Returns digests of the files, None for missing files. Block digests are sent back
+    to the parent process only if they are needed to compute the package hash.
+    """
+    res = []
+    for file_path in file_paths:
+        try:
+            file_digest = FileDigest.from_file(os.path.join(data_dir, file_path))
+        except FileNotFoundError:
+            res.append(None)
+            continue
+
+        if not with_blocks:
+            file_digest = _SizedDigest(file_digest.size, file_digest.hexdigest())
+
+        res.append(file_digest)
+
+    return res
+
+
+class _SizedDigest(object):
+    """Size and digest of a file without block digests."""
+
+    def __init__(self, size: int, digest: str):
+        self.size = size
+        self._digest = digest
+
+    def hexdigest(self) -> str:
+        return self._digest
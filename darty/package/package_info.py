@@ -1,3 +1,8 @@
+import json
+import os
+from darty.package.file_index import FileIndex, ListFileIndex, SqliteFileIndex, SQLITE_INDEX_FILENAME
+
+
 class PackageInfo(object):
 
     def __init__(self, config: dict, local: bool):
@@ -9,8 +14,34 @@ class PackageInfo(object):
         self.group = config['group']
         self.artifact = config['artifact']
         self.version = config['version']
-        self.files = config['files']
         self.name = config.get('name', '')
         self.description = config.get('description', '')
 
+        # index for fast lookups of the package files
+        files = config['files']
+        self.files = files if isinstance(files, FileIndex) else ListFileIndex(files)
+
         self.local = local
+
+    @classmethod
+    def from_artifact_dir(cls, artifact_dir: str, local: bool):
+        """Reads a package info from an artifact directory.
+        If the directory contains an SQLite index, the list of files is not loaded into memory.
+        """
+        db_path = os.path.join(artifact_dir, SQLITE_INDEX_FILENAME)
+        if os.path.isfile(db_path):
+            files = SqliteFileIndex(db_path)
+            return cls({**files.get_meta(), 'files': files}, local)
+
+        with open(os.path.join(artifact_dir, 'info.json')) as f:
+            info = json.load(f)
+
+        return cls(info, local)
+
+    def has_file(self, file_path: str) -> bool:
+        """Checks that the file belongs to the package."""
+        return file_path in self.files
+
+    def select_files(self, file_paths: list) -> set:
+        """Returns the paths from the list which belong to the package."""
+        return self.files.select_existing(file_paths)
@@ -1,4 +1,5 @@
-from darty.drivers.factory import DriverFactory
+import json
+import threading
 from darty.package.validators import check_repository_root, check_repository_type
 
 
@@ -8,6 +9,8 @@ class Repository(object):
         self.type = config.get('type', '')
         self.root = config.get('root', '')  # unique identificator within particular repository type
         self.parameters = config.get('parameters', {})
+        self.peer_cache = config.get('peerCache')  # URL of a "darty serve" host which is used before the repository
+        self.mirrors = config.get('mirrors', [])  # repositories with the same packages, used only for downloads
 
         # check repository type
         if not self.type:
@@ -21,11 +24,53 @@ class Repository(object):
         if not check_repository_root(self.root):
             raise ValueError('Repository root has invalid format')
 
-        self._driver = None
+        # check the peer cache URL
+        if self.peer_cache is not None and not (isinstance(self.peer_cache, str)
+                                                and self.peer_cache.startswith(('http://', 'https://'))):
+            raise ValueError('Peer cache must be an HTTP URL')
+
+        # check mirrors, they are configured the same way as repositories
+        if not isinstance(self.mirrors, list):
+            raise ValueError('Mirrors must be a list of repositories')
+
+        for mirror in self.mirrors:
+            if not isinstance(mirror, dict) or set(mirror) - {'type', 'root', 'parameters'}:
+                raise ValueError('Mirror must have only "type", "root" and "parameters" keys')
+
+            Repository(mirror)
 
     @property
     def driver(self):
-        if not self._driver:
-            self._driver = DriverFactory.create_driver(self.type, self.root, self.parameters)
+        """Driver shared by all the repositories with the same configuration in the process."""
+        from darty.drivers.factory import DriverFactory
+
+        return DriverFactory.get_driver(self.type, self.root, self.parameters, self.peer_cache, self.mirrors)
+
+    @property
+    def async_driver(self):
+        from darty.drivers.factory import DriverFactory
+
+        return DriverFactory.get_async_driver(self.type, self.root, self.parameters, self.peer_cache, self.mirrors)
+
+
+class RepositoryPool(object):
+    """Shares repository objects between dependency managers, so projects which use
+    the same repository also share its driver and the driver's connections.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._repositories = {}
+
+    def get(self, config: dict) -> Repository:
+        """Returns a repository for the configuration.
+
+        :raises ValueError: if the configuration is invalid
+        """
+        key = json.dumps(config, sort_keys=True, default=str)
+
+        with self._lock:
+            if key not in self._repositories:
+                self._repositories[key] = Repository(config)
 
-        return self._driver
+            return self._repositories[key]
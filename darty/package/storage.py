@@ -0,0 +1,322 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+from shutil import rmtree
+from darty.output_writer import AbstractOutputWriter, NullOutputWriter
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# file in an artifact directory: its modification time is the last access time of the package,
+# its content is the size of the package and processes that use the package hold a shared lock on it
+ACCESS_FILENAME = '.last-access'
+
+# environments of artifacts (see "Dependency")
+ENV_PRODUCTION = '.artifacts'
+ENV_LOCAL = '.local-artifacts'
+ENV_TMP = '.tmp-artifacts'
+
+# artifact directories which are being removed (see "remove_artifact()" and "Dependency")
+LEFTOVER_PATTERN = re.compile(r'.*\.(removed|broken)-\d+$')
+
+# an artifact in the packages directory
+StoredArtifact = namedtuple('StoredArtifact', ['path', 'env', 'size', 'last_access'])
+
+
+class AccessTracker(object):
+    """Records access times of artifacts and pins them while the process uses them.
+
+    The access file is written only if it's older than "UPDATE_INTERVAL" seconds and is checked
+    at most once per "UPDATE_INTERVAL" seconds for every artifact, so resolving paths stays cheap.
+
+    Pins are shared locks on the access file (they are not supported on Windows). Recently used
+    artifacts stay pinned, but the process keeps at most "MAX_PINS" of such pins: the least recently
+    used ones are released. Artifacts which are being read are pinned explicitly (see "pin()"),
+    these pins are counted and are released when the last reader finishes.
+    """
+
+    UPDATE_INTERVAL = 3600
+    MAX_PINS = 64
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._access_times = {}
+        self._pins = OrderedDict()  # artifact directory -> [access file, number of explicit pins]
+
+    def touch(self, artifact_dir: str, size: int = None):
+        """Updates the access time of an artifact and pins it.
+
+        :param artifact_dir: artifact directory
+        :param size: size of the artifact, it's written to the access file if specified
+        """
+        now = time.time()
+
+        with self._lock:
+            pinned = artifact_dir in self._pins
+            if pinned:
+                self._pins.move_to_end(artifact_dir)
+
+            if size is None and (pinned or not fcntl) and now - self._access_times.get(artifact_dir, 0) < self.UPDATE_INTERVAL:
+                return
+
+            self._access_times[artifact_dir] = now
+
+        access_path = os.path.join(artifact_dir, ACCESS_FILENAME)
+        try:
+            if size is not None:
+                with open(access_path, 'w') as f:
+                    json.dump({'size': size}, f)
+            elif not _is_modified_since(access_path, now - self.UPDATE_INTERVAL):
+                with open(access_path, 'a'):
+                    os.utime(access_path)
+
+            self._acquire(artifact_dir, access_path, 0)
+        except OSError:
+            # the artifact was removed or the directory is read-only
+            pass
+
+    @contextmanager
+    def pin(self, artifact_dir: str):
+        """Keeps an artifact pinned while the files of the artifact are read."""
+        try:
+            pinned = self._acquire(artifact_dir, os.path.join(artifact_dir, ACCESS_FILENAME), 1)
+        except OSError:
+            pinned = False
+
+        try:
+            yield
+        finally:
+            if pinned:
+                with self._lock:
+                    pin = self._pins.get(artifact_dir)
+                    if pin:
+                        pin[1] -= 1
+                        self._release_unused()
+
+    def release(self):
+        """Releases all the pins of the process."""
+        with self._lock:
+            pins, self._pins = self._pins, OrderedDict()
+            self._access_times.clear()
+
+        for f, _ in pins.values():
+            f.close()
+
+    def _acquire(self, artifact_dir: str, access_path: str, num_refs: int) -> bool:
+        """Pins an artifact, "num_refs" is 1 for an explicit pin.
+
+        :return: False if the artifact can't be pinned
+        """
+        if not fcntl:
+            return False
+
+        with self._lock:
+            pin = self._pins.get(artifact_dir)
+            if not pin:
+                f = open(access_path, 'r')
+                try:
+                    fcntl.flock(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                except OSError:
+                    # the artifact is being removed right now
+                    f.close()
+                    return False
+
+                pin = self._pins[artifact_dir] = [f, 0]
+
+            pin[1] += num_refs
+            self._pins.move_to_end(artifact_dir)
+            self._release_unused()
+
+        return True
+
+    def _release_unused(self):
+        """Releases the least recently used pins which are not held explicitly."""
+        unused = [artifact_dir for artifact_dir, (_, num_refs) in self._pins.items() if not num_refs]
+        for artifact_dir in unused[:max(len(unused) - self.MAX_PINS, 0)]:
+            self._pins.pop(artifact_dir)[0].close()
+
+
+def _is_modified_since(path: str, timestamp: float) -> bool:
+    try:
+        return os.stat(path).st_mtime >= timestamp
+    except OSError:
+        return False
+
+
+# access times and pins of the current process
+access_tracker = AccessTracker()
+
+
+def scan_artifacts(packages_dir: str) -> list:
+    """Returns all the artifacts in the packages directory."""
+    artifacts = []
+
+    for cur_dir, dir_names, _ in os.walk(packages_dir):
+        env = os.path.basename(cur_dir)
+        if env not in (ENV_PRODUCTION, ENV_LOCAL, ENV_TMP):
+            continue
+
+        for dir_name in sorted(dir_names):
+            # directories which were being removed when their process crashed
+            if LEFTOVER_PATTERN.match(dir_name):
+                continue
+
+            artifact_dir = os.path.join(cur_dir, dir_name)
+            artifacts.append(StoredArtifact(artifact_dir, env, get_artifact_size(artifact_dir),
+                                            get_last_access_time(artifact_dir)))
+
+        # artifacts don't contain other artifacts
+        dir_names.clear()
+
+    return artifacts
+
+
+def get_artifact_size(artifact_dir: str) -> int:
+    """Returns the size of an artifact. The size is read from the access file if it was recorded."""
+    from darty.helpers.inventory import FileInventory
+
+    try:
+        with open(os.path.join(artifact_dir, ACCESS_FILENAME)) as f:
+            return int(json.load(f)['size'])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    return FileInventory.scan(artifact_dir).total_size
+
+
+def get_last_access_time(artifact_dir: str) -> float:
+    """Returns the last access time of an artifact, if it wasn't recorded, the modification time is used."""
+    for path in (os.path.join(artifact_dir, ACCESS_FILENAME), os.path.join(artifact_dir, 'info.json'), artifact_dir):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            continue
+
+    return 0
+
+
+def collect_garbage(packages_dir: str, max_size: int = None, keep: set = None, tmp_max_age: float = 24 * 3600,
+                    local_max_age: float = None, dry_run: bool = False, output: AbstractOutputWriter = None) -> list:
+    """Removes unused artifacts from the packages directory.
+
+    - temporary artifacts (left by crashed processes) are removed if they are older than "tmp_max_age" seconds,
+    - locally published artifacts are removed if they weren't used for "local_max_age" seconds,
+    - production artifacts are removed starting from the least recently used ones until the size
+      of the directory is under "max_size" bytes.
+
+    Artifacts pinned by running processes and artifacts from the "keep" set are never removed.
+
+    :param packages_dir: packages directory
+    :param max_size: maximum size of the packages directory in bytes
+    :param keep: artifact directories which must not be removed
+    :param tmp_max_age: minimum age of temporary artifacts to remove
+    :param local_max_age: minimum time since the last access to remove a locally published artifact
+    :param dry_run: only report the artifacts which would be removed
+    :param output:
+    :return: list of removed artifacts
+    """
+    if not output:
+        output = NullOutputWriter()
+
+    keep = {os.path.normpath(path) for path in keep} if keep else set()
+    now = time.time()
+
+    artifacts = scan_artifacts(packages_dir)
+    total_size = sum(artifact.size for artifact in artifacts)
+
+    # choose artifacts to remove
+    candidates = []
+    for artifact in artifacts:
+        age = now - artifact.last_access
+        if artifact.env == ENV_TMP and age >= tmp_max_age:
+            candidates.append(artifact)
+        elif artifact.env == ENV_LOCAL and local_max_age is not None and age >= local_max_age:
+            candidates.append(artifact)
+
+    if max_size is not None:
+        lru_artifacts = sorted((artifact for artifact in artifacts if artifact.env == ENV_PRODUCTION),
+                               key=lambda artifact: artifact.last_access)
+        candidates += lru_artifacts
+
+    removed = []
+    removed_size = 0
+    for artifact in candidates:
+        # production artifacts are removed only while the directory is over the quota
+        if artifact.env == ENV_PRODUCTION and total_size - removed_size <= max_size:
+            break
+
+        if os.path.normpath(artifact.path) in keep:
+            continue
+
+        if dry_run:
+            if is_pinned(artifact.path):
+                continue
+        elif not remove_artifact(artifact.path):
+            continue
+
+        removed.append(artifact)
+        removed_size += artifact.size
+        output.write('[-] %s "%s" (%d bytes)' % ('Would remove' if dry_run else 'Removed',
+                                                 os.path.relpath(artifact.path, packages_dir), artifact.size))
+
+    return removed
+
+
+def is_pinned(artifact_dir: str) -> bool:
+    """Checks if an artifact is used by a running process."""
+    if not fcntl:
+        return False
+
+    try:
+        f = open(os.path.join(artifact_dir, ACCESS_FILENAME), 'r')
+    except OSError:
+        return False
+
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+
+    return False
+
+
+def remove_artifact(artifact_dir: str) -> bool:
+    """Removes an artifact if it's not pinned by a running process.
+    The artifact is renamed first, so other processes never see a partially removed artifact.
+
+    :return: True if the artifact was removed
+    """
+    f = None
+    if fcntl:
+        try:
+            f = open(os.path.join(artifact_dir, ACCESS_FILENAME), 'r')
+        except OSError:
+            pass
+        else:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+
+    try:
+        removed_dir = '%s.removed-%d' % (artifact_dir, os.getpid())
+        try:
+            os.rename(artifact_dir, removed_dir)
+        except OSError:
+            return False
+
+        rmtree(removed_dir, True)
+    finally:
+        if f:
+            f.close()
+
+    return True
@@ -1,37 +1,34 @@
 import re
 
 
+# patterns are compiled once, when the module is imported
+GROUP_NAME_PATTERN = re.compile(r'^[a-z][a-z0-9_]*(\.[a-z_][a-z0-9_]*)*$')
+ARTIFACT_NAME_PATTERN = re.compile(r'^[a-z][a-z0-9_-]*[a-z0-9]$')
+VERSION_NUMBER_PATTERN = re.compile(r'^v?[0-9]+(\.[0-9]+){0,2}([a-z-][a-z0-9-][a-z0-9]*)?$')
+FILES_FILE_PATH_PATTERN = re.compile(r'^[a-z0-9\.-_]([a-z0-9-/_]+\.?)*[a-z0-9-_]$')
+REPOSITORY_TYPE_PATTERN = re.compile(r'^[a-z0-9_]*$')
+REPOSITORY_ROOT_PATTERN = re.compile(r'^[a-z0-9_-]*$')
+
+
 def check_group_name(group: str):
-    regexp = '^[a-z][a-z0-9_]*(\.[a-z_][a-z0-9_]*)*$'
-    pattern = re.compile(regexp)
-    return pattern.match(group)
+    return GROUP_NAME_PATTERN.match(group)
 
 
 def check_artifact_name(artifact: str):
-    regexp = '^[a-z][a-z0-9_-]*[a-z0-9]$'
-    pattern = re.compile(regexp)
-    return pattern.match(artifact)
+    return ARTIFACT_NAME_PATTERN.match(artifact)
 
 
 def check_version_number(version: str):
-    regexp = '^v?[0-9]+(\.[0-9]+){0,2}([a-z-][a-z0-9-][a-z0-9]*)?$'
-    pattern = re.compile(regexp)
-    return pattern.match(version)
+    return VERSION_NUMBER_PATTERN.match(version)
 
 
 def check_files_file_path(file_path: str):
-    regexp = '^[a-z0-9\.-_]([a-z0-9-/_]+\.?)*[a-z0-9-_]$'
-    pattern = re.compile(regexp)
-    return pattern.match(file_path)
+    return FILES_FILE_PATH_PATTERN.match(file_path)
 
 
 def check_repository_type(repository_type: str):
-    regexp = '^[a-z0-9_]*$'
-    pattern = re.compile(regexp)
-    return pattern.match(repository_type)
+    return REPOSITORY_TYPE_PATTERN.match(repository_type)
 
 
 def check_repository_root(root: str):
-    regexp = '^[a-z0-9_-]*$'
-    pattern = re.compile(regexp)
-    return pattern.match(root)
+    return REPOSITORY_ROOT_PATTERN.match(root)
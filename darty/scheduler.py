@@ -0,0 +1,210 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from darty import metrics, tracing
+from darty.utils import parse_size
+
+
+# priority of the transfers started in the current context, transfers with
+# a higher priority get free connections first
+_priority = ContextVar('darty_transfer_priority', default=0)
+
+
+class TokenBucket(object):
+    """Limits the rate of transferred bytes.
+
+    Bytes are always consumed at once, even if there are not enough tokens: the bucket
+    goes into debt and the caller sleeps until the debt is paid off, so chunks of any
+    size can be throttled and the average rate never exceeds the limit.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        :param rate: bytes per second
+        :param capacity: maximum burst in bytes, one second of the rate by default
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity else rate
+
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._time = time.monotonic()
+
+    def consume(self, num_bytes: int) -> float:
+        """Takes tokens for the bytes and blocks if the rate is exceeded.
+
+        :return: number of seconds the caller waited
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._time) * self.rate)
+            self._time = now
+            self._tokens -= num_bytes
+
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+
+class TransferScheduler(object):
+    """Process-wide limits for all the transfers of all the drivers: the total bandwidth
+    (a token bucket) and the total number of connections (concurrent object transfers).
+
+    Waiting transfers get free connections in the order of their priorities, transfers
+    with the same priority are served first in, first out. Waiting times are recorded
+    as the "queue_wait_seconds" metric.
+    """
+
+    def __init__(self, max_bandwidth: int = None, max_connections: int = None):
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._counter = itertools.count()
+        self._active = 0
+        self._bucket = None
+        self.max_connections = None
+
+        self.configure(max_bandwidth, max_connections)
+
+    def configure(self, max_bandwidth: int = None, max_connections: int = None):
+        """Changes the limits, "None" disables a limit.
+
+        :param max_bandwidth: total bytes per second
+        :param max_connections: total number of objects transferred at the same time
+        """
+        if max_bandwidth is not None and max_bandwidth <= 0:
+            raise ValueError('Maximum bandwidth must be positive')
+
+        if max_connections is not None and max_connections < 1:
+            raise ValueError('Maximum number of connections must be positive')
+
+        with self._condition:
+            self._bucket = TokenBucket(max_bandwidth) if max_bandwidth else None
+            self.max_connections = max_connections
+            self._condition.notify_all()
+
+    @property
+    def max_bandwidth(self) -> int:
+        bucket = self._bucket
+        return bucket.rate if bucket else None
+
+    @contextmanager
+    def connection(self, priority: int = None, **labels):
+        """Holds a connection slot while the "with" block transfers an object.
+
+        :param priority: the priority of the current context by default
+        """
+        if priority is None:
+            priority = _priority.get()
+
+        start = time.perf_counter()
+        with self._condition:
+            entry = (-priority, next(self._counter))
+            heapq.heappush(self._waiters, entry)
+
+            try:
+                while self._waiters[0] is not entry or \
+                        (self.max_connections is not None and self._active >= self.max_connections):
+                    self._condition.wait()
+            except BaseException:
+                # the waiting thread was interrupted, the other waiters must not wait for it
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+                raise
+
+            heapq.heappop(self._waiters)
+            self._active += 1
+
+            # the next waiter can take a slot too
+            self._condition.notify_all()
+
+        end = time.perf_counter()
+        metrics.observe('queue_wait_seconds', end - start, resource='connection', **labels)
+        if end - start > 0.001:
+            tracing.add_span('queue_wait:connection', start, end, 'scheduler', **labels)
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+    def throttle(self, num_bytes: int, **labels):
+        """Blocks while the bandwidth limit is exceeded, must be called for every transferred chunk."""
+        bucket = self._bucket
+        if not bucket:
+            return
+
+        wait = bucket.consume(num_bytes)
+        if wait > 0:
+            metrics.observe('queue_wait_seconds', wait, resource='bandwidth', **labels)
+
+    def throttled(self, callback=None, **labels):
+        """Wraps a progress callback (for example, of a boto3 transfer), so the transfer is throttled."""
+        def update(num_bytes: int):
+            self.throttle(num_bytes, **labels)
+            if callback:
+                callback(num_bytes)
+
+        return update
+
+
+@contextmanager
+def priority(value: int):
+    """Sets the priority for the transfers started in the "with" block (in the same thread or task)."""
+    token = _priority.set(value)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def configure_from_settings(settings: dict, max_bandwidth: str = None, max_connections: int = None):
+    """Configures the process-wide scheduler using profile settings, arguments override the settings.
+
+    :param settings: profile settings with "max_bandwidth" (for example, "50M" bytes per second)
+                     and "max_connections" values
+    """
+    if max_bandwidth is None:
+        max_bandwidth = settings.get('max_bandwidth')
+
+    if max_connections is None:
+        max_connections = settings.get('max_connections')
+
+    try:
+        max_connections = int(max_connections) if max_connections not in (None, '') else None
+    except ValueError:
+        raise ValueError('Invalid number of connections "%s"' % max_connections)
+
+    _scheduler.configure(parse_size(max_bandwidth) if max_bandwidth else None, max_connections)
+
+
+# process-wide scheduler, there are no limits by default
+_scheduler = TransferScheduler()
+
+
+def get_scheduler() -> TransferScheduler:
+    return _scheduler
+
+
+def configure(max_bandwidth: int = None, max_connections: int = None):
+    _scheduler.configure(max_bandwidth, max_connections)
+
+
+def connection(priority: int = None, **labels):
+    return _scheduler.connection(priority, **labels)
+
+
+def throttle(num_bytes: int, **labels):
+    _scheduler.throttle(num_bytes, **labels)
+
+
+def throttled(callback=None, **labels):
+    return _scheduler.throttled(callback, **labels)
@@ -0,0 +1,257 @@
+import logging
+import os
+import threading
+import urllib.parse
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import darty
+from darty import metrics
+from darty.drivers.peer import URL_PREFIX
+from darty.helpers.singleflight import SingleFlight
+from darty.output_writer import AbstractOutputWriter, BufferedOutputWriter, NullOutputWriter
+from darty.package.dependency import Dependency
+from darty.package.repository import Repository, RepositoryPool
+from darty.package.storage import access_tracker
+from darty.package.validators import check_repository_type, check_repository_root, check_group_name, \
+    check_artifact_name, check_version_number
+
+
+class PackageServer(ThreadingHTTPServer):
+    """Serves installed packages of the packages directory over HTTP (read-only), so hosts of a cluster
+    can download packages from one host instead of the repository (see the "peerCache" repository option).
+
+    If a package is not installed, the server downloads it from the repository first. Concurrent
+    requests for the same package wait for a single download.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple, packages_dir: str, fetch: bool = True, repositories: list = None,
+                 packages_quota: int = None, output: AbstractOutputWriter = None):
+        """
+        :param address: (host, port) tuple
+        :param packages_dir: directory with installed packages
+        :param fetch: download missing packages from the repositories
+        :param repositories: repositories with driver parameters, other repositories are used without parameters
+        :param packages_quota: maximum size of the packages directory in bytes
+        :param output: output for messages about downloaded packages
+        """
+        super().__init__(address, PackageRequestHandler)
+
+        self.packages_dir = packages_dir
+        self.fetch = fetch
+        self.packages_quota = packages_quota
+        self.output = output if output else NullOutputWriter()
+
+        self._repositories = {(repository.type, repository.root): repository for repository in (repositories or [])}
+        self._repository_pool = RepositoryPool()
+        self._downloads = SingleFlight()
+        self._output_lock = threading.Lock()
+
+    def get_artifact_dir(self, repository_type: str, root: str, group: str, artifact: str, version: str):
+        """Returns the directory of an installed package, the package is downloaded if it's missing.
+
+        :return: None if the package is not available
+        """
+        repository = self._repositories.get((repository_type, root))
+        if repository is None:
+            repository = self._repository_pool.get({'type': repository_type, 'root': root})
+
+        dependency = Dependency({'group': group, 'artifact': artifact, 'version': version},
+                                repository, self.packages_dir, None)
+        dependency.packages_quota = self.packages_quota
+
+        # locally published packages are never served
+        artifact_dir = dependency.get_artifact_dir(Dependency.ENV_PRODUCTION)
+        if not os.path.isfile(os.path.join(artifact_dir, 'info.json')):
+            if not self.fetch:
+                return None
+
+            try:
+                self._downloads.do(artifact_dir, self._download, dependency)
+            except Exception:
+                logging.exception('Download of the package "%s:%s:%s" failed' % (group, artifact, version))
+                return None
+
+            if not os.path.isfile(os.path.join(artifact_dir, 'info.json')):
+                return None
+
+        return artifact_dir
+
+    def _download(self, dependency: Dependency):
+        output = BufferedOutputWriter()
+        dependency.download(output)
+
+        with self._output_lock:
+            output.flush(self.output)
+
+
+class PackageRequestHandler(BaseHTTPRequestHandler):
+    """Handles "GET" and "HEAD" requests for package files: "info.json" and files from the "data" directory.
+
+    URL of a file: /v1/{repository_type}/{root}/{group}/{artifact}/{version}/{file_path}
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'darty/' + darty.__version__
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def log_message(self, format: str, *args):
+        logging.info('%s - %s' % (self.address_string(), format % args))
+
+    def _serve(self, send_body: bool):
+        status = self._serve_file(send_body)
+        metrics.inc('server_requests', status=str(status))
+
+    def _serve_file(self, send_body: bool) -> int:
+        parsed = self._parse_path(urllib.parse.urlsplit(self.path).path)
+        if not parsed:
+            self.send_error(400, 'Invalid package file URL')
+            return 400
+
+        *package, file_path = parsed
+        artifact_dir = self.server.get_artifact_dir(*package)
+        if artifact_dir is None:
+            status = 502 if self.server.fetch else 404
+            self.send_error(status, 'Package is not available')
+            return status
+
+        if file_path == 'info.json':
+            access_tracker.touch(artifact_dir)
+
+        # the package can't be garbage collected while the file is sent
+        with access_tracker.pin(artifact_dir):
+            return self._send_package_file(os.path.join(artifact_dir, *file_path.split('/')), send_body)
+
+    def _send_package_file(self, local_path: str, send_body: bool) -> int:
+        try:
+            f = open(local_path, 'rb')
+        except OSError:
+            self.send_error(404, 'File not found')
+            return 404
+
+        with f:
+            stat = os.fstat(f.fileno())
+            try:
+                byte_range = parse_range(self.headers.get('Range'), stat.st_size)
+            except ValueError:
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */%d' % stat.st_size)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return 416
+
+            start, end = byte_range if byte_range else (0, stat.st_size - 1)
+            status = 206 if byte_range else 200
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(end - start + 1))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Last-Modified', formatdate(stat.st_mtime, usegmt=True))
+            if byte_range:
+                self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, stat.st_size))
+            self.end_headers()
+
+            if send_body and end >= start:
+                self._send_file(f, start, end - start + 1)
+
+        return status
+
+    def _send_file(self, f, offset: int, count: int):
+        """Sends the file with "sendfile()", so the data is not copied to the user space."""
+        try:
+            sent = self.connection.sendfile(f, offset, count)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            return
+
+        metrics.inc('transfer_bytes', sent, direction='serve')
+        metrics.inc('transfer_objects', direction='serve')
+
+    @staticmethod
+    def _parse_path(path: str):
+        """Splits the URL path to the repository type, root, group, artifact, version and file path.
+
+        :return: None if the path is invalid
+        """
+        prefix = URL_PREFIX + '/'
+        if not path.startswith(prefix):
+            return None
+
+        parts = [urllib.parse.unquote(part) for part in path[len(prefix):].split('/')]
+        if len(parts) < 6:
+            return None
+
+        repository_type, root, group, artifact, version = parts[:5]
+        file_parts = parts[5:]
+
+        if not all(part and part.isprintable() for part in parts):
+            return None
+
+        if not (check_repository_type(repository_type) and check_repository_root(root)
+                and check_group_name(group) and check_artifact_name(artifact) and check_version_number(version)):
+            return None
+
+        # only "info.json" and files of the "data" directory can be requested
+        if file_parts != ['info.json'] and (file_parts[0] != 'data' or len(file_parts) < 2):
+            return None
+
+        if any(part in ('.', '..') or '\\' in part or '/' in part for part in file_parts):
+            return None
+
+        return repository_type, root, group, artifact, version, '/'.join(file_parts)
+
+
+def parse_range(header: str, size: int):
+    """Parses a "Range" header with a single byte range.
+
+    :return: (start, end) tuple with an inclusive end, None if the whole file must be sent
+             (there is no header, the header is invalid or it has several ranges)
+    :raises ValueError: if the range can't be satisfied
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+
+    start, sep, end = header[len('bytes='):].strip().partition('-')
+    if not sep or not (start.isdigit() or end.isdigit()) or (start and not start.isdigit()) \
+            or (end and not end.isdigit()):
+        return None
+
+    if not start:
+        # suffix range: the last N bytes
+        if int(end) == 0:
+            raise ValueError('Range not satisfiable')
+
+        return max(size - int(end), 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        raise ValueError('Range not satisfiable')
+
+    if end < start:
+        return None
+
+    return start, end
+
+
+def get_repositories(managers: list) -> list:
+    """Returns repositories of the dependencies of the managers. The server always downloads packages
+    from the repositories, so their peer caches are not used (a peer cache could be the server itself).
+    """
+    repositories = {}
+    for manager in managers:
+        for dependency in manager.dependencies.values():
+            repository = dependency.repository
+            repositories.setdefault((repository.type, repository.root),
+                                    Repository({'type': repository.type, 'root': repository.root,
+                                                'parameters': repository.parameters,
+                                                'mirrors': repository.mirrors}))
+
+    return list(repositories.values())
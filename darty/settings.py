@@ -1,8 +1,13 @@
 import configparser
 import os
+from darty.helpers.file_cache import FileCache
 from darty.utils import check_path
 
 
+# parsed configuration files
+_config_cache = FileCache()
+
+
 def get_config_file_path():
     """Path to Darty "config" file."""
     return os.path.join(os.path.expanduser('~'), '.darty', 'config')
@@ -11,7 +16,10 @@ def get_config_file_path():
 def get_settings(profile: str = 'default'):
     """Returns Darty settings for a specific profile."""
     return get_profile_settings(get_config_file_path(), profile, {
-        'packages_dir': os.path.join(os.path.dirname(get_config_file_path()), 'packages')
+        'packages_dir': os.path.join(os.path.dirname(get_config_file_path()), 'packages'),
+        'max_size': '',  # maximum size of the packages directory, for example: "20G"
+        'max_bandwidth': '',  # maximum total transfer speed in bytes per second, for example: "50M"
+        'max_connections': '',  # maximum number of objects transferred at the same time
     })
 
 
@@ -24,16 +32,26 @@ def get_profile_settings(filename: str, section: str, defaults: dict):
     Returns:
         dict: Default values merged with the actual values from the section.
     """
-    config = configparser.ConfigParser()
-    config.read(filename)
+    try:
+        sections = _config_cache.get(filename, _read_config_file)
+    except FileNotFoundError:
+        sections = {}
 
     settings = dict(defaults)
-    if section in config:
-        settings = {**settings, **config[section]}
+    if section in sections:
+        settings = {**settings, **sections[section]}
 
     return settings
 
 
+def _read_config_file(filename: str) -> dict:
+    """Reads all the sections of a configuration file to a dictionary."""
+    config = configparser.ConfigParser()
+    config.read(filename)
+
+    return {section: dict(config[section]) for section in config}
+
+
 def save_profile_settings(filename: str, section: str, settings: dict):
     """Saves a particular section to a configuration file.
     Args:
@@ -49,3 +67,5 @@ def save_profile_settings(filename: str, section: str, settings: dict):
 
     with open(filename, 'w') as f:
         config.write(f)
+
+    _config_cache.invalidate(filename)
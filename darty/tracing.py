@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class Tracer(object):
+    """Records spans in the Chrome trace event format (can be viewed in Perfetto or "chrome://tracing").
+
+    Spans are "complete" events: the name, the category, the start time and the duration
+    of an operation, together with the thread that performed it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = []
+        self._thread_names = {}
+        self._pid = os.getpid()
+        self._start_time = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, category: str = 'darty', **args):
+        """Records the duration of a "with" block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter(), category, **args)
+
+    def add_span(self, name: str, start: float, end: float, category: str = 'darty', **args):
+        """Records a span, "start" and "end" are values of the "time.perf_counter()" function."""
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': (start - self._start_time) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': self._pid,
+            'tid': thread.ident,
+        }
+        if args:
+            event['args'] = {key: str(value) for key, value in args.items()}
+
+        with self._lock:
+            self._events.append(event)
+            self._thread_names.setdefault(thread.ident, thread.name)
+
+    def get_events(self) -> list:
+        """Returns recorded spans and metadata events with thread names."""
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': name}}
+                    for tid, name in thread_names.items()]
+
+        return metadata + events
+
+    def write(self, file_path: str):
+        with open(file_path, 'w') as f:
+            json.dump({'traceEvents': self.get_events(), 'displayTimeUnit': 'ms'}, f)
+
+
+# the tracer is created only when tracing is enabled,
+# otherwise spans are no-ops
+_tracer = None
+
+
+def start_tracing() -> Tracer:
+    global _tracer
+    _tracer = Tracer()
+
+    return _tracer
+
+
+def stop_tracing():
+    """Disables tracing and returns the tracer with recorded spans."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+
+    return tracer
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, category: str = 'darty', **args):
+    """Returns a context manager which records a span if tracing is enabled.
+    Drivers can use it to show their own operations in a trace:
+
+        with tracing.span('download_file', category='my_driver', path=path):
+            ...
+    """
+    tracer = _tracer
+    if tracer is None:
+        return nullcontext()
+
+    return tracer.span(name, category, **args)
+
+
+def add_span(name: str, start: float, end: float, category: str = 'darty', **args):
+    tracer = _tracer
+    if tracer is not None:
+        tracer.add_span(name, start, end, category, **args)
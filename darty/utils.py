@@ -1,7 +1,11 @@
 import os
 import errno
 import hashlib
-from shutil import rmtree, copytree, copyfile
+from shutil import rmtree, copytree, copyfile, copystat
+
+
+# size of a buffer to copy files
+COPY_BUFFER_SIZE = 1024 * 1024
 
 
 def check_path(path):
@@ -36,15 +40,37 @@ def file_exists(path: str):
 
 
 def is_dir_empty(path: str):
-    return not dir_exists(path) or not len(os.listdir(path))
+    if not dir_exists(path):
+        return True
 
+    # stop at the first entry instead of listing the whole directory
+    with os.scandir(path) as entries:
+        return next(entries, None) is None
 
-def copy_file(src_path, dst_path):
+
+def copy_file(src_path, dst_path, callback=None):
     """Copies a file.
     Creates necessary directories if they didn't exists.
+
+    :param callback: function which receives every copied piece of data,
+                     so the content can be processed without reading the file again
     """
     os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-    copyfile(src_path, dst_path)
+
+    if not callback:
+        copyfile(src_path, dst_path)
+        return
+
+    with open(src_path, 'rb') as f_src, open(dst_path, 'wb') as f_dst:
+        while True:
+            buf = f_src.read(COPY_BUFFER_SIZE)
+            if not buf:
+                break
+
+            callback(buf)
+            f_dst.write(buf)
+
+    copystat(src_path, dst_path)
 
 
 def copy_dir(src_dir, dst_dir):
@@ -57,41 +83,274 @@ def copy_dir(src_dir, dst_dir):
     return res
 
 
+def move_dir(src_dir, dst_dir):
+    """Moves a directory.
+    Destination directory will be removed before moving. Within the same file system
+    the directory is renamed, otherwise it's copied and the source directory is removed.
+    """
+    rmtree(dst_dir, True)
+    os.makedirs(os.path.dirname(dst_dir), exist_ok=True)
+
+    try:
+        os.rename(src_dir, dst_dir)
+    except OSError as exception:
+        if exception.errno != errno.EXDEV:
+            raise exception
+
+        copytree(src_dir, dst_dir)
+        rmtree(src_dir)
+
+
 def list_dir_files(dir_path):
-    for cur_dir, directories, filenames in os.walk(dir_path):
-        rel_dir = os.path.relpath(cur_dir, dir_path)
-        for filename in filenames:
-            yield os.path.join(rel_dir, filename)
+    from darty.helpers.inventory import FileInventory
+
+    for file_path in FileInventory.scan(dir_path).paths:
+        # files in the root directory are prefixed with "./"
+        yield file_path if os.path.dirname(file_path) else os.path.join('.', file_path)
 
 
 def get_dir_hash(path: str):
     """Gets SHA1 hash of the directory.
 
+    Files are hashed in the "os.walk()" order, the same way as packages were always hashed,
+    so hashes of existing packages don't change. Packages record their files in the same order,
+    so "DirHash" can rebuild the hash from the list of files in "info.json".
+
     :param path:
     :return:
     """
-    sha_hash = hashlib.sha1()
+    dir_hash = DirHash()
     if not dir_exists(path):
-        raise ValueError('Directory "%s" doesn\'t exist' % dir)
+        raise ValueError('Directory "%s" doesn\'t exist' % path)
 
     for cur_dir, directories, filenames in os.walk(path):
         for filename in filenames:
             file_path = os.path.join(cur_dir, filename)
 
             # add filename to a hash
-            relative_path = os.path.relpath(file_path, path).replace('\\', '/')
-            sha_hash.update(relative_path.encode('utf-8'))
+            dir_hash.add_file(os.path.relpath(file_path, path))
 
             # add file content to a hash
             with open(file_path, 'rb') as f:
                 while True:
-                    buf = f.read(4096)
+                    buf = f.read(COPY_BUFFER_SIZE)
                     if not buf:
                         break
 
-                    sha_hash.update(hashlib.sha1(buf).hexdigest().encode('utf-8'))
+                    dir_hash.update(buf)
+
+    return dir_hash.hexdigest()
+
+
+class DirHash(object):
+    """Incremental version of the directory hash (see "get_dir_hash()").
+
+    Files must be added in the order of the package's list of files ("get_dir_hash()" uses
+    the "os.walk()" order), the content of a file can be passed in pieces of any size.
+    """
+
+    # content of every file is hashed by blocks of this size
+    BLOCK_SIZE = 4096
+
+    def __init__(self):
+        self._hash = hashlib.sha1()
+        self._buffer = b''
+
+    def add_file(self, relative_path: str):
+        """Starts a new file."""
+        self._flush()
+        self._hash.update(relative_path.replace('\\', '/').encode('utf-8'))
+
+    def update(self, data: bytes):
+        """Adds a piece of the current file's content."""
+        if self._buffer:
+            data = self._buffer + data
+
+        view = memoryview(data)
+        end = len(view) - len(view) % self.BLOCK_SIZE
+        for i in range(0, end, self.BLOCK_SIZE):
+            self._hash.update(hashlib.sha1(view[i:i + self.BLOCK_SIZE]).hexdigest().encode('utf-8'))
+
+        self._buffer = bytes(view[end:])
+
+    def add_file_digest(self, relative_path: str, file_digest: 'FileDigest'):
+        """Adds a file which content was already hashed (see "FileDigest")."""
+        self.add_file(relative_path)
+        self._hash.update(file_digest.block_digests)
+
+    def hexdigest(self) -> str:
+        self._flush()
+        return self._hash.hexdigest()
+
+    def _flush(self):
+        if self._buffer:
+            self._hash.update(hashlib.sha1(self._buffer).hexdigest().encode('utf-8'))
+            self._buffer = b''
+
+
+class FileDigest(object):
+    """Digest of a single file which is computed while the file is being written.
+
+    The file is hashed by blocks the same way as "DirHash" does it, so digests of files
+    computed independently (for example, by concurrent downloads) can be combined
+    to the directory hash later (see "DirHash.add_file_digest()").
+    """
+
+    BLOCK_SIZE = DirHash.BLOCK_SIZE
+
+    def __init__(self):
+        self.size = 0
+        self._block_digests = bytearray()
+        self._buffer = b''
 
-    return sha_hash.hexdigest()
+    @classmethod
+    def from_file(cls, path: str):
+        """Computes a digest of an existing file."""
+        file_digest = cls()
+        with open(path, 'rb') as f:
+            while True:
+                buf = f.read(COPY_BUFFER_SIZE)
+                if not buf:
+                    break
+
+                file_digest.update(buf)
+
+        return file_digest
+
+    def update(self, data: bytes):
+        """Adds a piece of the file's content."""
+        self.size += len(data)
+
+        if self._buffer:
+            data = self._buffer + data
+
+        view = memoryview(data)
+        end = len(view) - len(view) % self.BLOCK_SIZE
+        for i in range(0, end, self.BLOCK_SIZE):
+            self._block_digests += hashlib.sha1(view[i:i + self.BLOCK_SIZE]).hexdigest().encode('utf-8')
+
+        self._buffer = bytes(view[end:])
+
+    @property
+    def block_digests(self) -> bytes:
+        """Concatenated hex digests of all the blocks of the file."""
+        if self._buffer:
+            self._block_digests += hashlib.sha1(self._buffer).hexdigest().encode('utf-8')
+            self._buffer = b''
+
+        return bytes(self._block_digests)
+
+    def hexdigest(self) -> str:
+        """SHA1 hash of the block digests, it identifies the content of the file."""
+        return hashlib.sha1(self.block_digests).hexdigest()
+
+
+class RangeDigest(object):
+    """Digest of a file which is written by ranges in any order (for example, by parallel ranged downloads).
+
+    Blocks are hashed independently, so every complete block is hashed as soon as it's written.
+    Pieces of blocks which are split between writes are kept until the block is complete.
+    Blocks which were not hashed on the way (gaps, inconsistent retries) are read from the file at the end.
+    """
+
+    BLOCK_SIZE = DirHash.BLOCK_SIZE
+
+    def __init__(self):
+        self._block_digests = {}  # block index -> hex digest
+        self._pieces = {}  # block index -> {offset within the block: data}
+
+    def update(self, offset: int, data: bytes):
+        """Adds a piece of the file's content written at the offset."""
+        view = memoryview(data)
+        pos = 0
+        while pos < len(view):
+            block_index, block_offset = divmod(offset + pos, self.BLOCK_SIZE)
+            piece = view[pos:pos + self.BLOCK_SIZE - block_offset]
+            pos += len(piece)
+
+            if len(piece) == self.BLOCK_SIZE:
+                self._block_digests[block_index] = hashlib.sha1(piece).hexdigest()
+                self._pieces.pop(block_index, None)
+                continue
+
+            pieces = self._pieces.setdefault(block_index, {})
+            pieces[block_offset] = bytes(piece)
+            block = self._join_pieces(pieces)
+            if len(block) == self.BLOCK_SIZE:
+                self._block_digests[block_index] = hashlib.sha1(block).hexdigest()
+                del self._pieces[block_index]
+
+    def get_file_digest(self, path: str) -> FileDigest:
+        """Returns the digest of the completely written file."""
+        size = os.path.getsize(path)
+        num_blocks = (size + self.BLOCK_SIZE - 1) // self.BLOCK_SIZE
+        block_digests = bytearray()
+        f = None
+
+        try:
+            for block_index in range(num_blocks):
+                block_size = min(self.BLOCK_SIZE, size - block_index * self.BLOCK_SIZE)
+
+                hex_digest = self._block_digests.get(block_index) if block_size == self.BLOCK_SIZE else None
+                if hex_digest is None:
+                    block = self._join_pieces(self._pieces.get(block_index, {}))
+                    if len(block) < block_size:
+                        # the block was not written completely on the way
+                        if f is None:
+                            f = open(path, 'rb')
+
+                        f.seek(block_index * self.BLOCK_SIZE)
+                        block = f.read(block_size)
+
+                    hex_digest = hashlib.sha1(block[:block_size]).hexdigest()
+
+                block_digests += hex_digest.encode('utf-8')
+        finally:
+            if f is not None:
+                f.close()
+
+        file_digest = FileDigest()
+        file_digest.size = size
+        file_digest._block_digests = block_digests
+
+        return file_digest
+
+    @staticmethod
+    def _join_pieces(pieces: dict) -> bytearray:
+        """Joins pieces of a block starting from its beginning until the first gap."""
+        block = bytearray()
+        for block_offset in sorted(pieces):
+            if block_offset > len(block):
+                break
+
+            piece = pieces[block_offset]
+            block[block_offset:block_offset + len(piece)] = piece
+
+        return block
+
+
+def parse_size(size: str) -> int:
+    """Converts a size with an optional unit (K, M, G or T) to bytes, for example: "20G"."""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+    value = size.strip().upper()
+    if value.endswith('B'):
+        value = value[:-1]
+
+    multiplier = 1
+    if value and value[-1] in units:
+        multiplier = units[value[-1]]
+        value = value[:-1]
+
+    try:
+        res = int(float(value) * multiplier)
+    except ValueError:
+        raise ValueError('Invalid size "%s"' % size)
+
+    if res < 0:
+        raise ValueError('Invalid size "%s"' % size)
+
+    return res
 
 
 def convert_path_w2u(path):
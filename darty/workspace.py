@@ -0,0 +1,263 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from darty.dependency_manager import DependencyManager
+from darty.helpers.pipeline import Pipeline, Stage
+from darty.metrics import format_size
+from darty.output_writer import AbstractOutputWriter, BufferedOutputWriter, NullOutputWriter
+from darty.package.dependency import Dependency
+from darty.package.repository import RepositoryPool
+
+
+# directories which are never searched for configuration files
+IGNORED_DIRS = {'node_modules', 'venv', '__pycache__', 'site-packages'}
+
+
+class Workspace(object):
+    """Set of projects under a root directory, every project has its own configuration file.
+
+    Projects share repositories (and their drivers), every package is downloaded only once.
+    """
+
+    def __init__(self, root: str, darty_profile: str = None, config_filename: str = None):
+        if not config_filename:
+            config_filename = DependencyManager.DEFAULT_CONFIG_FILE
+
+        if not os.path.isdir(root):
+            raise ValueError('Workspace directory "%s" doesn\'t exist' % root)
+
+        self.root = root
+        self.repository_pool = RepositoryPool()
+
+        self.managers = OrderedDict()
+        for config_path in find_config_files(root, config_filename):
+            try:
+                self.managers[config_path] = DependencyManager(config_path, darty_profile, self.repository_pool)
+            except ValueError as e:
+                raise ValueError('%s: %s' % (os.path.relpath(config_path, root), str(e)))
+
+    def get_unique_dependencies(self) -> list:
+        return get_unique_dependencies(self.managers.values())
+
+    def update(self, rewrite_working_dir: bool = False, jobs: int = 4, output: AbstractOutputWriter = None) -> dict:
+        """Downloads all the packages and updates working directories of all the projects.
+
+        :return: summary of the installation (see "get_summary()") and the number of failed projects
+        """
+        if not output:
+            output = NullOutputWriter()
+
+        # every package is downloaded once, then working directories of all the projects which
+        # depend on it are updated
+        targets = OrderedDict()
+        for manager in self.managers.values():
+            for dependency in manager.dependencies.values():
+                targets.setdefault(dependency.get_artifact_dir(), []).append(dependency)
+
+        installs = [PackageInstall(dependencies[0], dependencies) for dependencies in targets.values()]
+
+        output.write('Downloading %d packages for %d projects...' % (len(installs), len(self.managers)))
+        installer = PackageInstaller(jobs, rewrite_working_dir)
+        start_time = time.perf_counter()
+        with output.indent():
+            for install in installer.run(installs):
+                install.output.flush(output)
+
+        # the output of working directories is grouped by projects
+        target_outputs = {}
+        failed_dirs = set()
+        for install in installs:
+            target_outputs.update((id(target), target_output)
+                                  for target, target_output in zip(install.targets, install.target_outputs))
+            if install.status == 'failed':
+                failed_dirs.add(install.dependency.get_artifact_dir())
+
+        output.write('Updating working directories...')
+        num_failed_projects = 0
+        with output.indent():
+            for config_path, manager in self.managers.items():
+                output.write('Project "%s":' % os.path.relpath(config_path, self.root))
+                failed = False
+
+                with output.indent():
+                    for dependency in manager.dependencies.values():
+                        if dependency.get_artifact_dir() in failed_dirs:
+                            output.write('[-] Package "%s:%s:%s" was not downloaded'
+                                         % (dependency.group, dependency.artifact, dependency.version))
+                            failed = True
+                        elif dependency.working_dir:
+                            output.write('Package "%s:%s:%s":'
+                                         % (dependency.group, dependency.artifact, dependency.version))
+                            target_outputs[id(dependency)].flush(output)
+
+                num_failed_projects += int(failed)
+
+        summary = get_summary(installs, time.perf_counter() - start_time)
+        summary['failed_projects'] = num_failed_projects
+
+        return summary
+
+
+def find_config_files(root: str, config_filename: str) -> list:
+    """Searches configuration files in a directory tree, hidden directories are skipped."""
+    config_paths = []
+
+    for cur_dir, dir_names, file_names in os.walk(root):
+        dir_names[:] = sorted(dir_name for dir_name in dir_names
+                              if not dir_name.startswith('.') and dir_name not in IGNORED_DIRS)
+
+        if config_filename in file_names:
+            config_paths.append(os.path.join(cur_dir, config_filename))
+
+    return config_paths
+
+
+def get_unique_dependencies(managers) -> list:
+    """Merges dependencies of several managers. Dependencies with the same group, artifact and version
+    from the same repository are installed to the same directory, so only one of them is kept.
+    """
+    dependencies = OrderedDict()
+    for manager in managers:
+        for dependency in manager.dependencies.values():
+            dependencies.setdefault(dependency.get_artifact_dir(), dependency)
+
+    return list(dependencies.values())
+
+
+class PackageInstall(object):
+    """Package processed by "PackageInstaller": its status, the output and the dependencies
+    which working directories must be updated.
+    """
+
+    def __init__(self, dependency: Dependency, targets: list = None, output: AbstractOutputWriter = None):
+        """
+        :param dependency: dependency to download
+        :param targets: dependencies which use the same installed package (the dependency itself by default)
+        :param output: output of the package, it's buffered by default, so outputs of concurrent installs
+                       are not mixed (see "flush()")
+        """
+        self.dependency = dependency
+        self.targets = targets if targets is not None else [dependency]
+        self.status = None  # "downloaded", "cached" or "failed"
+        self.package_info = None
+        self.downloaded_bytes = 0
+        self.output = output if output else BufferedOutputWriter()
+        self.target_outputs = [output if output else BufferedOutputWriter() for _ in self.targets]
+        self._buffered = not output
+        self._fetched = None
+
+    def flush(self, output: AbstractOutputWriter):
+        """Writes the buffered output of the package and of its working directories."""
+        if not self._buffered:
+            return
+
+        for buffered_output in [self.output] + self.target_outputs:
+            buffered_output.flush(output)
+
+
+class PackageInstaller(object):
+    """Installs packages in a pipeline: downloads (network), verification and installation (CPU and disk)
+    and copying files to working directories (disk) are separate stages with their own workers,
+    so a package is downloaded while the previous one is verified or copied.
+
+    Queues between the stages are bounded, so if verification or copying is slower than downloads,
+    downloads wait and the number of packages in temporary directories stays limited.
+    """
+
+    # workers of the working directory stage, copying doesn't benefit from many threads on the same disk
+    WORKING_DIR_WORKERS = 2
+
+    def __init__(self, jobs: int = 4, rewrite_working_dir: bool = False, update_working_dirs: bool = True):
+        """
+        :param jobs: number of packages downloaded at the same time
+        :param rewrite_working_dir: rewrite working directories of the packages
+        :param update_working_dirs: copy the packages to working directories, otherwise they are only installed
+        """
+        validate_jobs(jobs)
+
+        self.rewrite_working_dir = rewrite_working_dir
+        self.update_working_dirs = update_working_dirs
+
+        stages = [
+            Stage('download', self._download, jobs),
+            Stage('install', self._install, min(jobs, os.cpu_count() or 1)),
+        ]
+        if update_working_dirs:
+            stages.append(Stage('working_dir', self._update_working_dirs, min(jobs, self.WORKING_DIR_WORKERS)))
+
+        self.pipeline = Pipeline(stages)
+
+    def run(self, installs: list):
+        """Installs the packages, packages with higher priorities are started first.
+
+        :return: generator of the finished installs in the input order
+        """
+        feed_order = sorted(range(len(installs)), key=lambda i: -installs[i].dependency.priority)
+        for install, error in self.pipeline.run(installs, feed_order):
+            if error:
+                raise error
+
+            yield install
+
+        logging.debug('Install stage utilization: %s' % format_utilization(self.pipeline.get_utilization()))
+
+    @staticmethod
+    def _download(install: PackageInstall) -> bool:
+        fetched = install.dependency.fetch(install.output)
+        if not fetched:
+            install.status = 'failed'
+            return False
+
+        install.status = 'cached' if fetched.package_info else 'downloaded'
+        install._fetched = fetched
+
+        return True
+
+    def _install(self, install: PackageInstall) -> bool:
+        fetched, install._fetched = install._fetched, None
+        package_info = install.dependency.install_fetched(fetched, install.output)
+        if not package_info:
+            install.status = 'failed'
+            return False
+
+        install.package_info = package_info
+        if install.status == 'downloaded':
+            install.downloaded_bytes = fetched.installed_size
+
+        return self.update_working_dirs and any(target.working_dir for target in install.targets)
+
+    def _update_working_dirs(self, install: PackageInstall):
+        for target, target_output in zip(install.targets, install.target_outputs):
+            if target.working_dir:
+                target.update_working_dir(install.package_info, self.rewrite_working_dir, target_output)
+
+
+def format_utilization(utilization: dict) -> str:
+    return ', '.join('%s %d%%' % (stage, round(value * 100)) for stage, value in utilization.items())
+
+
+def get_summary(installs: list, elapsed_time: float) -> dict:
+    """Returns numbers of packages by a status ("downloaded", "cached" or "failed"),
+    the number of downloaded bytes and the time of the installation.
+    """
+    summary = {status: 0 for status in ('downloaded', 'cached', 'failed')}
+    for install in installs:
+        summary[install.status] += 1
+
+    summary['downloaded_bytes'] = sum(install.downloaded_bytes for install in installs)
+    summary['elapsed_time'] = elapsed_time
+
+    return summary
+
+
+def write_summary(summary: dict, output: AbstractOutputWriter):
+    output.write('Packages: %d, downloaded: %d, already installed: %d, failed: %d'
+                 % (summary['downloaded'] + summary['cached'] + summary['failed'],
+                    summary['downloaded'], summary['cached'], summary['failed']))
+    output.write('Downloaded %s in %.1f s' % (format_size(summary['downloaded_bytes']), summary['elapsed_time']))
+
+
+def validate_jobs(jobs: int):
+    if jobs < 1:
+        raise ValueError('Number of jobs must be positive')
@@ -19,6 +19,11 @@ setup(
         'darty_drivers': [
             's3_files = darty.drivers.s3.files.driver:S3FilesDriver',
             's3_zip = darty.drivers.s3.zip.driver:S3ZipDriver',
+            'fs = darty.drivers.fs.driver:FsDriver',
+            'tiered = darty.drivers.tiered.driver:TieredDriver',
+        ],
+        'darty_async_drivers': [
+            's3_files = darty.drivers.s3.files.async_driver:AsyncS3FilesDriver',
         ],
     },
     install_requires=['boto3', 'schema'],
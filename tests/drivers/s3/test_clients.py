@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from darty.drivers.factory import DriverFactory
+from darty.drivers.s3 import clients
+from darty.drivers.s3.clients import ClientRegistry
+from darty.drivers.s3.files.driver import S3FilesDriver
+from darty.drivers.s3.zip.driver import S3ZipDriver
+from darty.package.repository import Repository
+
+
+class TestClients(unittest.TestCase):
+
+    def test_shared_clients(self):
+        registry = ClientRegistry(max_pool_connections=20)
+
+        client = registry.get_client('us-east-1')
+        self.assertIs(registry.get_client('us-east-1'), client)
+        self.assertIsNot(registry.get_client('eu-west-1'), client)
+        self.assertIsNot(registry.get_client('us-east-1', 'http://localhost:9000'), client)
+        self.assertEqual(client.meta.config.max_pool_connections, 20)
+
+        # clients are created again with the new pool size
+        registry.configure(max_pool_connections=5)
+        self.assertIsNot(registry.get_client('us-east-1'), client)
+        self.assertEqual(registry.get_client('us-east-1').meta.config.max_pool_connections, 5)
+
+        with self.assertRaises(ValueError):
+            registry.configure(max_pool_connections=0)
+
+        # drivers of different types and buckets use the same client
+        self.assertIs(S3FilesDriver('bucket1', {'region': 'us-east-1'})._client,
+                      S3ZipDriver('bucket2', {'region': 'us-east-1'})._client)
+
+    def test_shared_drivers(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = {'type': 'test', 'root': 'bucket1', 'parameters': {'local_dir': tmp_dir}}
+
+            driver = Repository(config).driver
+            self.assertIs(Repository(dict(config)).driver, driver)
+            self.assertIsNot(Repository({**config, 'root': 'bucket2'}).driver, driver)
+            self.assertIsNot(Repository({**config, 'parameters': {'local_dir': tmp_dir + '/other'}}).driver, driver)
+            self.assertIs(Repository(config).async_driver, Repository(config).async_driver)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'fork() is not supported')
+    def test_reset_after_fork(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+
+        client = clients.get_client({'region': 'us-east-1'})
+        driver = DriverFactory.get_driver('test', 'bucket1', {'local_dir': tmp_dir.name})
+
+        pid = os.fork()
+        if pid == 0:
+            # a child process must not use the clients and the drivers of the parent
+            ok = clients.get_client({'region': 'us-east-1'}) is not client \
+                and DriverFactory.get_driver('test', 'bucket1', {'local_dir': tmp_dir.name}) is not driver
+            os._exit(0 if ok else 1)
+
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+        # the parent process keeps them
+        self.assertIs(clients.get_client({'region': 'us-east-1'}), client)
+        self.assertIs(DriverFactory.get_driver('test', 'bucket1', {'local_dir': tmp_dir.name}), driver)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
 import unittest
 import os
+import tempfile
+from unittest import mock
 import boto3
+from darty import metrics
 from darty.drivers.abstract import VersionExistsError, PackageNotFoundError
 from darty.drivers.s3.files.driver import S3FilesDriver
 from darty.drivers.s3.zip.driver import S3ZipDriver
@@ -9,6 +12,10 @@ from darty.output_writer import NullOutputWriter
 from shutil import rmtree
 
 
+# moto doesn't decode streaming uploads with checksum trailers
+MOTO_ENVIRON = {'AWS_REQUEST_CHECKSUM_CALCULATION': 'when_required'}
+
+
 def list_dir_files(dir_path):
     for cur_dir, directories, filenames in os.walk(dir_path):
         rel_dir = os.path.relpath(cur_dir, dir_path)
@@ -17,6 +24,7 @@ def list_dir_files(dir_path):
 
 
 class TestDrivers(unittest.TestCase):
+    @mock.patch.dict(os.environ, MOTO_ENVIRON)
     @mock_s3
     def test_upload_and_download(self):
         for driver_class in [S3FilesDriver, S3ZipDriver]:
@@ -52,6 +60,93 @@ class TestDrivers(unittest.TestCase):
                 driver.download_package('group1', 'artifact_doesnt_exist', '1.0', downloaded_pkg_path,
                                         output=NullOutputWriter())
 
+    @mock.patch.dict(os.environ, MOTO_ENVIRON)
+    @mock_s3
+    def test_metrics(self):
+        bucket_name = 'test-bucket-metrics'
+        s3 = boto3.resource('s3')
+        s3.create_bucket(Bucket=bucket_name)
+
+        registry = metrics.get_registry()
+        registry.reset()
+
+        # upload and download a package
+        driver = S3FilesDriver(bucket_name, {})
+        pkg1_path = os.path.join(os.path.dirname(__file__), 'data', 'packages', 'package1')
+        driver.upload_package('group1', 'artifact1', '1.1', pkg1_path, output=NullOutputWriter())
+
+        downloaded_pkg_path = os.path.join(os.path.dirname(__file__), 'data', 'packages', 'downloaded')
+        rmtree(downloaded_pkg_path, ignore_errors=True)
+        os.makedirs(downloaded_pkg_path, exist_ok=True)
+        driver.download_package('group1', 'artifact1', '1.1', downloaded_pkg_path, output=NullOutputWriter())
+        rmtree(downloaded_pkg_path, ignore_errors=True)
+
+        # transferred files and bytes
+        files = list(list_dir_files(pkg1_path))
+        total_size = sum(os.path.getsize(os.path.join(pkg1_path, file_path)) for file_path in files)
+
+        for direction in ('upload', 'download'):
+            self.assertEqual(registry.get_counter('transfer_objects', direction=direction), len(files))
+            self.assertEqual(registry.get_counter('transfer_bytes', direction=direction), total_size)
+            self.assertEqual(registry.get_timer('transfer_seconds', direction=direction)[0], 1)
+
+        # requests to S3
+        # two existence checks and the listing of the package files
+        self.assertEqual(registry.get_counter('s3_requests', api='ListObjectsV2'), 3)
+        self.assertEqual(registry.get_counter('s3_requests', api='PutObject'), len(files))
+        self.assertEqual(registry.get_counter('s3_requests', api='GetObject'), len(files))
+        self.assertEqual(registry.get_timer('stage_seconds', stage='exists_check')[0], 2)
+
+    @mock.patch.dict(os.environ, MOTO_ENVIRON)
+    @mock_s3
+    def test_zip_compression(self):
+        bucket_name = 'test-bucket-compression'
+        s3 = boto3.resource('s3')
+        s3.create_bucket(Bucket=bucket_name)
+
+        # unknown compression method
+        with self.assertRaises(ValueError):
+            S3ZipDriver(bucket_name, {'compression': 'unknown'})
+
+        driver = S3ZipDriver(bucket_name, {'compression': 'deflated'})
+
+        # upload and download a compressed package
+        pkg1_path = os.path.join(os.path.dirname(__file__), 'data', 'packages', 'package1')
+        driver.upload_package('group1', 'artifact1', '1.1', pkg1_path, output=NullOutputWriter())
+
+        downloaded_pkg_path = os.path.join(os.path.dirname(__file__), 'data', 'packages', 'downloaded')
+        rmtree(downloaded_pkg_path, ignore_errors=True)
+        os.makedirs(downloaded_pkg_path, exist_ok=True)
+
+        driver.download_package('group1', 'artifact1', '1.1', downloaded_pkg_path, output=NullOutputWriter())
+        for file_path in list_dir_files(pkg1_path):
+            with open(os.path.join(pkg1_path, file_path), 'rb') as f1, \
+                    open(os.path.join(downloaded_pkg_path, file_path), 'rb') as f2:
+                self.assertEqual(f1.read(), f2.read())
+
+        rmtree(downloaded_pkg_path, ignore_errors=True)
+
+    @mock.patch.dict(os.environ, MOTO_ENVIRON)
+    @mock_s3
+    def test_zip_empty_dirs(self):
+        bucket_name = 'test-bucket-empty-dirs'
+        boto3.resource('s3').create_bucket(Bucket=bucket_name)
+        driver = S3ZipDriver(bucket_name, {})
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pkg_path = os.path.join(tmp_dir, 'package')
+            os.makedirs(os.path.join(pkg_path, 'data', 'empty_dir'))
+            with open(os.path.join(pkg_path, 'info.json'), 'w') as f:
+                f.write('{}')
+
+            driver.upload_package('group1', 'artifact1', '1.0', pkg_path, output=NullOutputWriter())
+
+            # empty directories are kept in the archive
+            downloaded_pkg_path = os.path.join(tmp_dir, 'downloaded')
+            os.makedirs(downloaded_pkg_path)
+            driver.download_package('group1', 'artifact1', '1.0', downloaded_pkg_path, output=NullOutputWriter())
+            self.assertTrue(os.path.isdir(os.path.join(downloaded_pkg_path, 'data', 'empty_dir')))
+
 
 if __name__ == '__main__':
     unittest.main()
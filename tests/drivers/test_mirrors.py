@@ -0,0 +1,146 @@
+import os
+import tempfile
+import time
+import unittest
+from darty import metrics
+from darty.drivers import mirrors
+from darty.drivers.abstract import AbstractDriver, DriverError, PackageNotFoundError
+from darty.drivers.mirrors import MirrorDriver
+from darty.output_writer import BufferedOutputWriter, NullOutputWriter
+from darty.package.integrity import PackageDigests
+from darty.package.repository import Repository
+from darty.utils import FileDigest
+
+
+class FakeDriver(AbstractDriver):
+    """Writes a package with one file after a delay or fails."""
+
+    def __init__(self, content: bytes, delay: float = 0, error: Exception = None):
+        super().__init__('fake')
+        self.content = content
+        self.delay = delay
+        self.error = error
+        self.uploads = 0
+
+    def download_verified_package(self, group: str, artifact: str, version: str,
+                                  tmp_artifact_dir: str, output, digests):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+
+        file_path = os.path.join(tmp_artifact_dir, 'data', 'file.txt')
+        os.makedirs(os.path.dirname(file_path))
+        with open(file_path, 'wb') as f:
+            f.write(self.content)
+
+        if digests is not None:
+            file_digest = FileDigest()
+            file_digest.update(self.content)
+            digests.add(file_path, file_digest)
+
+    def download_package(self, group: str, artifact: str, version: str, tmp_artifact_dir: str, output):
+        self.download_verified_package(group, artifact, version, tmp_artifact_dir, output, None)
+
+    def upload_package(self, group: str, artifact: str, version: str, tmp_artifact_dir: str, output):
+        self.uploads += 1
+
+
+class TestMirrors(unittest.TestCase):
+
+    def setUp(self):
+        mirrors.get_registry().reset()
+        metrics.get_registry().reset()
+
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.tmp_artifact_dir = os.path.join(self._tmp_dir.name, 'artifact1-1.0')
+        os.makedirs(self.tmp_artifact_dir)
+
+    def _download(self, driver: MirrorDriver, output=None) -> PackageDigests:
+        digests = PackageDigests()
+        driver.download_verified_package('group1', 'artifact1', '1.0', self.tmp_artifact_dir,
+                                         output or NullOutputWriter(), digests)
+        return digests
+
+    def _read_file(self) -> bytes:
+        with open(os.path.join(self.tmp_artifact_dir, 'data', 'file.txt'), 'rb') as f:
+            return f.read()
+
+    def test_failover(self):
+        primary = FakeDriver(b'primary', error=DriverError('Throttled'))
+        driver = MirrorDriver('primary', primary, [('mirror', FakeDriver(b'mirror'))])
+
+        output = BufferedOutputWriter()
+        digests = self._download(driver, output)
+        self.assertEqual(self._read_file(), b'mirror')
+        self.assertIn('[!] Mirror "primary" failed (Throttled), trying "mirror"', output.messages)
+
+        # digests are moved with the files, attempt directories are removed
+        self.assertIsNotNone(digests.get(os.path.join(self.tmp_artifact_dir, 'data', 'file.txt')))
+        self.assertEqual(os.listdir(self._tmp_dir.name), ['artifact1-1.0'])
+
+        # the failed mirror is not used until its cooldown ends
+        self.assertEqual(driver.get_ranked_mirrors(), ['mirror', 'primary'])
+
+        # uploads go only to the primary repository
+        driver.upload_package('group1', 'artifact1', '1.0', self.tmp_artifact_dir, NullOutputWriter())
+        self.assertEqual(primary.uploads, 1)
+
+    def test_errors(self):
+        driver = MirrorDriver('primary', FakeDriver(b'', error=PackageNotFoundError()),
+                              [('mirror', FakeDriver(b'', error=PackageNotFoundError()))])
+        with self.assertRaises(PackageNotFoundError):
+            self._download(driver)
+
+        # a missing package in one mirror doesn't hide an error of another one
+        driver = MirrorDriver('primary2', FakeDriver(b'', error=PackageNotFoundError()),
+                              [('mirror2', FakeDriver(b'', error=DriverError('No access')))])
+        with self.assertRaisesRegex(DriverError, 'No access'):
+            self._download(driver)
+
+    def test_hedging(self):
+        driver = MirrorDriver('primary', FakeDriver(b'primary', delay=1), [('mirror', FakeDriver(b'mirror'))])
+        driver.DEFAULT_HEDGE_DELAY = 0.1
+
+        output = BufferedOutputWriter()
+        self._download(driver, output)
+        self.assertEqual(self._read_file(), b'mirror')
+        self.assertIn('[!] Mirror "primary" is slow, downloading from "mirror" too', output.messages)
+        self.assertEqual(metrics.get_registry().get_counter('mirror_hedges'), 1)
+
+        # the slow download removes its files when it finishes
+        time.sleep(1.5)
+        self.assertEqual(os.listdir(self._tmp_dir.name), ['artifact1-1.0'])
+        self.assertEqual(metrics.get_registry().get_counter('mirror_downloads', mirror='primary', result='lost'), 1)
+
+    def test_ranking(self):
+        registry = mirrors.get_registry()
+        registry.record_latency('slow', 0.01)
+        registry.record_download('slow', 10 * 1024 ** 2, 1)
+        registry.record_latency('fast', 0.05)
+        registry.record_download('fast', 100 * 1024 ** 2, 1)
+        registry.record_latency('new', 0.02)
+
+        self.assertEqual(registry.rank(['slow', 'fast', 'new']), ['new', 'fast', 'slow'])
+
+        registry.record_failure('new')
+        self.assertEqual(registry.rank(['slow', 'fast', 'new']), ['fast', 'slow', 'new'])
+
+    def test_repository_config(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repository = Repository({
+                'type': 'test', 'root': 'bucket1', 'parameters': {'local_dir': tmp_dir},
+                'mirrors': [{'type': 'test', 'root': 'bucket2', 'parameters': {'local_dir': tmp_dir}}],
+            })
+            self.assertIsInstance(repository.driver, MirrorDriver)
+
+        with self.assertRaises(ValueError):
+            Repository({'type': 'test', 'root': 'bucket1', 'mirrors': [{'type': 'test'}]})
+
+        with self.assertRaises(ValueError):
+            Repository({'type': 'test', 'root': 'bucket1', 'mirrors': [{'type': 'test', 'root': 'bucket2',
+                                                                        'peerCache': 'http://localhost'}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import tempfile
+import unittest
+from collections import namedtuple
+from unittest import mock
+from darty.drivers.abstract import PackageNotFoundError, VersionExistsError
+from darty.drivers.factory import DriverFactory
+from darty.drivers.fs.driver import FsDriver
+from darty.drivers.tiered.driver import TieredDriver
+from darty.output_writer import BufferedOutputWriter, NullOutputWriter
+from darty.package.integrity import PackageDigests, verify_package
+from darty.utils import DirHash
+
+
+# entry points of the drivers, the package is not installed when the tests run
+EntryPoint = namedtuple('EntryPoint', ['name', 'load'])
+ENTRY_POINTS = [EntryPoint('fs', lambda: FsDriver), EntryPoint('tiered', lambda: TieredDriver)]
+
+
+class TestTieredDriver(unittest.TestCase):
+
+    FILES = {
+        'file1.txt': b'content of the first file',
+        'subdir1/file2.txt': b'content of the second file',
+    }
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        tmp_dir = self._tmp_dir.name
+
+        patcher = mock.patch.object(DriverFactory, '_get_entry_points', return_value=ENTRY_POINTS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # a package built the way "Dependency.publish()" builds it
+        self.package_dir = os.path.join(tmp_dir, 'package')
+        dir_hash = DirHash()
+        for file_path, content in sorted(self.FILES.items()):
+            abs_path = os.path.join(self.package_dir, 'data', file_path)
+            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+            with open(abs_path, 'wb') as f:
+                f.write(content)
+
+            dir_hash.add_file(file_path)
+            dir_hash.update(content)
+
+        with open(os.path.join(self.package_dir, 'info.json'), 'w') as f:
+            f.write('{"files": ["file1.txt", "subdir1/file2.txt"], "hash": "%s"}' % dir_hash.hexdigest())
+
+        self.cache_dir = os.path.join(tmp_dir, 'cache')
+        self.storage_dir = os.path.join(tmp_dir, 'storage')
+        self.driver = TieredDriver('cluster', {'tiers': [
+            {'type': 'fs', 'root': 'packages', 'parameters': {'path': self.cache_dir}},
+            {'type': 'fs', 'root': 'packages', 'parameters': {'path': self.storage_dir}},
+        ]})
+
+    def _download(self, driver, version: str = '1.0', output=None):
+        tmp_artifact_dir = tempfile.mkdtemp(dir=self._tmp_dir.name)
+        digests = PackageDigests()
+        driver.download_verified_package('group1', 'artifact1', version, tmp_artifact_dir,
+                                         output or NullOutputWriter(), digests)
+        verify_package(tmp_artifact_dir, digests)
+
+        return tmp_artifact_dir
+
+    def _get_artifact_dir(self, base_dir: str, version: str = '1.0'):
+        return os.path.join(base_dir, 'packages', 'group1', '.artifacts', 'artifact1-' + version)
+
+    def test_fs_driver(self):
+        driver = FsDriver('packages', {'path': self.storage_dir})
+
+        with self.assertRaises(PackageNotFoundError):
+            self._download(driver)
+
+        driver.upload_package('group1', 'artifact1', '1.0', self.package_dir, NullOutputWriter())
+        with self.assertRaises(VersionExistsError):
+            driver.upload_package('group1', 'artifact1', '1.0', self.package_dir, NullOutputWriter())
+
+        # temporary directories are renamed
+        self.assertEqual(os.listdir(os.path.dirname(self._get_artifact_dir(self.storage_dir))), ['artifact1-1.0'])
+
+        tmp_artifact_dir = self._download(driver)
+        with open(os.path.join(tmp_artifact_dir, 'data', 'subdir1', 'file2.txt'), 'rb') as f:
+            self.assertEqual(f.read(), self.FILES['subdir1/file2.txt'])
+
+        with self.assertRaises(ValueError):
+            FsDriver('packages', {})
+
+    def test_read_through(self):
+        # the package is only in the authoritative tier
+        DriverFactory.get_driver('fs', 'packages', {'path': self.storage_dir}) \
+            .upload_package('group1', 'artifact1', '1.0', self.package_dir, NullOutputWriter())
+
+        output = BufferedOutputWriter()
+        self._download(self.driver, output=output)
+        self.assertIn('[+] The package was copied to the tier "fs:packages"', output.messages)
+
+        # the next download comes from the cache tier
+        self.assertTrue(os.path.isfile(os.path.join(self._get_artifact_dir(self.cache_dir), 'info.json')))
+        with mock.patch.object(FsDriver, '_copy_files', side_effect=FsDriver._copy_files, autospec=True) as copy:
+            self._download(self.driver)
+            self.assertEqual(copy.call_args_list[0][0][0]._root_dir, os.path.join(self.cache_dir, 'packages'))
+            self.assertEqual(copy.call_count, 1)
+
+        with self.assertRaises(PackageNotFoundError):
+            self._download(self.driver, '2.0')
+
+    def test_unavailable_tier(self):
+        DriverFactory.get_driver('fs', 'packages', {'path': self.storage_dir}) \
+            .upload_package('group1', 'artifact1', '1.0', self.package_dir, NullOutputWriter())
+
+        # the cache tier can't be written
+        with open(self.cache_dir, 'w'):
+            pass
+
+        output = BufferedOutputWriter()
+        self._download(self.driver, output=output)
+        self.assertTrue(any(message.startswith('[!] The package is not copied') for message in output.messages))
+
+    def test_write_through(self):
+        self.driver.upload_package('group1', 'artifact1', '1.0', self.package_dir, NullOutputWriter())
+
+        for base_dir in (self.cache_dir, self.storage_dir):
+            self.assertTrue(os.path.isfile(os.path.join(self._get_artifact_dir(base_dir), 'info.json')))
+
+        with self.assertRaises(VersionExistsError):
+            self.driver.upload_package('group1', 'artifact1', '1.0', self.package_dir, NullOutputWriter())
+
+        with self.assertRaises(ValueError):
+            TieredDriver('cluster', {'tiers': [{'type': 'fs', 'root': 'packages'}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
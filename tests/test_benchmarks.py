@@ -0,0 +1,38 @@
+import unittest
+import os
+import tempfile
+from benchmarks.generator import generate_package
+from benchmarks.suite import run_benchmarks
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_generator(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # packages are reproducible
+            files1 = generate_package(os.path.join(tmp_dir, 'package1'), 'mixed', scale=0.01)
+            files2 = generate_package(os.path.join(tmp_dir, 'package2'), 'mixed', scale=0.01)
+            self.assertEqual(files1, files2)
+
+            for file_path, size in files1:
+                with open(os.path.join(tmp_dir, 'package1', file_path), 'rb') as f1, \
+                        open(os.path.join(tmp_dir, 'package2', file_path), 'rb') as f2:
+                    content = f1.read()
+                    self.assertEqual(len(content), size)
+                    self.assertEqual(content, f2.read())
+
+            with self.assertRaises(ValueError):
+                generate_package(tmp_dir, 'unknown')
+
+    def test_suite(self):
+        results = run_benchmarks(['dir_hash', 'download'], ['tiny_files'], scale=0.001, repeat=2, log=lambda _: None)
+
+        self.assertEqual([(result['name'], result['profile']) for result in results['results']],
+                         [('dir_hash', 'tiny_files'), ('download', 'tiny_files')])
+        for result in results['results']:
+            self.assertEqual(len(result['times']), 2)
+            self.assertEqual(result['files'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,29 +1,39 @@
 import unittest
 import os
+import tempfile
 from darty.package.dependency import Dependency
 from darty.package.repository import Repository
 from darty.utils import file_exists, dir_exists, list_dir_files
-from shutil import rmtree
+from shutil import rmtree, copytree
 
 
 class TestDependency(unittest.TestCase):
 
-    PROJECT_DIR = os.path.join(os.path.dirname(__file__), 'data', 'test_project_dir')
-    PACKAGES_DIR = os.path.join(os.path.dirname(__file__), 'data', 'test_packages_dir')
+    DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 
     REPOSITORY_TYPE = 'test'
     REPOSITORY_ROOT = 'test_root'
-    REPOSITORY_DIR = os.path.join(os.path.dirname(__file__), 'data', 'test_repository')
 
-    @classmethod
-    def _get_dependency(cls, config: dict):
+    def setUp(self):
+        # the tests install and publish packages, so they work with a copy of the fixtures
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+
+        self.project_dir = os.path.join(self._tmp_dir.name, 'test_project_dir')
+        self.packages_dir = os.path.join(self._tmp_dir.name, 'test_packages_dir')
+        self.repository_dir = os.path.join(self._tmp_dir.name, 'test_repository')
+
+        for dir_path in (self.project_dir, self.packages_dir):
+            copytree(os.path.join(self.DATA_DIR, os.path.basename(dir_path)), dir_path, symlinks=True)
+
+    def _get_dependency(self, config: dict):
         return Dependency(config, Repository({
-            'type': cls.REPOSITORY_TYPE,
-            'root': cls.REPOSITORY_ROOT,
+            'type': self.REPOSITORY_TYPE,
+            'root': self.REPOSITORY_ROOT,
             'parameters': {
-                'local_dir': cls.REPOSITORY_DIR
+                'local_dir': self.repository_dir
             }
-        }), cls.PACKAGES_DIR, cls.PROJECT_DIR)
+        }), self.packages_dir, self.project_dir)
 
     def test_get_path(self):
         dep_installed = self._get_dependency({
@@ -64,9 +74,9 @@ class TestDependency(unittest.TestCase):
             ]
         })
 
-        dep_repository_dir = os.path.join(self.PACKAGES_DIR, self.REPOSITORY_TYPE, self.REPOSITORY_ROOT)
+        dep_repository_dir = os.path.join(self.packages_dir, self.REPOSITORY_TYPE, self.REPOSITORY_ROOT)
         dependency_data_dir = os.path.join(dep_repository_dir, 'group1', 'subgroup1', '.artifacts', 'artifact1-1.0', 'data')
-        working_dir = os.path.join(self.PROJECT_DIR, 'working_dir1')
+        working_dir = os.path.join(self.project_dir, 'working_dir1')
 
         """ TEST PATHS TO A PACKAGE DIRECTORY """
 
@@ -134,6 +144,42 @@ class TestDependency(unittest.TestCase):
         with self.assertRaises(ValueError):
             dep_files.get_path('file_not_in_list.txt')
 
+    def test_get_paths(self):
+        dependencies = [self._get_dependency({
+            'group': 'group1.subgroup1',
+            'artifact': artifact,
+            'version': '1.0',
+            **extra_config,
+        }) for artifact, extra_config in [
+            ('artifact1', {}),
+            ('artifact1-not-installed', {}),
+            ('artifact1', {'workingDir': 'working_dir1'}),
+            ('artifact1', {'workingDir': 'working_dir_doesnt_exist'}),
+            ('artifact1', {'workingDir': 'working_dir1', 'files': ['file1.txt', 'file2.txt', 'subdir1/file1.txt']}),
+        ]]
+
+        file_paths = [None, 'file1.txt', 'file2.txt', 'subdir1/file1.txt', 'subdir1\\file1.txt',
+                      'file_doesnt_exist.txt', 'file_not_in_list.txt', None, 'file2.txt']
+
+        # the same results as "get_path()" returns for every file
+        for dependency in dependencies:
+            expected = []
+            for file_path in file_paths:
+                try:
+                    expected.append(dependency.get_path(file_path))
+                except (ValueError, FileNotFoundError) as e:
+                    expected.append((type(e), str(e)))
+
+            paths = dependency.get_paths(file_paths, return_exceptions=True)
+            paths = [(type(path), str(path)) if isinstance(path, Exception) else path for path in paths]
+            self.assertEqual(paths, expected)
+
+        # the first error is raised
+        with self.assertRaises(FileNotFoundError):
+            dependencies[0].get_paths(['file1.txt', 'file_doesnt_exist.txt'])
+
+        self.assertEqual(dependencies[0].get_paths([]), [])
+
     def test_publish_and_update(self):
         dep_without_working_dir = self._get_dependency({
             'group': 'group1.subgroup1',
@@ -156,18 +202,18 @@ class TestDependency(unittest.TestCase):
         })
 
         # dependency paths
-        group_dir = os.path.join(self.PACKAGES_DIR, self.REPOSITORY_TYPE, self.REPOSITORY_ROOT, 'group1', 'subgroup1')
+        group_dir = os.path.join(self.packages_dir, self.REPOSITORY_TYPE, self.REPOSITORY_ROOT, 'group1', 'subgroup1')
 
         installation_dir = os.path.join(group_dir, '.artifacts', 'artifact1-1.1')
         installation_data_dir = os.path.join(installation_dir, 'data')
         local_installation_dir = os.path.join(group_dir, '.local-artifacts', 'artifact1-1.1')
         local_installation_data_dir = os.path.join(local_installation_dir, 'data')
 
-        working_dir = os.path.join(self.PROJECT_DIR, 'working_dir1')
-        working_dir_update = os.path.join(self.PROJECT_DIR, 'working_dir_update')
+        working_dir = os.path.join(self.project_dir, 'working_dir1')
+        working_dir_update = os.path.join(self.project_dir, 'working_dir_update')
 
         # path to local repository (using TestDriver)
-        rep_root_dir = os.path.join(self.REPOSITORY_DIR, self.REPOSITORY_ROOT)
+        rep_root_dir = os.path.join(self.repository_dir, self.REPOSITORY_ROOT)
         rep_artifact_dir = os.path.join(rep_root_dir, 'group1', 'subgroup1', 'artifact1-1.1')
 
         """ PREPARE THE TEST """
@@ -294,7 +340,7 @@ class TestDependency(unittest.TestCase):
             ]
         })
 
-        group_dir = os.path.join(self.PACKAGES_DIR, self.REPOSITORY_TYPE, self.REPOSITORY_ROOT, 'group1', 'subgroup1')
+        group_dir = os.path.join(self.packages_dir, self.REPOSITORY_TYPE, self.REPOSITORY_ROOT, 'group1', 'subgroup1')
         local_installation_dir = os.path.join(group_dir, '.local-artifacts', 'artifact1-1.1')
 
         # clear locally installed package
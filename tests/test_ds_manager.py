@@ -1,5 +1,8 @@
 import unittest
 import os
+import shutil
+import tempfile
+from unittest import mock
 from darty.dependency_manager import DependencyManager
 from schema import SchemaError
 
@@ -49,6 +52,90 @@ class TestDependencyManager(unittest.TestCase):
 
         self.assertIsNone(dm.get_dependency_by_name('group1', 'wrong-artifact'))
 
+    def test_get_paths(self):
+        dm = DependencyManager(get_config_path('darty.yaml'))
+
+        def get_paths(dependency, file_paths, return_exceptions=False):
+            return ['%s/%s' % (dependency.artifact, file_path) for file_path in file_paths]
+
+        # files are grouped by packages, the paths are returned in the same order
+        with mock.patch('darty.package.dependency.Dependency.get_paths', autospec=True,
+                        side_effect=get_paths) as get_paths_mock:
+            paths = dm.get_paths([('group1', 'artifact1', 'file1.txt'), ('group1', 'artifact2', None),
+                                  ('group1', 'artifact1', 'file2.txt')])
+            self.assertEqual(paths, ['artifact1/file1.txt', 'artifact2/None', 'artifact1/file2.txt'])
+            self.assertEqual(get_paths_mock.call_count, 2)
+
+            paths = dm.get_paths([('group1', 'wrong-artifact', 'file1.txt'), ('group1', 'artifact1', 'file1.txt')],
+                                 return_exceptions=True)
+            self.assertIsInstance(paths[0], ValueError)
+            self.assertEqual(paths[1], 'artifact1/file1.txt')
+
+            with self.assertRaises(ValueError):
+                dm.get_paths([('group1', 'wrong-artifact', 'file1.txt')])
+
+    def test_search_dependencies(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_path = os.path.join(tmp_dir, 'darty.yaml')
+            with open(config_path, 'w') as f:
+                f.write('\n'.join([
+                    'repositories:',
+                    '  default: {type: test, root: test}',
+                    '  other: {type: test, root: other}',
+                    'dependencies:',
+                    '  - {group: group1.subgroup1, artifact: artifact1, version: 1.0}',
+                    '  - {group: group10, artifact: artifact1, version: 1.0}',
+                    '  - {group: group1, artifact: artifact2, version: 1.0, repository: other}',
+                    '  - {group: group2, artifact: artifact3, version: 1.0}',
+                ]))
+
+            dm = DependencyManager(config_path)
+
+            def get_names(dependencies):
+                return [dependency.group + ':' + dependency.artifact for dependency in dependencies]
+
+            self.assertEqual(get_names(dm.search_dependency_by_artifact('artifact1')),
+                             ['group1.subgroup1:artifact1', 'group10:artifact1'])
+            self.assertEqual(get_names(dm.search_dependencies_by_group('group1')),
+                             ['group1.subgroup1:artifact1', 'group1:artifact2'])
+            self.assertEqual(get_names(dm.search_dependencies_by_group('group1.subgroup1')),
+                             ['group1.subgroup1:artifact1'])
+            self.assertEqual(get_names(dm.search_dependencies_by_group('group')), [])
+            self.assertEqual(get_names(dm.get_dependencies_by_repository('other')), ['group1:artifact2'])
+            self.assertEqual(get_names(dm.dependencies.values()),
+                             ['group1.subgroup1:artifact1', 'group10:artifact1', 'group1:artifact2',
+                              'group2:artifact3'])
+
+            # the same object is returned every time
+            self.assertIs(dm.get_dependency_by_name('group2', 'artifact3'),
+                          dm.get_dependency_by_name('group2', 'artifact3'))
+
+    def test_config_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_path = os.path.join(tmp_dir, 'darty.yaml')
+            shutil.copyfile(get_config_path('darty.yaml'), config_path)
+
+            with mock.patch.object(DependencyManager, '_load_config',
+                                   side_effect=DependencyManager._load_config) as load_config:
+                # the config file is parsed only once
+                DependencyManager(config_path)
+                DependencyManager(config_path)
+                self.assertEqual(load_config.call_count, 1)
+
+                # the config file was changed
+                with open(config_path, 'a') as f:
+                    f.write('\n  - group: group2\n    artifact: artifact1\n    version: 1.0\n')
+
+                dm = DependencyManager(config_path)
+                self.assertEqual(load_config.call_count, 2)
+                self.assertIsNotNone(dm.get_dependency_by_name('group2', 'artifact1'))
+
+            # validation errors are raised every time
+            shutil.copyfile(get_config_path('broken_dependency.yaml'), config_path)
+            for _ in range(2):
+                with self.assertRaises(SchemaError):
+                    DependencyManager(config_path)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+import asyncio
+import os
+import tempfile
+import shutil
+from unittest import mock
+from darty.dependency_manager import DependencyManager
+from darty.drivers.async_adapter import AsyncDriverAdapter
+
+
+class TestDependencyManagerAsync(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        tmp_dir = self._tmp_dir.name
+
+        self.packages_dir = os.path.join(tmp_dir, 'packages')
+        self.config_path = os.path.join(tmp_dir, 'project', 'darty.yaml')
+
+        # project with two dependencies
+        os.makedirs(os.path.join(tmp_dir, 'project', 'data', 'artifact1', 'subdir1'))
+        for file_path in ('data/artifact1/file1.txt', 'data/artifact1/subdir1/file1.txt'):
+            with open(os.path.join(tmp_dir, 'project', file_path), 'w') as f:
+                f.write(file_path)
+
+        with open(self.config_path, 'w') as f:
+            f.write('\n'.join([
+                'repositories:',
+                '  default:',
+                '    type: test',
+                '    root: test',
+                '    parameters:',
+                '      local_dir: %s' % os.path.join(tmp_dir, 'repository'),
+                'dependencies:',
+                '  - {group: group1, artifact: artifact1, version: 1.0, workingDir: data/artifact1}',
+                '  - {group: group1, artifact: artifact2, version: 1.0}',
+            ]))
+
+        settings_patcher = mock.patch('darty.dependency_manager.get_settings',
+                                      return_value={'packages_dir': self.packages_dir})
+        settings_patcher.start()
+        self.addCleanup(settings_patcher.stop)
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_download(self):
+        # publish the first package
+        dm = DependencyManager(self.config_path)
+        dependency = dm.get_dependency_by_name('group1', 'artifact1')
+        self.assertTrue(dependency.publish())
+        self.assertIsInstance(dependency.repository.async_driver, AsyncDriverAdapter)
+
+        # remove the working directory and the installed package
+        shutil.rmtree(os.path.join(self._tmp_dir.name, 'project', 'data'))
+        dm = DependencyManager(self.config_path)
+        dependency = dm.get_dependency_by_name('group1', 'artifact1')
+        os.rename(dependency.get_artifact_dir(), dependency.get_artifact_dir() + '-removed')
+        dependency.invalidate_cache()
+
+        # the second package doesn't exist in the repository
+        package_infos = asyncio.run(dm.download_all())
+        self.assertEqual(package_infos[0].artifact, 'artifact1')
+        self.assertIsNone(package_infos[1])
+
+        # get a path to the installed package
+        path = asyncio.run(dm.get_path_async('group1', 'artifact1', 'subdir1/file1.txt'))
+        self.assertEqual(path, os.path.join(dependency.get_artifact_data_dir(), 'subdir1', 'file1.txt'))
+
+        # concurrent calls
+        async def ensure_all():
+            return await asyncio.gather(*[dm.ensure('group1', 'artifact1') for _ in range(5)])
+
+        self.assertEqual(len(asyncio.run(ensure_all())), 5)
+
+        # packages which can't be downloaded
+        with self.assertRaises(ValueError):
+            asyncio.run(dm.ensure('group1', 'artifact2'))
+
+        with self.assertRaises(ValueError):
+            asyncio.run(dm.ensure('group1', 'artifact3'))
+
+    def test_cancel(self):
+        dm = DependencyManager(self.config_path)
+        dependency = dm.get_dependency_by_name('group1', 'artifact1')
+        dependency.publish()
+        os.rename(dependency.get_artifact_dir(), dependency.get_artifact_dir() + '-removed')
+        dependency.invalidate_cache()
+
+        async def download_package(*args, **kwargs):
+            await asyncio.sleep(10)
+
+        async def cancel_download():
+            task = asyncio.ensure_future(dm.download_all())
+            await asyncio.sleep(0.1)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        with mock.patch.object(AsyncDriverAdapter, 'download_verified_package', side_effect=download_package):
+            asyncio.run(cancel_download())
+
+        # the temporary directory was removed
+        self.assertFalse(os.path.exists(dependency.get_artifact_dir(dependency.ENV_TMP)))
+        self.assertIsNone(dependency.get_package_info())
+
+    def test_concurrency(self):
+        with open(self.config_path, 'w') as f:
+            f.write('\n'.join(['repositories:', '  default: {type: test, root: test}', 'dependencies:']
+                              + ['  - {group: group1, artifact: artifact%d, version: 1.0}' % i for i in range(8)]))
+
+        dm = DependencyManager(self.config_path)
+        running = []
+        max_running = []
+
+        async def download_async(*args, **kwargs):
+            running.append(1)
+            max_running.append(len(running))
+            await asyncio.sleep(0.1)
+            running.pop()
+
+        # the "concurrency" argument is not limited by the manager's semaphore
+        with mock.patch('darty.package.dependency.Dependency.download_async', side_effect=download_async):
+            asyncio.run(dm.download_all(concurrency=8))
+
+        self.assertEqual(max(max_running), 8)
+
+    def test_cancel_shared_download(self):
+        dm = DependencyManager(self.config_path)
+        finished = []
+
+        async def download_async(*args, **kwargs):
+            await asyncio.sleep(0.2)
+            finished.append(1)
+
+        async def cancel_download_all():
+            ensure_task = asyncio.ensure_future(dm._download_async(dm.get_dependency_by_name('group1', 'artifact1')))
+            task = asyncio.ensure_future(dm.download_all())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+            # the download another task waits for is not cancelled
+            await ensure_task
+
+        with mock.patch('darty.package.dependency.Dependency.download_async', side_effect=download_async):
+            asyncio.run(cancel_download_all())
+
+        self.assertEqual(len(finished), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
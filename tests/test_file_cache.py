@@ -0,0 +1,52 @@
+import unittest
+import os
+import tempfile
+from darty.helpers.file_cache import FileCache
+
+
+class TestFileCache(unittest.TestCase):
+
+    def test_get(self):
+        cache = FileCache()
+        calls = []
+
+        def loader(path):
+            calls.append(path)
+            with open(path) as f:
+                return f.read()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'file.txt')
+
+            # the file doesn't exist
+            with self.assertRaises(FileNotFoundError):
+                cache.get(file_path, loader)
+
+            with open(file_path, 'w') as f:
+                f.write('value1')
+
+            # the value is loaded only once
+            self.assertEqual(cache.get(file_path, loader), 'value1')
+            self.assertEqual(cache.get(file_path, loader), 'value1')
+            self.assertEqual(len(calls), 1)
+
+            # the file was changed
+            with open(file_path, 'w') as f:
+                f.write('value22')
+
+            self.assertEqual(cache.get(file_path, loader), 'value22')
+            self.assertEqual(len(calls), 2)
+
+            # explicit invalidation
+            cache.invalidate(file_path)
+            self.assertEqual(cache.get(file_path, loader), 'value22')
+            self.assertEqual(len(calls), 3)
+
+            # the file was removed
+            os.remove(file_path)
+            with self.assertRaises(FileNotFoundError):
+                cache.get(file_path, loader)
+
+
+if __name__ == '__main__':
+    unittest.main()
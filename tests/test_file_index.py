@@ -0,0 +1,119 @@
+import unittest
+import os
+import json
+import tempfile
+from darty.package.dependency import Dependency
+from darty.package.file_index import ListFileIndex, SqliteFileIndex, create_sqlite_index, convert_info_json
+from darty.package.package_info import PackageInfo
+from darty.package.repository import Repository
+
+
+class TestFileIndex(unittest.TestCase):
+
+    INFO = {
+        'group': 'group1',
+        'artifact': 'artifact1',
+        'version': '1.0',
+        'files': [
+            'file2.txt',
+            'dir1/file1.txt',
+            'dir1/file2.csv',
+            'dir1/subdir1/file1.txt',
+            'dir10/file1.txt',
+            'dir2/file1.txt',
+        ],
+        'hash': 'abc',
+    }
+
+    def _check_index(self, index):
+        # lookups
+        self.assertIn('dir1/file1.txt', index)
+        self.assertNotIn('dir1/file3.txt', index)
+        self.assertNotIn('dir1', index)
+
+        # iteration follows the manifest order
+        self.assertEqual(list(index), self.INFO['files'])
+        self.assertEqual(len(index), len(self.INFO['files']))
+
+        # prefix listing
+        self.assertEqual(list(index.iter_prefix('dir1/')),
+                         ['dir1/file1.txt', 'dir1/file2.csv', 'dir1/subdir1/file1.txt'])
+        self.assertEqual(list(index.iter_prefix('file2.txt')), ['file2.txt'])
+        self.assertEqual(list(index.iter_prefix('dir3')), [])
+        self.assertEqual(list(index.iter_prefix('')), sorted(self.INFO['files']))
+
+        # glob listing
+        self.assertEqual(list(index.glob('dir1/*.txt')), ['dir1/file1.txt', 'dir1/subdir1/file1.txt'])
+        self.assertEqual(list(index.glob('dir?/file1.txt')), ['dir1/file1.txt', 'dir2/file1.txt'])
+        self.assertEqual(list(index.glob('*.csv')), ['dir1/file2.csv'])
+
+    def test_list_index(self):
+        self._check_index(ListFileIndex(self.INFO['files']))
+
+    def test_sqlite_index(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'manifest.db')
+            create_sqlite_index(db_path, self.INFO)
+
+            index = SqliteFileIndex(db_path)
+            self._check_index(index)
+            self.assertEqual(index.get_meta(), {'group': 'group1', 'artifact': 'artifact1', 'version': '1.0',
+                                                'hash': 'abc'})
+            index.close()
+
+    def test_package_info(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            create_sqlite_index(os.path.join(tmp_dir, 'manifest.db'), self.INFO)
+
+            package_info = PackageInfo.from_artifact_dir(tmp_dir, False)
+            self.assertIsInstance(package_info.files, SqliteFileIndex)
+            self.assertEqual(package_info.artifact, 'artifact1')
+            self.assertTrue(package_info.has_file('dir2/file1.txt'))
+            self.assertFalse(package_info.has_file('dir2/file2.txt'))
+            package_info.files.close()
+
+    @unittest.skipUnless(os.path.isdir('/proc/self/fd'), 'Open file descriptors are listed only on Linux')
+    def test_open_connections(self):
+        def count_open_indexes():
+            num_open = 0
+            for fd in os.listdir('/proc/self/fd'):
+                try:
+                    num_open += os.readlink(os.path.join('/proc/self/fd', fd)).endswith('manifest.db')
+                except OSError:
+                    pass
+
+            return num_open
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repository = Repository({'type': 'test', 'root': 'test'})
+            dependencies = []
+            for i in range(100):
+                dependency = Dependency({'group': 'group1', 'artifact': 'artifact%d' % i, 'version': '1.0'},
+                                        repository, tmp_dir, tmp_dir)
+                artifact_dir = dependency.get_artifact_dir()
+                os.makedirs(os.path.join(artifact_dir, 'data'))
+                with open(os.path.join(artifact_dir, 'data', 'file1.txt'), 'w') as f:
+                    f.write('content')
+
+                with open(os.path.join(artifact_dir, 'info.json'), 'w') as f:
+                    json.dump({**self.INFO, 'artifact': 'artifact%d' % i, 'files': ['file1.txt']}, f)
+
+                convert_info_json(artifact_dir)
+                dependencies.append(dependency)
+
+            # cached package infos of all the packages are queried,
+            # but only a limited number of databases stay open
+            for _ in range(2):
+                for dependency in dependencies:
+                    self.assertTrue(dependency.get_path('file1.txt').endswith('file1.txt'))
+
+            self.assertLessEqual(count_open_indexes(), 16)
+
+            for dependency in dependencies:
+                dependency.get_package_info().files.close()
+
+            self.assertEqual(count_open_indexes(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+import boto3
+from moto import mock_s3
+from darty.drivers.s3.files.driver import S3FilesDriver
+from darty.drivers.s3.zip.driver import S3ZipDriver
+from darty.output_writer import NullOutputWriter, BufferedOutputWriter
+from darty.package.dependency import Dependency
+from darty.package.repository import Repository
+from darty.package.integrity import IntegrityError, PackageDigests, verify_package
+from darty.utils import get_dir_hash, FileDigest, RangeDigest
+
+
+# moto doesn't decode streaming uploads with checksum trailers
+MOTO_ENVIRON = {'AWS_REQUEST_CHECKSUM_CALCULATION': 'when_required'}
+
+
+class TestIntegrity(unittest.TestCase):
+
+    FILES = {
+        'file1.txt': b'content of the first file',
+        'dir1/file2.bin': os.urandom(10000),
+    }
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.artifact_dir = os.path.join(self._tmp_dir.name, 'artifact')
+        data_dir = os.path.join(self.artifact_dir, 'data')
+
+        for file_path, content in self.FILES.items():
+            os.makedirs(os.path.dirname(os.path.join(data_dir, file_path)), exist_ok=True)
+            with open(os.path.join(data_dir, file_path), 'wb') as f:
+                f.write(content)
+
+        with open(os.path.join(self.artifact_dir, 'info.json'), 'w') as f:
+            json.dump({'group': 'group1', 'artifact': 'artifact1', 'version': '1.0',
+                       'files': ['file1.txt', 'dir1/file2.bin'], 'hash': get_dir_hash(data_dir)}, f)
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _write_file(self, file_path: str, content: bytes):
+        with open(os.path.join(self.artifact_dir, 'data', file_path), 'wb') as f:
+            f.write(content)
+
+    def test_verify_package(self):
+        file_stats = verify_package(self.artifact_dir)
+        self.assertEqual(set(file_stats), {'file1.txt', 'dir1/file2.bin'})
+        self.assertEqual(file_stats['dir1/file2.bin'][0], 10000)
+
+        # corrupted file
+        self._write_file('file1.txt', b'content of the first file!')
+        with self.assertRaises(IntegrityError):
+            verify_package(self.artifact_dir)
+
+        # missing file
+        os.remove(os.path.join(self.artifact_dir, 'data', 'file1.txt'))
+        with self.assertRaises(IntegrityError):
+            verify_package(self.artifact_dir)
+
+        # unexpected file
+        self._write_file('file1.txt', self.FILES['file1.txt'])
+        self._write_file('file3.txt', b'')
+        with self.assertRaises(IntegrityError):
+            verify_package(self.artifact_dir)
+
+    def test_recorded_digests(self):
+        digests = PackageDigests()
+        for file_path, content in self.FILES.items():
+            file_digest = FileDigest()
+            file_digest.update(content)
+            digests.add(os.path.join(self.artifact_dir, 'data', file_path), file_digest)
+
+        # files are not read again
+        with mock.patch.object(FileDigest, 'from_file', side_effect=AssertionError):
+            verify_package(self.artifact_dir, digests)
+
+        # the file on disk doesn't have all the downloaded bytes
+        self._write_file('file1.txt', b'content')
+        with self.assertRaises(IntegrityError):
+            verify_package(self.artifact_dir, digests)
+
+    @mock.patch.dict(os.environ, MOTO_ENVIRON)
+    @mock_s3
+    def test_s3_download(self):
+        s3 = boto3.resource('s3')
+
+        for driver_class in (S3FilesDriver, S3ZipDriver):
+            bucket_name = 'test-bucket-%s' % driver_class.__name__.lower()
+            s3.create_bucket(Bucket=bucket_name)
+
+            driver = driver_class(bucket_name, {})
+            driver.upload_package('group1', 'artifact1', '1.0', self.artifact_dir, NullOutputWriter())
+
+            # digests of all the files are recorded during the download
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                digests = PackageDigests()
+                driver.download_verified_package('group1', 'artifact1', '1.0', tmp_dir, NullOutputWriter(), digests)
+                self.assertEqual(len(digests), len(self.FILES) + 1)
+
+                with mock.patch.object(FileDigest, 'from_file', side_effect=AssertionError):
+                    verify_package(tmp_dir, digests)
+
+        # corrupt a file in the repository
+        s3.Object('test-bucket-s3filesdriver', 'group1/.artifacts/artifact1-1.0/data/file1.txt').put(Body=b'corrupted')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            digests = PackageDigests()
+            S3FilesDriver('test-bucket-s3filesdriver', {}).download_verified_package(
+                'group1', 'artifact1', '1.0', tmp_dir, NullOutputWriter(), digests)
+
+            with self.assertRaises(IntegrityError):
+                verify_package(tmp_dir, digests)
+
+    def test_range_digest(self):
+        content = os.urandom(100000)
+        file_path = os.path.join(self._tmp_dir.name, 'file.bin')
+        with open(file_path, 'wb') as f:
+            f.write(content)
+
+        # unaligned ranges in random order, some of them are written twice (retries)
+        bounds = [0] + sorted(random.sample(range(1, len(content)), 40)) + [len(content)]
+        ranges = list(zip(bounds, bounds[1:]))
+        ranges += random.sample(ranges, 5)
+        random.shuffle(ranges)
+
+        range_digest = RangeDigest()
+        for start, end in ranges:
+            range_digest.update(start, content[start:end])
+
+        # the file is not read again
+        with open(file_path, 'wb') as f:
+            f.write(bytes(len(content)))
+
+        expected = FileDigest()
+        expected.update(content)
+        file_digest = range_digest.get_file_digest(file_path)
+        self.assertEqual((file_digest.size, file_digest.hexdigest()), (expected.size, expected.hexdigest()))
+
+        # blocks which were not written on the way are read from the file
+        range_digest = RangeDigest()
+        range_digest.update(0, bytes(5000))
+        self.assertEqual(range_digest.get_file_digest(file_path).hexdigest(),
+                         FileDigest.from_file(file_path).hexdigest())
+
+    @mock.patch.dict(os.environ, MOTO_ENVIRON)
+    @mock_s3
+    def test_s3_multipart_download(self):
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket='test-bucket')
+
+        # the file is larger than the multipart threshold of the transfer manager
+        content = os.urandom(9 * 1024 * 1024 + 1000)
+        s3.put_object(Bucket='test-bucket', Key='group1/.artifacts/artifact1-1.0/data/file.bin', Body=content)
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                mock.patch.object(FileDigest, 'from_file', side_effect=AssertionError):
+            digests = PackageDigests()
+            S3FilesDriver('test-bucket', {}).download_files('group1', 'artifact1', '1.0', ['file.bin'], tmp_dir,
+                                                            NullOutputWriter(), digests)
+
+            expected = FileDigest()
+            expected.update(content)
+            self.assertEqual(digests.get(os.path.join(tmp_dir, 'data', 'file.bin')).hexdigest(), expected.hexdigest())
+
+    def test_corrupted_package_is_not_installed(self):
+        dependency = Dependency({'group': 'group1', 'artifact': 'artifact1', 'version': '1.0', 'workingDir': 'data'},
+                                Repository({'type': 'test', 'root': 'test', 'parameters': {
+                                    'local_dir': os.path.join(self._tmp_dir.name, 'repository')}}),
+                                os.path.join(self._tmp_dir.name, 'packages'), self.artifact_dir)
+        self.assertTrue(dependency.publish())
+
+        # digests of the files are stored in the index
+        connection = sqlite3.connect(os.path.join(dependency.get_artifact_dir(), 'manifest.db'))
+        rows = connection.execute('SELECT path, size, digest FROM files ORDER BY id').fetchall()
+        connection.close()
+        self.assertEqual([row[:2] for row in rows], [('file1.txt', 25), ('dir1/file2.bin', 10000)])
+        self.assertEqual(rows[0][2], FileDigest.from_file(os.path.join(self.artifact_dir, 'data', 'file1.txt'))
+                         .hexdigest())
+
+        # corrupt the package in the repository and download it again
+        repository_file_path = os.path.join(self._tmp_dir.name, 'repository', 'test', 'group1', 'artifact1-1.0',
+                                            'data', 'file1.txt')
+        with open(repository_file_path, 'wb') as f:
+            f.write(b'corrupted')
+
+        os.rename(dependency.get_artifact_dir(), dependency.get_artifact_dir() + '-removed')
+        dependency.invalidate_cache()
+
+        output = BufferedOutputWriter()
+        self.assertIsNone(dependency.download(output))
+        self.assertIn('Integrity check failed', '\n'.join(output.messages))
+        self.assertFalse(os.path.exists(dependency.get_artifact_dir(Dependency.ENV_TMP)))
+        self.assertIsNone(dependency.get_package_info())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import hashlib
+import unittest
+import os
+import tempfile
+from darty.helpers.inventory import FileInventory, sort_paths
+from darty.utils import get_dir_hash
+
+
+class TestFileInventory(unittest.TestCase):
+
+    FILES = [
+        'b.txt',
+        'a/file2.txt',
+        'a/b/file1.txt',
+        'a/file1.txt',
+        'c/file1.txt',
+        'a.txt',
+        'a/a/file1.txt',
+    ]
+
+    # "os.walk()" order with sorted directory listings
+    EXPECTED_FILES = [
+        'a.txt',
+        'b.txt',
+        'a/file1.txt',
+        'a/file2.txt',
+        'a/a/file1.txt',
+        'a/b/file1.txt',
+        'c/file1.txt',
+    ]
+
+    def test_scan(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i, file_path in enumerate(self.FILES):
+                abs_path = os.path.join(tmp_dir, file_path)
+                os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+                with open(abs_path, 'w') as f:
+                    f.write('x' * i)
+
+            expected_files = [os.path.join(*file_path.split('/')) for file_path in self.EXPECTED_FILES]
+
+            for workers in (1, 4):
+                inventory = FileInventory.scan(tmp_dir, workers=workers)
+                self.assertEqual(inventory.paths, expected_files)
+                self.assertEqual(inventory.total_size, sum(range(len(self.FILES))))
+
+            # stat results are cached in the inventory
+            entry = list(inventory)[0]
+            self.assertEqual(entry.size, os.path.getsize(inventory.get_abs_path(entry)))
+
+    def test_sort_paths(self):
+        self.assertEqual(sort_paths(self.FILES), self.EXPECTED_FILES)
+
+
+class TestDirHash(unittest.TestCase):
+
+    def _write_files(self, root: str, files: dict):
+        for file_path, content in files.items():
+            abs_path = os.path.join(root, file_path)
+            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+            with open(abs_path, 'wb') as f:
+                f.write(content)
+
+    def test_baseline_hash(self):
+        # hashes of published packages must never change
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self._write_files(tmp_dir, {'file1.txt': b'content of the first file',
+                                        'dir1/file2.bin': bytes(range(256)) * 40})
+            self.assertEqual(get_dir_hash(tmp_dir), 'bc44f42f3ad5fdebb2ce0ca2f5690cae7f35055e')
+
+    def test_walk_order(self):
+        def get_baseline_hash(path: str) -> str:
+            sha_hash = hashlib.sha1()
+            for cur_dir, _, filenames in os.walk(path):
+                for filename in filenames:
+                    file_path = os.path.join(cur_dir, filename)
+                    sha_hash.update(os.path.relpath(file_path, path).replace('\\', '/').encode('utf-8'))
+                    with open(file_path, 'rb') as f:
+                        for buf in iter(lambda: f.read(4096), b''):
+                            sha_hash.update(hashlib.sha1(buf).hexdigest().encode('utf-8'))
+
+            return sha_hash.hexdigest()
+
+        # files are hashed in the order of the file system, not in the sorted order
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self._write_files(tmp_dir, {name: name.encode() * 3000 for name in ('zeta', 'alpha', 'mid', 'b', 'a',
+                                                                                'sub/q')})
+            self.assertEqual(get_dir_hash(tmp_dir), get_baseline_hash(tmp_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from darty.dependency_manager import DependencyManager
+
+
+class TestIterFiles(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        tmp_dir = self._tmp_dir.name
+
+        self.files = ['file%d.txt' % i for i in range(10)] + ['subdir1/file%d.csv' % i for i in range(10)]
+        for file_path in self.files:
+            abs_path = os.path.join(tmp_dir, 'project', 'data', file_path)
+            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+            with open(abs_path, 'w') as f:
+                f.write(file_path)
+
+        self.config_path = os.path.join(tmp_dir, 'project', 'darty.yaml')
+        with open(self.config_path, 'w') as f:
+            f.write('\n'.join([
+                'repositories:',
+                '  default:',
+                '    type: test',
+                '    root: test',
+                '    parameters:',
+                '      local_dir: %s' % os.path.join(tmp_dir, 'repository'),
+                'dependencies:',
+                '  - {group: group1, artifact: artifact1, version: 1.0, workingDir: data}',
+            ]))
+
+        settings_patcher = mock.patch('darty.dependency_manager.get_settings',
+                                      return_value={'packages_dir': os.path.join(tmp_dir, 'packages')})
+        settings_patcher.start()
+        self.addCleanup(settings_patcher.stop)
+
+        self.dm = DependencyManager(self.config_path)
+        self.assertTrue(self.dm.get_dependency_by_name('group1', 'artifact1').publish())
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_manifest_order(self):
+        files = list(self.dm.iter_files('group1', 'artifact1', prefetch=3))
+        self.assertEqual(files, [(file_path, file_path.encode('utf-8')) for file_path in self.files])
+
+        # glob pattern
+        self.assertEqual([file_path for file_path, _ in self.dm.iter_files('group1', 'artifact1', '*.csv')],
+                         self.files[10:])
+
+    def test_shuffle(self):
+        files1 = [file_path for file_path, _ in self.dm.iter_files('group1', 'artifact1', shuffle=True, seed=1)]
+        files2 = [file_path for file_path, _ in self.dm.iter_files('group1', 'artifact1', shuffle=True, seed=1)]
+        self.assertEqual(files1, files2)
+        self.assertNotEqual(files1, self.files)
+        self.assertEqual(sorted(files1), sorted(self.files))
+
+    def test_open_files(self):
+        opened = []
+        for file_path, f in self.dm.iter_files('group1', 'artifact1', prefetch=4, open_files=True):
+            with f:
+                self.assertEqual(f.read(), file_path.encode('utf-8'))
+
+            opened.append(f)
+            if len(opened) == 5:
+                break
+
+        self.assertTrue(all(f.closed for f in opened))
+
+    def test_not_installed_package(self):
+        # the package is downloaded first
+        dependency = self.dm.get_dependency_by_name('group1', 'artifact1')
+        shutil.rmtree(dependency.get_artifact_dir())
+        dependency.invalidate_cache()
+
+        self.assertEqual(len(list(self.dm.iter_files('group1', 'artifact1'))), len(self.files))
+        self.assertTrue(dependency.get_package_info())
+
+        with self.assertRaises(ValueError):
+            self.dm.iter_files('group1', 'artifact2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import json
+import os
+import tempfile
+import threading
+import time
+from darty.metrics import MetricsRegistry, TransferProgress
+from darty.output_writer import AbstractOutputWriter
+
+
+class ProgressOutputWriter(AbstractOutputWriter):
+    def __init__(self):
+        super().__init__()
+        self.progress = []
+
+    def write(self, message):
+        pass
+
+    def write_progress(self, message):
+        self.progress.append(message)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_registry(self):
+        registry = MetricsRegistry()
+        registry.inc('transfer_bytes', 100, direction='download')
+        registry.inc('transfer_bytes', 300, direction='download')
+        registry.inc('s3_requests', api='GetObject')
+        registry.observe('transfer_seconds', 2.0, direction='download')
+
+        with self.assertRaises(RuntimeError):
+            with registry.timer('stage_seconds', stage='unpack'):
+                raise RuntimeError()
+
+        self.assertEqual(registry.get_counter('transfer_bytes', direction='download'), 400)
+        self.assertEqual(registry.get_counter('transfer_bytes', direction='upload'), 0)
+        self.assertEqual(registry.get_timer('stage_seconds', stage='unpack')[0], 1)
+        self.assertEqual(registry.get_throughput(), {'download': 200.0})
+
+        # Prometheus text format
+        lines = registry.to_prometheus().splitlines()
+        self.assertIn('# TYPE darty_transfer_bytes_total counter', lines)
+        self.assertIn('darty_transfer_bytes_total{direction="download"} 400', lines)
+        self.assertIn('darty_s3_requests_total{api="GetObject"} 1', lines)
+        self.assertIn('darty_transfer_seconds_sum{direction="download"} 2.0', lines)
+        self.assertIn('darty_transfer_seconds_count{direction="download"} 1', lines)
+        self.assertIn('darty_transfer_throughput_bytes_per_second{direction="download"} 200.0', lines)
+
+        # JSON file
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            metrics_path = os.path.join(tmp_dir, 'metrics.json')
+            registry.write(metrics_path)
+
+            with open(metrics_path) as f:
+                data = json.load(f)
+
+            self.assertEqual(data['counters']['transfer_bytes'], [{'labels': {'direction': 'download'}, 'value': 400}])
+            self.assertEqual(data['timers']['transfer_seconds'],
+                             [{'labels': {'direction': 'download'}, 'count': 1, 'sum': 2.0}])
+
+            with self.assertRaises(ValueError):
+                registry.write(metrics_path, 'xml')
+
+        registry.reset()
+        self.assertEqual(registry.to_dict(), {'counters': {}, 'timers': {}, 'throughput': {}})
+
+    def test_concurrent_transfers(self):
+        registry = MetricsRegistry()
+        barrier = threading.Barrier(4)
+
+        def transfer():
+            barrier.wait()
+            with registry.timer('transfer_seconds', direction='download'):
+                time.sleep(0.1)
+                registry.inc('transfer_bytes', 1000, direction='download')
+
+        threads = [threading.Thread(target=transfer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # the transfers overlap, so the speed is computed from the wall-clock time, not from the sum of durations
+        count, seconds = registry.get_timer('transfer_seconds', direction='download')
+        wall_time = registry.get_wall_time('transfer_seconds', direction='download')
+        self.assertEqual(count, 4)
+        self.assertLess(wall_time, seconds / 2)
+        self.assertAlmostEqual(registry.get_throughput()['download'], 4000 / wall_time)
+
+        # a nested transfer is counted once
+        registry.reset()
+        with registry.timer('transfer_seconds', direction='upload'):
+            with registry.timer('transfer_seconds', direction='upload'):
+                time.sleep(0.01)
+
+        self.assertLess(registry.get_wall_time('transfer_seconds', direction='upload'),
+                        registry.get_timer('transfer_seconds', direction='upload')[1])
+
+    def test_progress(self):
+        registry = MetricsRegistry()
+        output = ProgressOutputWriter()
+
+        with TransferProgress('download', output, total_bytes=2048, registry=registry) as progress:
+            progress.REFRESH_INTERVAL = 0
+            progress.update(1024)
+            progress.add_object()
+
+        self.assertEqual(registry.get_counter('transfer_bytes', direction='download'), 1024)
+        self.assertEqual(registry.get_counter('transfer_objects', direction='download'), 1)
+        self.assertEqual(len(output.progress), 1)
+        self.assertTrue(output.progress[0].startswith('Download: 1.0 KB / 2.0 KB, '))
+        self.assertIn('ETA', output.progress[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import threading
+import time
+import unittest
+from darty import metrics
+from darty.helpers.pipeline import Pipeline, Stage
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        metrics.get_registry().reset()
+
+    def test_order_and_errors(self):
+        def first(item: int):
+            # later items finish sooner
+            time.sleep(0.01 * (5 - item))
+            if item == 2:
+                raise ValueError('Item 2')
+
+            return item != 3
+
+        processed = []
+        pipeline = Pipeline([Stage('first', first, 3), Stage('second', processed.append)])
+        results = list(pipeline.run(list(range(5)), feed_order=[4, 3, 2, 1, 0]))
+
+        # items are returned in the input order, a failed or a stopped item doesn't go to the next stage
+        self.assertEqual([item for item, _ in results], [0, 1, 2, 3, 4])
+        self.assertEqual([str(error) if error else None for _, error in results], [None, None, 'Item 2', None, None])
+        self.assertEqual(sorted(processed), [0, 1, 4])
+
+    def test_back_pressure(self):
+        lock = threading.Lock()
+        in_progress = set()
+        max_in_progress = [0]
+
+        def download(item: int):
+            with lock:
+                in_progress.add(item)
+                max_in_progress[0] = max(max_in_progress[0], len(in_progress))
+
+        def install(item: int):
+            time.sleep(0.02)
+            with lock:
+                in_progress.remove(item)
+
+        pipeline = Pipeline([Stage('download', download, 4), Stage('install', install)], queue_size=1)
+        for _, error in pipeline.run(list(range(20))):
+            self.assertIsNone(error)
+
+        # a slow stage limits the number of items waiting for it:
+        # one item is installed, one is queued, every download worker waits with one item
+        self.assertLessEqual(max_in_progress[0], 1 + 1 + 4)
+
+        utilization = pipeline.get_utilization()
+        self.assertGreater(utilization['install'], 0.5)
+        self.assertLess(utilization['download'], 0.5)
+
+        self.assertEqual(metrics.get_registry().get_timer('pipeline_busy_seconds', stage='install')[0], 20)
+
+    def test_early_close(self):
+        processed = []
+
+        def process(item: int):
+            time.sleep(0.01)
+            processed.append(item)
+
+        pipeline = Pipeline([Stage('first', process)])
+
+        results = pipeline.run(list(range(100)))
+        next(results)
+        results.close()
+
+        # the remaining items are skipped
+        self.assertLess(len(processed), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
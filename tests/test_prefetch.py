@@ -0,0 +1,83 @@
+import unittest
+import os
+import shutil
+import tempfile
+from argparse import Namespace
+from unittest import mock
+from darty.commands.prefetch import PrefetchCommand
+from darty.dependency_manager import DependencyManager
+from darty.output_writer import BufferedOutputWriter
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        tmp_dir = self._tmp_dir.name
+        self.packages_dir = os.path.join(tmp_dir, 'packages')
+
+        settings_patcher = mock.patch('darty.dependency_manager.get_settings',
+                                      return_value={'packages_dir': self.packages_dir})
+        settings_patcher.start()
+        self.addCleanup(settings_patcher.stop)
+
+        # two projects share the first package
+        for project, artifacts in (('project1', ['artifact1', 'artifact2']), ('project2', ['artifact1'])):
+            project_dir = os.path.join(tmp_dir, project)
+            os.makedirs(project_dir)
+
+            with open(os.path.join(project_dir, 'darty.yaml'), 'w') as f:
+                f.write('\n'.join([
+                    'repositories:',
+                    '  default:',
+                    '    type: test',
+                    '    root: test',
+                    '    parameters:',
+                    '      local_dir: %s' % os.path.join(tmp_dir, 'repository'),
+                    'dependencies:',
+                ] + ['  - {group: group1, artifact: %s, version: 1.0, workingDir: data/%s}' % (artifact, artifact)
+                     for artifact in artifacts]))
+
+        # publish the packages
+        for artifact in ('artifact1', 'artifact2'):
+            working_dir = os.path.join(tmp_dir, 'project1', 'data', artifact)
+            os.makedirs(working_dir)
+            with open(os.path.join(working_dir, 'file1.txt'), 'w') as f:
+                f.write(artifact)
+
+        manager = DependencyManager(os.path.join(tmp_dir, 'project1', 'darty.yaml'))
+        for dependency in manager.dependencies.values():
+            self.assertTrue(dependency.publish())
+
+        # remove the working directories and the first installed package
+        shutil.rmtree(os.path.join(tmp_dir, 'project1', 'data'))
+        dependency = manager.get_dependency_by_name('group1', 'artifact1')
+        shutil.rmtree(dependency.get_artifact_dir())
+        dependency.invalidate_cache()
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_prefetch(self):
+        output = BufferedOutputWriter()
+        args = Namespace(config=[os.path.join(self._tmp_dir.name, 'project*', 'darty.yaml')], py_package=[],
+                         jobs=2, profile='default')
+
+        self.assertTrue(PrefetchCommand().run(args, {}, output))
+
+        # the shared package is downloaded only once
+        self.assertEqual(output.messages[-2], 'Packages: 2, downloaded: 1, already installed: 1, failed: 0')
+        self.assertEqual(sum(1 for message in output.messages if 'successfully downloaded' in message), 1)
+
+        # working directories are not created
+        self.assertFalse(os.path.exists(os.path.join(self._tmp_dir.name, 'project1', 'data')))
+        self.assertFalse(os.path.exists(os.path.join(self._tmp_dir.name, 'project2', 'data')))
+
+        # nothing matches the pattern
+        args.config = [os.path.join(self._tmp_dir.name, 'unknown*', 'darty.yaml')]
+        with self.assertRaises(ValueError):
+            PrefetchCommand().run(args, {}, output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+from darty import metrics, scheduler
+from darty.helpers.aio import run_sync
+from darty.package.dependency import Dependency
+from darty.scheduler import TokenBucket, TransferScheduler
+
+
+class TestScheduler(unittest.TestCase):
+
+    def tearDown(self):
+        scheduler.configure()
+
+    def test_token_bucket(self):
+        with mock.patch('darty.scheduler.time.sleep') as sleep:
+            bucket = TokenBucket(100000, capacity=10000)
+
+            # a burst within the capacity
+            self.assertEqual(bucket.consume(10000), 0)
+            sleep.assert_not_called()
+
+            # the bucket goes into debt
+            self.assertAlmostEqual(bucket.consume(20000), 0.2, delta=0.05)
+            self.assertAlmostEqual(bucket.consume(10000), 0.3, delta=0.05)
+            self.assertEqual(sleep.call_count, 2)
+
+    def test_connections_by_priority(self):
+        transfer_scheduler = TransferScheduler(max_connections=1)
+        started = []
+
+        def transfer(priority: int):
+            with transfer_scheduler.connection(priority):
+                started.append(priority)
+
+        threads = []
+        with transfer_scheduler.connection():
+            for priority in (0, 5, 1, 5):
+                threads.append(threading.Thread(target=transfer, args=(priority,)))
+                threads[-1].start()
+
+                # wait until the transfer is queued
+                while len(transfer_scheduler._waiters) < len(threads):
+                    time.sleep(0.001)
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(started, [5, 5, 1, 0])
+
+    def test_queue_wait_metrics(self):
+        registry = metrics.get_registry()
+        count, _ = registry.get_timer('queue_wait_seconds', resource='connection', direction='download')
+
+        with scheduler.connection(direction='download'):
+            pass
+
+        self.assertEqual(registry.get_timer('queue_wait_seconds', resource='connection', direction='download')[0],
+                         count + 1)
+
+    def test_priority_context(self):
+        async def get_priority():
+            with scheduler.priority(3):
+                return await run_sync(scheduler._priority.get)
+
+        # the priority is visible to the drivers running in executors
+        self.assertEqual(asyncio.run(get_priority()), 3)
+        self.assertEqual(scheduler._priority.get(), 0)
+
+        with self.assertRaises(ValueError):
+            Dependency.validate_config({'group': 'group1', 'artifact': 'artifact1', 'version': '1.0',
+                                        'priority': 'high'})
+
+    def test_configure_from_settings(self):
+        transfer_scheduler = scheduler.get_scheduler()
+        settings = {'max_bandwidth': '10M', 'max_connections': '4'}
+
+        scheduler.configure_from_settings(settings)
+        self.assertEqual(transfer_scheduler.max_bandwidth, 10 * 1024 ** 2)
+        self.assertEqual(transfer_scheduler.max_connections, 4)
+
+        # arguments override the settings
+        scheduler.configure_from_settings(settings, '1M', 2)
+        self.assertEqual(transfer_scheduler.max_bandwidth, 1024 ** 2)
+        self.assertEqual(transfer_scheduler.max_connections, 2)
+
+        scheduler.configure_from_settings({'max_bandwidth': '', 'max_connections': ''})
+        self.assertIsNone(transfer_scheduler.max_bandwidth)
+        self.assertIsNone(transfer_scheduler.max_connections)
+
+        with self.assertRaises(ValueError):
+            scheduler.configure_from_settings({'max_connections': 'many'})
+
+        with self.assertRaises(ValueError):
+            scheduler.configure_from_settings({}, max_connections=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
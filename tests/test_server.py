@@ -0,0 +1,233 @@
+import http.client
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from darty import metrics
+from darty.dependency_manager import DependencyManager
+from darty.drivers.peer import PeerCacheDriver, get_url_path
+from darty.helpers.singleflight import SingleFlight
+from darty.output_writer import BufferedOutputWriter
+from darty.package.dependency import Dependency
+from darty.package.repository import Repository
+from darty.server import PackageServer, get_repositories, parse_range
+
+
+class TestServer(unittest.TestCase):
+
+    FILES = {
+        'file1.txt': b'content of the first file',
+        'subdir1/file2.bin': os.urandom(100000),
+    }
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        tmp_dir = self._tmp_dir.name
+
+        self.repository_dir = os.path.join(tmp_dir, 'repository')
+        self.server_packages_dir = os.path.join(tmp_dir, 'server-packages')
+        config_path = os.path.join(tmp_dir, 'project', 'darty.yaml')
+
+        for file_path, content in self.FILES.items():
+            abs_path = os.path.join(tmp_dir, 'project', 'data', file_path)
+            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+            with open(abs_path, 'wb') as f:
+                f.write(content)
+
+        with open(config_path, 'w') as f:
+            f.write('\n'.join([
+                'repositories:',
+                '  default:',
+                '    type: test',
+                '    root: test',
+                '    parameters:',
+                '      local_dir: %s' % self.repository_dir,
+                'dependencies:',
+                '  - {group: group1, artifact: artifact1, version: 1.0, workingDir: data}',
+            ]))
+
+        # publish the package to the repository using a separate packages directory
+        with mock.patch('darty.dependency_manager.get_settings',
+                        return_value={'packages_dir': os.path.join(tmp_dir, 'publisher-packages')}):
+            manager = DependencyManager(config_path)
+            self.assertTrue(manager.get_dependency_by_name('group1', 'artifact1').publish())
+
+        self.server = PackageServer(('127.0.0.1', 0), self.server_packages_dir,
+                                    repositories=get_repositories([manager]))
+        self.url = 'http://127.0.0.1:%d' % self.server.server_port
+
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def _create_dependency(self, peer_cache: str, local_dir: str) -> Dependency:
+        repository = Repository({'type': 'test', 'root': 'test', 'parameters': {'local_dir': local_dir},
+                                 'peerCache': peer_cache})
+        packages_dir = os.path.join(self._tmp_dir.name, 'client-packages')
+
+        return Dependency({'group': 'group1', 'artifact': 'artifact1', 'version': '1.0'}, repository, packages_dir,
+                          self._tmp_dir.name)
+
+    def _request(self, method: str, file_path: str, headers: dict = None, url_path: str = None):
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port, timeout=30)
+        self.addCleanup(connection.close)
+
+        if url_path is None:
+            url_path = get_url_path('test', 'test', 'group1', 'artifact1', '1.0', file_path)
+
+        connection.request(method, url_path, headers=headers or {})
+        response = connection.getresponse()
+
+        return response, response.read()
+
+    def test_download_from_peer(self):
+        # the client's repository is empty, so the package can only come from the peer
+        dependency = self._create_dependency(self.url, os.path.join(self._tmp_dir.name, 'empty'))
+        driver = dependency.repository.driver
+        self.assertIsInstance(driver, PeerCacheDriver)
+
+        with mock.patch.object(driver._driver, 'download_verified_package') as upstream:
+            output = BufferedOutputWriter()
+            self.assertIsNotNone(dependency.download(output), output.messages)
+            upstream.assert_not_called()
+
+        for file_path, content in self.FILES.items():
+            with open(dependency.get_path(file_path), 'rb') as f:
+                self.assertEqual(f.read(), content)
+
+        # the server fetched the package from the repository
+        self.assertTrue(os.path.isfile(os.path.join(self.server_packages_dir, 'test', 'test', 'group1',
+                                                    '.artifacts', 'artifact1-1.0', 'info.json')))
+
+    def test_fallback_to_repository(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+        dependency = self._create_dependency(self.url, self.repository_dir)
+
+        output = BufferedOutputWriter()
+        self.assertIsNotNone(dependency.download(output))
+        self.assertTrue(any('[!] Peer cache is not available' in message for message in output.messages))
+
+        with open(dependency.get_path('subdir1/file2.bin'), 'rb') as f:
+            self.assertEqual(f.read(), self.FILES['subdir1/file2.bin'])
+
+    def test_ranges(self):
+        content = self.FILES['subdir1/file2.bin']
+
+        response, body = self._request('GET', 'data/subdir1/file2.bin')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Accept-Ranges'), 'bytes')
+        self.assertEqual(body, content)
+
+        response, body = self._request('GET', 'data/subdir1/file2.bin', {'Range': 'bytes=100-199'})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(response.getheader('Content-Range'), 'bytes 100-199/%d' % len(content))
+        self.assertEqual(body, content[100:200])
+
+        response, body = self._request('GET', 'data/subdir1/file2.bin', {'Range': 'bytes=-10'})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, content[-10:])
+
+        response, body = self._request('GET', 'data/subdir1/file2.bin', {'Range': 'bytes=%d-' % len(content)})
+        self.assertEqual(response.status, 416)
+        self.assertEqual(response.getheader('Content-Range'), 'bytes */%d' % len(content))
+
+        response, body = self._request('HEAD', 'data/file1.txt')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Content-Length'), str(len(self.FILES['file1.txt'])))
+        self.assertEqual(body, b'')
+
+    def test_invalid_paths(self):
+        response, _ = self._request('GET', 'data/missing.txt')
+        self.assertEqual(response.status, 404)
+
+        for url_path in ['/v1/test/test/group1/artifact1/1.0/data/%2E%2E/info.json',
+                         '/v1/test/test/group1/artifact1/1.0/data/..%2F..%2F..%2Fetc%2Fpasswd',
+                         '/v1/test/test/group1/artifact1/1.0/manifest.db',
+                         '/v1/test/%2E%2E/group1/artifact1/1.0/info.json',
+                         '/test/test/group1/artifact1/1.0/info.json']:
+            response, _ = self._request('GET', None, url_path=url_path)
+            self.assertEqual(response.status, 400, url_path)
+
+        # the package doesn't exist in the repository
+        response, _ = self._request('GET', None, url_path=get_url_path('test', 'test', 'group1', 'artifact1',
+                                                                         '2.0', 'info.json'))
+        self.assertEqual(response.status, 502)
+
+    @mock.patch('darty.server.logging')
+    def test_failed_download(self, _):
+        metrics.get_registry().reset()
+
+        # the repository fails with an unexpected error
+        with mock.patch.object(Repository, 'driver', new_callable=mock.PropertyMock,
+                               side_effect=RuntimeError('Driver error')):
+            response, _ = self._request('GET', 'info.json')
+
+        self.assertEqual(response.status, 502)
+
+        # the request is counted by the handler thread after the response is sent
+        deadline = time.time() + 5
+        while not metrics.get_registry().get_counter('server_requests', status='502') and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(metrics.get_registry().get_counter('server_requests', status='502'), 1)
+
+        # the server keeps working
+        response, body = self._request('GET', 'data/file1.txt')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.FILES['file1.txt'])
+
+    def test_parse_range(self):
+        self.assertIsNone(parse_range(None, 100))
+        self.assertIsNone(parse_range('bytes=0-9,20-29', 100))
+        self.assertIsNone(parse_range('items=0-9', 100))
+        self.assertEqual(parse_range('bytes=10-', 100), (10, 99))
+        self.assertEqual(parse_range('bytes=90-200', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-200', 100), (0, 99))
+
+        with self.assertRaises(ValueError):
+            parse_range('bytes=100-', 100)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls(self):
+        single_flight = SingleFlight()
+        calls = []
+        results = []
+
+        def func():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'result'
+
+        threads = [threading.Thread(target=lambda: results.append(single_flight.do('key', func)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('result', False)] + [('result', True)] * 4)
+
+        # results are not cached
+        self.assertEqual(single_flight.do('key', func), ('result', False))
+        self.assertEqual(len(calls), 2)
+
+    def test_exceptions(self):
+        single_flight = SingleFlight()
+
+        with self.assertRaises(ZeroDivisionError):
+            single_flight.do('key', lambda: 1 / 0)
+
+        self.assertEqual(single_flight.do('key', lambda: 1), (1, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+import subprocess
+import sys
+import os
+import tempfile
+from shutil import copytree
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_lazy_imports(self):
+        # heavy modules must not be imported just to resolve paths to installed packages
+        code = '\n'.join([
+            'import sys',
+            'from darty.dependency_manager import DependencyManager',
+            'from darty.package.dependency import Dependency',
+            'from darty.package.repository import Repository',
+            'dependency = Dependency({"group": "group1.subgroup1", "artifact": "artifact1", "version": "1.0"},',
+            '                        Repository({"type": "test", "root": "test_root"}), sys.argv[1], sys.argv[1])',
+            'dependency.get_path("file1.txt")',
+            'print(",".join(sorted(sys.modules)))',
+        ])
+
+        # resolving a path records the access time, so the fixtures are copied
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            packages_dir = os.path.join(tmp_dir, 'test_packages_dir')
+            copytree(os.path.join(os.path.dirname(__file__), 'data', 'test_packages_dir'), packages_dir)
+
+            res = subprocess.run([sys.executable, '-c', code, packages_dir], stdout=subprocess.PIPE,
+                                 universal_newlines=True, check=True)
+
+        imported_modules = res.stdout.strip().split(',')
+        for module in ('boto3', 'botocore', 'pkg_resources', 'schema', 'yaml'):
+            self.assertNotIn(module, imported_modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
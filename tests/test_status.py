@@ -0,0 +1,119 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+from darty.dependency_manager import DependencyManager
+from darty.helpers.stat_cache import StatCache
+from darty.utils import FileDigest
+
+
+class TestStatus(unittest.TestCase):
+
+    FILES = {
+        'file1.txt': b'content of the first file',
+        'subdir1/file2.txt': b'content of the second file',
+        'subdir1/file3.txt': b'content of the third file',
+    }
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        tmp_dir = self._tmp_dir.name
+
+        self.working_dir = os.path.join(tmp_dir, 'project', 'data')
+        config_path = os.path.join(tmp_dir, 'project', 'darty.yaml')
+
+        for file_path, content in self.FILES.items():
+            self._write_file(file_path, content)
+
+        with open(config_path, 'w') as f:
+            f.write('\n'.join([
+                'repositories:',
+                '  default:',
+                '    type: test',
+                '    root: test',
+                '    parameters:',
+                '      local_dir: %s' % os.path.join(tmp_dir, 'repository'),
+                'dependencies:',
+                '  - {group: group1, artifact: artifact1, version: 1.0, workingDir: data}',
+            ]))
+
+        settings_patcher = mock.patch('darty.dependency_manager.get_settings',
+                                      return_value={'packages_dir': os.path.join(tmp_dir, 'packages')})
+        settings_patcher.start()
+        self.addCleanup(settings_patcher.stop)
+
+        self.dependency = DependencyManager(config_path).get_dependency_by_name('group1', 'artifact1')
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _write_file(self, file_path: str, content: bytes, mtime: float = None):
+        abs_path = os.path.join(self.working_dir, file_path)
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        with open(abs_path, 'wb') as f:
+            f.write(content)
+
+        if mtime is not None:
+            os.utime(abs_path, (mtime, mtime))
+
+    def test_diff(self):
+        with self.assertRaises(ValueError):
+            self.dependency.diff()
+
+        self.assertTrue(self.dependency.publish(local=True))
+
+        # files of the package keep modification times, so nothing is hashed
+        with mock.patch.object(FileDigest, 'from_file', side_effect=AssertionError):
+            self.assertEqual(self.dependency.diff(), ([], [], []))
+
+        # changes
+        old_mtime = time.time() - 60
+        self._write_file('file1.txt', b'CONTENT of the first file', old_mtime)  # the same size
+        self._write_file('subdir1/file2.txt', self.FILES['subdir1/file2.txt'], old_mtime)  # only touched
+        self._write_file('subdir1/file3.txt', b'changed')
+        self._write_file('file4.txt', b'new file')
+        os.remove(os.path.join(self.working_dir, 'file1.txt'))
+        self._write_file('subdir2/file1.txt', b'CONTENT of the first file', old_mtime)
+
+        self.assertEqual(self.dependency.diff(), (['file4.txt', 'subdir2/file1.txt'], ['subdir1/file3.txt'],
+                                                  ['file1.txt']))
+
+        # unchanged files are not hashed again
+        with mock.patch.object(FileDigest, 'from_file', side_effect=AssertionError):
+            self.assertEqual(self.dependency.diff(), (['file4.txt', 'subdir2/file1.txt'], ['subdir1/file3.txt'],
+                                                      ['file1.txt']))
+
+    def test_old_install(self):
+        self.assertTrue(self.dependency.publish(local=True))
+
+        # a package installed by an older version into a read-only packages directory:
+        # it doesn't have an index and the index can't be created
+        artifact_dir = self.dependency.get_artifact_dir(self.dependency.ENV_LOCAL)
+        os.remove(os.path.join(artifact_dir, 'manifest.db'))
+        os.remove(os.path.join(artifact_dir, 'data', 'subdir1', 'file3.txt'))
+        self.dependency.invalidate_cache()
+
+        with mock.patch('darty.package.file_index.convert_info_json', side_effect=PermissionError):
+            # the file deleted from the package can't match the working directory
+            self.assertEqual(self.dependency.diff(), ([], ['subdir1/file3.txt'], []))
+
+        self.assertFalse(os.path.exists(os.path.join(artifact_dir, 'manifest.db')))
+
+    def test_stat_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = StatCache.for_dir(tmp_dir, self.working_dir)
+            old_mtime_ns = int((time.time() - 60) * 1e9)
+            cache.set('file1.txt', 10, old_mtime_ns, 'digest1')
+            cache.set('file2.txt', 10, time.time_ns(), 'digest2')
+            cache.save()
+
+            # digests of recently modified files are not saved
+            cache = StatCache.for_dir(tmp_dir, self.working_dir)
+            self.assertEqual(cache.get('file1.txt', 10, old_mtime_ns), 'digest1')
+            self.assertIsNone(cache.get('file1.txt', 11, old_mtime_ns))
+            self.assertIsNone(cache.get('file2.txt', 10, time.time_ns()))
+
+
+if __name__ == '__main__':
+    unittest.main()
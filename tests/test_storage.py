@@ -0,0 +1,123 @@
+import unittest
+import json
+import os
+import tempfile
+import time
+from darty.package.storage import AccessTracker, collect_garbage, scan_artifacts, is_pinned, ACCESS_FILENAME, \
+    fcntl
+from darty.utils import parse_size
+
+
+class TestStorage(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.packages_dir = self._tmp_dir.name
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _create_artifact(self, env: str, name: str, size: int, age: float) -> str:
+        artifact_dir = os.path.join(self.packages_dir, 'test', 'root', 'group1', env, name)
+        os.makedirs(os.path.join(artifact_dir, 'data'))
+        with open(os.path.join(artifact_dir, 'data', 'file.bin'), 'wb') as f:
+            f.write(b'0' * size)
+
+        # the size is recorded, so artifacts are not scanned
+        access_path = os.path.join(artifact_dir, ACCESS_FILENAME)
+        with open(access_path, 'w') as f:
+            json.dump({'size': size}, f)
+
+        access_time = time.time() - age
+        os.utime(access_path, (access_time, access_time))
+
+        return artifact_dir
+
+    def test_collect_garbage(self):
+        tmp_old = self._create_artifact('.tmp-artifacts', 'artifact1-1.0', 10, 48 * 3600)
+        tmp_new = self._create_artifact('.tmp-artifacts', 'artifact2-1.0', 10, 60)
+        local = self._create_artifact('.local-artifacts', 'artifact3-1.0', 100, 30 * 86400)
+        prod1 = self._create_artifact('.artifacts', 'artifact1-0.9', 100, 300)
+        prod2 = self._create_artifact('.artifacts', 'artifact2-0.9', 100, 200)
+        prod3 = self._create_artifact('.artifacts', 'artifact3-0.9', 100, 100)
+        prod4 = self._create_artifact('.artifacts', 'artifact4-0.9', 100, 0)
+
+        self.assertEqual(len(scan_artifacts(self.packages_dir)), 7)
+
+        # nothing is removed in the dry run mode
+        removed = collect_garbage(self.packages_dir, max_size=320, keep={prod1}, dry_run=True)
+        self.assertEqual([artifact.path for artifact in removed], [tmp_old, prod2, prod3])
+        self.assertEqual(len(scan_artifacts(self.packages_dir)), 7)
+
+        # the least recently used production artifacts are removed, except the kept one
+        removed = collect_garbage(self.packages_dir, max_size=320, keep={prod1})
+        self.assertEqual([artifact.path for artifact in removed], [tmp_old, prod2, prod3])
+        self.assertEqual(sorted(artifact.path for artifact in scan_artifacts(self.packages_dir)),
+                         sorted([tmp_new, local, prod1, prod4]))
+
+        # locally published artifacts are removed only by age
+        removed = collect_garbage(self.packages_dir, local_max_age=7 * 86400)
+        self.assertEqual([artifact.path for artifact in removed], [local])
+
+    @unittest.skipIf(fcntl is None, 'pins are not supported')
+    def test_pins(self):
+        artifact_dir = self._create_artifact('.artifacts', 'artifact1-1.0', 100, 3600)
+        self.assertFalse(is_pinned(artifact_dir))
+
+        tracker = AccessTracker()
+        tracker.touch(artifact_dir)
+        self.assertTrue(is_pinned(artifact_dir))
+
+        # the access time is updated
+        self.assertLess(time.time() - os.path.getmtime(os.path.join(artifact_dir, ACCESS_FILENAME)), 60)
+
+        # a pinned artifact is not removed
+        self.assertEqual(collect_garbage(self.packages_dir, max_size=0), [])
+
+        tracker.release()
+        self.assertFalse(is_pinned(artifact_dir))
+        self.assertEqual(len(collect_garbage(self.packages_dir, max_size=0)), 1)
+        self.assertFalse(os.path.exists(artifact_dir))
+
+    @unittest.skipIf(fcntl is None, 'pins are not supported')
+    def test_pin_limits(self):
+        artifact_dirs = [self._create_artifact('.artifacts', 'artifact%d-1.0' % i, 100, 60) for i in range(3)]
+        access_path = os.path.join(artifact_dirs[0], ACCESS_FILENAME)
+        mtime = os.path.getmtime(access_path)
+
+        tracker = AccessTracker()
+        tracker.MAX_PINS = 1
+
+        # a recently accessed artifact is pinned, but its access file is not written
+        with tracker.pin(artifact_dirs[0]):
+            tracker.touch(artifact_dirs[0])
+            self.assertEqual(os.path.getmtime(access_path), mtime)
+
+            # only the most recently used artifacts stay pinned, explicit pins are kept
+            tracker.touch(artifact_dirs[1])
+            tracker.touch(artifact_dirs[2])
+            self.assertEqual([is_pinned(artifact_dir) for artifact_dir in artifact_dirs], [True, False, True])
+
+        # the explicit pin is released when the artifact is not used anymore
+        self.assertEqual([is_pinned(artifact_dir) for artifact_dir in artifact_dirs], [False, False, True])
+        tracker.release()
+
+    def test_leftovers(self):
+        artifact_dir = self._create_artifact('.artifacts', 'artifact1-1.0', 100, 60)
+        for suffix in ('.removed-123', '.broken-456'):
+            os.makedirs(artifact_dir + suffix)
+
+        self.assertEqual([artifact.path for artifact in scan_artifacts(self.packages_dir)], [artifact_dir])
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size('100'), 100)
+        self.assertEqual(parse_size('10K'), 10 * 1024)
+        self.assertEqual(parse_size('1.5G'), int(1.5 * 1024 ** 3))
+        self.assertEqual(parse_size('20gb'), 20 * 1024 ** 3)
+
+        with self.assertRaises(ValueError):
+            parse_size('big')
+
+
+if __name__ == '__main__':
+    unittest.main()
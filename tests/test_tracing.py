@@ -0,0 +1,57 @@
+import unittest
+import json
+import os
+import tempfile
+from darty import tracing
+from darty.metrics import MetricsRegistry
+
+
+class TestTracing(unittest.TestCase):
+
+    def tearDown(self):
+        tracing.stop_tracing()
+
+    def test_spans(self):
+        # spans are not recorded if tracing is disabled
+        with tracing.span('disabled'):
+            pass
+
+        self.assertFalse(tracing.is_enabled())
+
+        tracer = tracing.start_tracing()
+        self.assertTrue(tracing.is_enabled())
+
+        with tracing.span('outer', category='test', path='file.txt'):
+            with tracing.span('inner'):
+                pass
+
+        # timers of metrics are recorded as spans
+        with MetricsRegistry().timer('stage_seconds', stage='unpack'):
+            pass
+
+        self.assertIs(tracing.stop_tracing(), tracer)
+
+        events = [event for event in tracer.get_events() if event['ph'] == 'X']
+        self.assertEqual([event['name'] for event in events], ['inner', 'outer', 'stage:unpack'])
+
+        inner, outer, unpack = events
+        self.assertEqual(outer['cat'], 'test')
+        self.assertEqual(outer['args'], {'path': 'file.txt'})
+        self.assertEqual(unpack['args'], {'stage': 'unpack'})
+        self.assertLessEqual(outer['ts'], inner['ts'])
+        self.assertGreaterEqual(outer['ts'] + outer['dur'], inner['ts'] + inner['dur'])
+
+        # trace file
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            trace_path = os.path.join(tmp_dir, 'trace.json')
+            tracer.write(trace_path)
+
+            with open(trace_path) as f:
+                data = json.load(f)
+
+            self.assertEqual(len(data['traceEvents']), 4)
+            self.assertEqual(data['traceEvents'][0]['name'], 'thread_name')
+
+
+if __name__ == '__main__':
+    unittest.main()
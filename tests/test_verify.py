@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+import boto3
+from moto import mock_s3
+from darty.dependency_manager import DependencyManager
+from darty.drivers.s3.files.driver import S3FilesDriver
+from darty.drivers.s3.zip.driver import S3ZipDriver
+from darty.helpers.commands import get_installed_dependencies
+from darty.output_writer import NullOutputWriter, BufferedOutputWriter
+from darty.package.integrity import PackageDigests, verify_installed_package
+
+
+# moto doesn't decode streaming uploads with checksum trailers
+MOTO_ENVIRON = {'AWS_REQUEST_CHECKSUM_CALCULATION': 'when_required'}
+
+
+class TestVerify(unittest.TestCase):
+
+    FILES = {
+        'file1.txt': b'content of the first file',
+        'subdir1/file2.txt': b'content of the second file',
+        'subdir1/file3.bin': os.urandom(10000),
+    }
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        tmp_dir = self._tmp_dir.name
+
+        self.packages_dir = os.path.join(tmp_dir, 'packages')
+        self.config_path = os.path.join(tmp_dir, 'project', 'darty.yaml')
+
+        for file_path, content in self.FILES.items():
+            abs_path = os.path.join(tmp_dir, 'project', 'data', file_path)
+            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+            with open(abs_path, 'wb') as f:
+                f.write(content)
+
+        with open(self.config_path, 'w') as f:
+            f.write('\n'.join([
+                'repositories:',
+                '  default:',
+                '    type: test',
+                '    root: test',
+                '    parameters:',
+                '      local_dir: %s' % os.path.join(tmp_dir, 'repository'),
+                'dependencies:',
+                '  - {group: group1, artifact: artifact1, version: 1.0, workingDir: data}',
+            ]))
+
+        settings_patcher = mock.patch('darty.dependency_manager.get_settings',
+                                      return_value={'packages_dir': self.packages_dir})
+        settings_patcher.start()
+        self.addCleanup(settings_patcher.stop)
+
+        self.dependency = DependencyManager(self.config_path).get_dependency_by_name('group1', 'artifact1')
+        self.assertTrue(self.dependency.publish())
+        self.data_dir = self.dependency.get_artifact_data_dir()
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _write_file(self, file_path: str, content: bytes):
+        with open(os.path.join(self.data_dir, file_path), 'wb') as f:
+            f.write(content)
+
+    def test_fast_and_deep_modes(self):
+        artifact_dir = self.dependency.get_artifact_dir()
+        for deep in (False, True):
+            report = verify_installed_package(artifact_dir, deep, jobs=2, batch_size=2)
+            self.assertTrue(report.ok)
+            self.assertEqual(report.num_files, 3)
+
+        # the same size, but a different content
+        self._write_file('file1.txt', b'CONTENT of the first file')
+        os.remove(os.path.join(self.data_dir, 'subdir1', 'file2.txt'))
+        self._write_file('subdir1/file4.txt', b'')
+
+        report = verify_installed_package(artifact_dir, jobs=2, batch_size=2)
+        self.assertEqual(report.modified, ['file1.txt'])
+        self.assertEqual(report.missing, ['subdir1/file2.txt'])
+        self.assertEqual(report.unexpected, ['subdir1/file4.txt'])
+
+        report = verify_installed_package(artifact_dir, deep=True, jobs=2, batch_size=2)
+        self.assertEqual(report.modified, [])
+        self.assertEqual(report.corrupted, ['file1.txt'])
+        self.assertEqual(report.missing, ['subdir1/file2.txt'])
+        self.assertEqual(report.unexpected, ['subdir1/file4.txt'])
+
+    def test_repair(self):
+        # a file which was only touched is not downloaded again
+        file_path = os.path.join(self.data_dir, 'file1.txt')
+        os.utime(file_path, ns=(0, 0))
+        self.assertFalse(self.dependency.verify())
+
+        output = BufferedOutputWriter()
+        with mock.patch.object(self.dependency.repository.driver, 'download_files') as download_files:
+            self.assertTrue(self.dependency.verify(repair=True, output=output))
+            download_files.assert_not_called()
+
+        self.assertIn('content is intact', '\n'.join(output.messages))
+        self.assertTrue(self.dependency.verify())
+
+        # broken, missing and unexpected files
+        self._write_file('file1.txt', b'changed')
+        os.remove(os.path.join(self.data_dir, 'subdir1', 'file3.bin'))
+        self._write_file('file5.txt', b'')
+
+        self.assertFalse(self.dependency.verify(deep=True))
+        self.assertTrue(self.dependency.verify(deep=True, repair=True))
+        self.assertTrue(self.dependency.verify(deep=True))
+        self.assertTrue(self.dependency.verify())
+
+        for file_path, content in self.FILES.items():
+            with open(os.path.join(self.data_dir, file_path), 'rb') as f:
+                self.assertEqual(f.read(), content)
+
+    def test_repair_old_manifest(self):
+        # files in indexes created by older versions don't have digests
+        db_path = os.path.join(self.dependency.get_artifact_dir(), 'manifest.db')
+        connection = sqlite3.connect(db_path)
+        connection.execute('CREATE TABLE old_files AS SELECT id, path FROM files')
+        connection.execute('DROP TABLE files')
+        connection.execute('ALTER TABLE old_files RENAME TO files')
+        connection.commit()
+        connection.close()
+        self.dependency.invalidate_cache()
+
+        self.assertTrue(self.dependency.verify(deep=True))
+
+        # the whole package is downloaded again
+        self._write_file('subdir1/file2.txt', b'changed')
+        report = verify_installed_package(self.dependency.get_artifact_dir(), deep=True)
+        self.assertTrue(report.hash_mismatch)
+
+        self.assertTrue(self.dependency.verify(deep=True, repair=True))
+        self.assertTrue(self.dependency.verify())
+        self.assertEqual(report.num_unverified, 3)
+
+    def test_read_only_old_install(self):
+        # the index can't be created for a package installed by an older version
+        os.remove(os.path.join(self.dependency.get_artifact_dir(), 'manifest.db'))
+        os.remove(os.path.join(self.data_dir, 'subdir1', 'file2.txt'))
+
+        with mock.patch('darty.package.file_index.convert_info_json', side_effect=PermissionError):
+            for deep in (False, True):
+                report = verify_installed_package(self.dependency.get_artifact_dir(), deep, jobs=2)
+                self.assertEqual(report.missing, ['subdir1/file2.txt'])
+                self.assertEqual(report.num_files, 3)
+
+    def test_installed_dependencies(self):
+        dependencies = get_installed_dependencies(self.packages_dir)
+        self.assertEqual(len(dependencies), 1)
+        self.assertEqual(dependencies[0].get_artifact_dir(), self.dependency.get_artifact_dir())
+        self.assertTrue(dependencies[0].verify(deep=True))
+
+    @mock.patch.dict(os.environ, MOTO_ENVIRON)
+    @mock_s3
+    def test_s3_download_files(self):
+        s3 = boto3.resource('s3')
+        artifact_dir = self.dependency.get_artifact_dir()
+
+        for driver_class in (S3FilesDriver, S3ZipDriver):
+            bucket_name = 'test-bucket-%s' % driver_class.__name__.lower()
+            s3.create_bucket(Bucket=bucket_name)
+
+            driver = driver_class(bucket_name, {})
+            driver.upload_package('group1', 'artifact1', '1.0', artifact_dir, NullOutputWriter())
+
+            # only the requested files are downloaded
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                digests = PackageDigests()
+                driver.download_files('group1', 'artifact1', '1.0', ['subdir1/file3.bin'], tmp_dir,
+                                      NullOutputWriter(), digests)
+
+                self.assertEqual(os.listdir(os.path.join(tmp_dir, 'data')), ['subdir1'])
+                self.assertEqual(os.listdir(os.path.join(tmp_dir, 'data', 'subdir1')), ['file3.bin'])
+                self.assertEqual(len(digests), 1)
+
+                with open(os.path.join(tmp_dir, 'data', 'subdir1', 'file3.bin'), 'rb') as f:
+                    self.assertEqual(f.read(), self.FILES['subdir1/file3.bin'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import os
+import shutil
+import tempfile
+from argparse import Namespace
+from unittest import mock
+from darty.commands.update import UpdateCommand
+from darty.dependency_manager import DependencyManager
+from darty.output_writer import BufferedOutputWriter
+from darty.package.storage import get_artifact_size
+from darty.workspace import Workspace
+
+
+class TestWorkspace(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self._tmp_dir.name, 'workspace')
+
+        settings_patcher = mock.patch('darty.dependency_manager.get_settings',
+                                      return_value={'packages_dir': os.path.join(self._tmp_dir.name, 'packages')})
+        settings_patcher.start()
+        self.addCleanup(settings_patcher.stop)
+
+        # both projects depend on the first package, hidden directories are ignored
+        projects = [('project1', ['artifact1', 'artifact2']), ('group/project2', ['artifact1']),
+                    ('.hidden/project3', ['artifact3'])]
+
+        for project, artifacts in projects:
+            project_dir = os.path.join(self.root, project)
+            os.makedirs(project_dir)
+
+            with open(os.path.join(project_dir, 'darty.yaml'), 'w') as f:
+                f.write('\n'.join([
+                    'repositories:',
+                    '  default:',
+                    '    type: test',
+                    '    root: test',
+                    '    parameters:',
+                    '      local_dir: %s' % os.path.join(self._tmp_dir.name, 'repository'),
+                    'dependencies:',
+                ] + ['  - {group: group1, artifact: %s, version: 1.0, workingDir: data/%s}' % (artifact, artifact)
+                     for artifact in artifacts]))
+
+        # publish the packages and remove them from the working directories
+        for artifact in ('artifact1', 'artifact2'):
+            working_dir = os.path.join(self.root, 'project1', 'data', artifact)
+            os.makedirs(working_dir)
+            with open(os.path.join(working_dir, 'file1.txt'), 'w') as f:
+                f.write(artifact)
+
+        manager = DependencyManager(os.path.join(self.root, 'project1', 'darty.yaml'))
+        for dependency in manager.dependencies.values():
+            self.assertTrue(dependency.publish())
+            shutil.rmtree(dependency.get_artifact_dir())
+            dependency.invalidate_cache()
+
+        shutil.rmtree(os.path.join(self.root, 'project1', 'data'))
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_update(self):
+        workspace = Workspace(self.root)
+        self.assertEqual(list(workspace.managers), [os.path.join(self.root, 'group', 'project2', 'darty.yaml'),
+                                                    os.path.join(self.root, 'project1', 'darty.yaml')])
+
+        # projects share the repository
+        manager1, manager2 = workspace.managers.values()
+        self.assertIs(manager1.get_dependency_by_name('group1', 'artifact1').repository,
+                      manager2.get_dependency_by_name('group1', 'artifact1').repository)
+
+        output = BufferedOutputWriter()
+        summary = workspace.update(jobs=2, output=output)
+        self.assertEqual({key: summary[key] for key in ('downloaded', 'cached', 'failed', 'failed_projects')},
+                         {'downloaded': 2, 'cached': 0, 'failed': 0, 'failed_projects': 0})
+
+        # sizes of the downloaded packages are the sizes recorded during the installation
+        self.assertGreater(summary['downloaded_bytes'], 0)
+        self.assertEqual(summary['downloaded_bytes'], sum(get_artifact_size(dependency.get_artifact_dir())
+                                                          for dependency in workspace.get_unique_dependencies()))
+
+        # working directories of all the projects are updated
+        for project, artifact in (('project1', 'artifact1'), ('project1', 'artifact2'), ('group/project2', 'artifact1')):
+            with open(os.path.join(self.root, project, 'data', artifact, 'file1.txt')) as f:
+                self.assertEqual(f.read(), artifact)
+
+        # the output is grouped by projects
+        self.assertIn('Project "project1/darty.yaml":', [message.strip() for message in output.messages])
+
+    def test_update_command(self):
+        args = Namespace(config=os.path.join(self.root, 'project1', 'darty.yaml'), group=None, artifact=None,
+                         rewrite=False, workspace=None, jobs=2, profile=None)
+
+        # the project is updated by the same pipeline as the workspace, the summary has the same format
+        output = BufferedOutputWriter()
+        self.assertTrue(UpdateCommand().run(args, {}, output))
+        self.assertEqual(output.messages[-2], 'Packages: 2, downloaded: 2, already installed: 0, failed: 0')
+        for artifact in ('artifact1', 'artifact2'):
+            self.assertTrue(os.path.isfile(os.path.join(self.root, 'project1', 'data', artifact, 'file1.txt')))
+
+        # a single package writes its output directly
+        args.artifact = 'artifact1'
+        output = BufferedOutputWriter()
+        self.assertTrue(UpdateCommand().run(args, {}, output))
+        self.assertEqual(output.messages[-2], 'Packages: 1, downloaded: 0, already installed: 1, failed: 0')
+
+        # arguments are validated before the configuration is read
+        args.config = os.path.join(self.root, 'unknown', 'darty.yaml')
+        args.jobs = 0
+        with self.assertRaisesRegex(ValueError, 'jobs'):
+            UpdateCommand().run(args, {}, output)
+
+
+if __name__ == '__main__':
+    unittest.main()